@@ -0,0 +1,500 @@
+import asyncio
+import base64
+import binascii
+import json
+import os
+import tempfile
+import time
+from functools import partial
+
+import anyio
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+
+import config
+import metrics
+from executors import Overloaded
+from ingest import ImageTooLarge, IngestError, load_image
+from model_service import ModelNotReady
+from results_store import OUTCOMES, export_lines, iter_results, parse_time
+from screening import decide, outcome_of, parse_gejala
+from video import VideoError
+
+
+EXPORT_MEDIA_TYPES = {"jsonl": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+        self.message = message
+
+
+# StreamingResponse Starlette langsung mendengarkan disconnect lewat receive(), yang juga dipakai untuk
+# membaca body. Di sini hasil bulk mulai dikirim sementara body masih dibaca; disconnect baru didengarkan
+# setelah body habis (sebelumnya disconnect terdeteksi oleh pembaca body sebagai ClientDisconnect).
+class BodyStreamingResponse(StreamingResponse):
+    def __init__(self, content, body_done, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body_done = body_done
+
+    async def __call__(self, scope, receive, send):
+        async with anyio.create_task_group() as task_group:
+
+            async def wrap(func):
+                await func()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(wrap, partial(self.stream_response, send))
+            await self.body_done.wait()
+            await wrap(partial(self.listen_for_disconnect, receive))
+
+        if self.background is not None:
+            await self.background()
+
+
+def decode_image(data):
+    if not data:
+        raise ApiError(422, "Gambar kosong")
+    try:
+        return load_image(data)
+    except ImageTooLarge as e:
+        raise ApiError(413, str(e))
+    except IngestError as e:
+        raise ApiError(422, str(e))
+
+
+def decode_base64(value):
+    if not isinstance(value, str) or not value:
+        raise ApiError(422, "Field image_base64 wajib diisi")
+    # Data URL (data:image/jpeg;base64,...) juga diterima
+    if value.startswith("data:"):
+        value = value.split(",", 1)[-1]
+    try:
+        return base64.b64decode(value, validate=True)
+    except (binascii.Error, ValueError):
+        raise ApiError(422, "image_base64 bukan base64 yang valid")
+
+
+def _parse_gejala(value):
+    try:
+        return parse_gejala(value)
+    except ValueError as e:
+        raise ApiError(422, str(e))
+
+
+def _form_gejala(values):
+    # Form boleh mengirim gejala berulang (gejala=1&gejala=3) atau satu string "1;3"
+    if len(values) == 1:
+        return _parse_gejala(values[0])
+    return _parse_gejala(list(values))
+
+
+async def read_body(request, limit):
+    """Baca body secara streaming dan hentikan begitu melewati batas ukuran."""
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise ApiError(413, f"Body melebihi batas {limit} byte")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+async def iter_lines(request, limit):
+    """Baris NDJSON dari body yang di-stream, tanpa menunggu seluruh body diterima."""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        while b"\n" in buffer:
+            line, buffer = buffer.split(b"\n", 1)
+            if line.strip():
+                yield line
+        if len(buffer) > limit:
+            raise ApiError(413, f"Satu baris NDJSON melebihi batas {limit} byte")
+    if buffer.strip():
+        yield buffer
+
+
+def _base64_limit():
+    return config.API_MAX_IMAGE_BYTES * 4 // 3 + 64 * 1024
+
+
+async def _upload_bytes(upload):
+    if upload.size is not None and upload.size > config.API_MAX_IMAGE_BYTES:
+        raise ApiError(413, f"Gambar {upload.filename} melebihi batas {config.API_MAX_IMAGE_BYTES} byte")
+    data = await upload.read()
+    if len(data) > config.API_MAX_IMAGE_BYTES:
+        raise ApiError(413, f"Gambar {upload.filename} melebihi batas {config.API_MAX_IMAGE_BYTES} byte")
+    return data
+
+
+async def _spool_video(upload):
+    """Salin upload video ke file sementara (OpenCV membaca dari path), dibatasi VIDEO_MAX_BYTES."""
+    limit = config.VIDEO_MAX_BYTES
+    if upload.size is not None and upload.size > limit:
+        raise ApiError(413, f"Video melebihi batas {limit} byte")
+    suffix = os.path.splitext(upload.filename or "")[1][:8] or ".mp4"
+    fd, path = tempfile.mkstemp(prefix="autisense-video-", suffix=suffix)
+    try:
+        size = 0
+        with os.fdopen(fd, "wb") as f:
+            while chunk := await upload.read(1024 * 1024):
+                size += len(chunk)
+                if size > limit:
+                    raise ApiError(413, f"Video melebihi batas {limit} byte")
+                f.write(chunk)
+        if not size:
+            raise ApiError(422, "Video kosong")
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _decision_body(decision):
+    return {
+        "status": "ok",
+        "label": decision["label"],
+        "outcome": decision["outcome"],
+        "confidence": decision["confidence"],
+        "uncertainty": decision["uncertainty"],
+        "image_positive": decision["image_positive"],
+        "checklist": {
+            "count": decision["checklist_count"],
+            "total": decision["checklist_total"],
+            "percent": decision["checklist_percent"],
+            "positive": decision["checklist_positive"],
+        },
+    }
+
+
+def _error(message, status_code, item_id=None):
+    body = {"status": "error", "error": message}
+    if item_id is not None:
+        body["id"] = item_id
+    return body, status_code
+
+
+# API JSON untuk sistem lain (mis. sistem intake klinik); memakai model, scheduler dan cache yang sama dengan UI
+def create_api_router(screener, model_service, decode_pool=None, video_analyzer=None, video_pool=None):
+    router = APIRouter(prefix="/api/v1", tags=["screening"])
+
+    async def run_stage(pool, fn, *args):
+        # Tahap dengan pool sendiri tidak memakai threadpool bersama milik server
+        if pool is None:
+            return await run_in_threadpool(fn, *args)
+        return await asyncio.wrap_future(pool.submit(fn, *args))
+
+    async def screen_one(data, gejala, item_id=None):
+        """Hasil terstruktur untuk satu gambar: (body, status_code)."""
+        with metrics.trace("api_screen") as trace:
+            body, status_code = await _screen_one(data, gejala, item_id)
+        body["trace_id"] = trace.trace_id
+        return body, status_code
+
+    async def _screen_one(data, gejala, item_id):
+        if not model_service.ready:
+            metrics.SCREENINGS.inc(source="api", outcome="not_ready")
+            return _error(model_service.status_message(), 503, item_id)
+
+        started = time.perf_counter()
+        timings = {}
+        try:
+            image = await run_stage(decode_pool, decode_image, data)
+        except ApiError as e:
+            metrics.SCREENINGS.inc(source="api", outcome="invalid_image")
+            return _error(e.message, e.status_code, item_id)
+        except Overloaded as e:
+            metrics.SCREENINGS.inc(source="api", outcome="busy")
+            return _error(str(e), 503, item_id)
+        timings["decode"] = (time.perf_counter() - started) * 1000.0
+        metrics.record("decode", timings["decode"])
+
+        analyze_started = time.perf_counter()
+        try:
+            analysis, error = await run_in_threadpool(screener.analyze_image, image)
+        except Overloaded as e:
+            metrics.SCREENINGS.inc(source="api", outcome="busy")
+            return _error(str(e), 503, item_id)
+        timings["analyze"] = (time.perf_counter() - analyze_started) * 1000.0
+        outcome = outcome_of(analysis, error)
+        metrics.SCREENINGS.inc(source="api", outcome=outcome)
+        if error:
+            return _error(error, 503 if outcome == "not_ready" else 422, item_id)
+
+        body = {
+            # Skor per wajah; confidence/keputusan di bawah memakai wajah utama (primary)
+            "faces": [
+                {"x": x, "y": y, "w": w, "h": h, "confidence": confidence, "primary": i == analysis.primary,
+                 "uncertainty": None if analysis.face_uncertainties is None else analysis.face_uncertainties[i]}
+                for i, ((x, y, w, h), confidence) in enumerate(zip(analysis.faces, analysis.face_confidences))
+            ],
+            "primary_face": analysis.primary,
+            # Koordinat wajah relatif terhadap gambar setelah ingest (sisi terpanjang <= INGEST_MAX_SIDE)
+            "image_size": {"width": image.width, "height": image.height},
+            "model_version": model_service.model_version,
+        }
+        if item_id is not None:
+            body["id"] = item_id
+        decision = None
+        if analysis.confidence is None:
+            body["status"] = "no_face"
+        else:
+            decision = decide(analysis.confidence, gejala, analysis.uncertainty)
+            body.update(_decision_body(decision))
+        timings["total"] = (time.perf_counter() - started) * 1000.0
+        screener.record_result(
+            "api" if item_id is None else "api_bulk", decision, gejala, analysis,
+            timings={**analysis.timings, "total": timings["total"]},
+        )
+        # Durasi tahap saat analisis dihitung (bisa berasal dari cache/analisis spekulatif)
+        body["timings_ms"] = {**timings, "stages": analysis.timings}
+        return body, 200
+
+    @router.post("/screen")
+    async def screen(request: Request):
+        """Satu gambar: multipart (image, gejala) atau JSON {image_base64, gejala}."""
+        content_type = request.headers.get("content-type", "")
+        try:
+            if content_type.startswith("multipart/form-data"):
+                async with request.form(max_files=1) as form:
+                    upload = form.get("image")
+                    if upload is None or isinstance(upload, str):
+                        raise ApiError(422, "Field file image wajib diisi")
+                    data = await _upload_bytes(upload)
+                    gejala = _form_gejala(form.getlist("gejala"))
+            elif content_type.startswith("application/json"):
+                payload = json.loads(await read_body(request, _base64_limit()))
+                data = decode_base64(payload.get("image_base64"))
+                gejala = _parse_gejala(payload.get("gejala"))
+            else:
+                raise ApiError(415, "Gunakan multipart/form-data atau application/json")
+        except ApiError as e:
+            body, status_code = _error(e.message, e.status_code)
+            return JSONResponse(body, status_code=status_code)
+        except (ValueError, AttributeError):
+            body, status_code = _error("Body JSON tidak valid", 422)
+            return JSONResponse(body, status_code=status_code)
+
+        body, status_code = await screen_one(data, gejala)
+        headers = {"X-Trace-Id": body["trace_id"]}
+        # Antrian penuh: client diminta mencoba lagi
+        if status_code == 503:
+            headers["Retry-After"] = "1"
+        return JSONResponse(body, status_code=status_code, headers=headers)
+
+    @router.post("/screen/bulk")
+    async def screen_bulk(request: Request):
+        """Banyak gambar: NDJSON {id, image_base64, gejala} per baris, atau multipart
+        dengan beberapa file images dan field gejala berisi JSON {nama_file: jawaban}.
+        Hasil dikirim sebagai NDJSON sesuai urutan input, begitu masing-masing selesai."""
+        if not model_service.ready:
+            body, status_code = _error(model_service.status_message(), 503)
+            return JSONResponse(body, status_code=status_code)
+
+        content_type = request.headers.get("content-type", "")
+        body_done = asyncio.Event()
+        if content_type.startswith("multipart/form-data"):
+            # Parser form Starlette menyimpan file ke file sementara (spooled), bukan memori; isi tiap
+            # file baru dibaca saat item-nya masuk jendela analisis
+            form = await request.form(max_files=config.API_MAX_BULK_ITEMS)
+            try:
+                uploads, answers = _multipart_uploads(form)
+            except ApiError as e:
+                await form.close()
+                body, status_code = _error(e.message, e.status_code)
+                return JSONResponse(body, status_code=status_code)
+            body_done.set()
+            source = _multipart_items(form, uploads, answers)
+        elif content_type.startswith(("application/x-ndjson", "application/jsonl")):
+            source = _ndjson_items(request)
+        else:
+            body, status_code = _error("Gunakan application/x-ndjson atau multipart/form-data", 415)
+            return JSONResponse(body, status_code=status_code)
+
+        # Body dibaca sambil hasil dikirim: tiap item dianalisis begitu barisnya diterima
+        return BodyStreamingResponse(_stream_bulk(source, body_done), body_done, media_type="application/x-ndjson")
+
+    @router.post("/screen/video")
+    async def screen_video(request: Request):
+        """Video pendek: multipart (video, gejala). Skor agregat dari frame yang disampling,
+        timeline per frame dan throughput (fps) pemrosesan."""
+        if video_analyzer is None:
+            return JSONResponse(*_error("Mode video tidak aktif", 404))
+        with metrics.trace("api_video") as trace:
+            body, status_code = await _screen_video(request)
+        body["trace_id"] = trace.trace_id
+        headers = {"X-Trace-Id": trace.trace_id}
+        if status_code == 503:
+            headers["Retry-After"] = "5"
+        return JSONResponse(body, status_code=status_code, headers=headers)
+
+    async def _screen_video(request):
+        if not model_service.ready:
+            metrics.SCREENINGS.inc(source="api_video", outcome="not_ready")
+            return _error(model_service.status_message(), 503)
+        if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+            return _error("Gunakan multipart/form-data dengan field file video", 415)
+
+        path = None
+        try:
+            async with request.form(max_files=1) as form:
+                upload = form.get("video")
+                if upload is None or isinstance(upload, str):
+                    raise ApiError(422, "Field file video wajib diisi")
+                gejala = _form_gejala(form.getlist("gejala"))
+                path = await _spool_video(upload)
+            analysis = await run_stage(video_pool, video_analyzer.analyze_file, path)
+        except ApiError as e:
+            metrics.SCREENINGS.inc(source="api_video", outcome="invalid_image")
+            return _error(e.message, e.status_code)
+        except VideoError as e:
+            metrics.SCREENINGS.inc(source="api_video", outcome="invalid_image")
+            return _error(str(e), 422)
+        except ModelNotReady as e:
+            metrics.SCREENINGS.inc(source="api_video", outcome="not_ready")
+            return _error(str(e), 503)
+        except Overloaded as e:
+            metrics.SCREENINGS.inc(source="api_video", outcome="busy")
+            return _error(str(e), 503)
+        finally:
+            if path is not None:
+                os.remove(path)
+
+        body = {"model_version": model_service.model_version}
+        decision = None
+        if analysis.confidence is None:
+            body["status"] = "no_face"
+            metrics.SCREENINGS.inc(source="api_video", outcome="no_face")
+        else:
+            decision = decide(analysis.confidence, gejala)
+            body.update(_decision_body(decision))
+            metrics.SCREENINGS.inc(source="api_video", outcome="ok")
+        screener.record_result("api_video", decision, gejala, timings=analysis.throughput["stage_ms_total"])
+        body.update({"video": analysis.summary, "throughput": analysis.throughput, "timeline": analysis.frames})
+        return body, 200
+
+    async def _stream_bulk(source, body_done):
+        """Hasil NDJSON berurutan. Paling banyak API_BULK_WINDOW item (beserta bytes gambarnya) dibaca
+        dan belum dikirim; pembacaan body menunggu jika jendela penuh. Paralel analisis lewat semaphore."""
+        semaphore = asyncio.Semaphore(config.API_BULK_CONCURRENCY)
+        window = asyncio.Queue(maxsize=max(1, config.API_BULK_WINDOW))
+
+        async def run_item(item):
+            async with semaphore:
+                if "error" in item:
+                    return _error(item["error"], 422, item.get("id"))
+                return await screen_one(item["data"], item["gejala"], item["id"])
+
+        async def produce():
+            count = 0
+            try:
+                async for item in source:
+                    if count >= config.API_MAX_BULK_ITEMS:
+                        await window.put(_done(_error(f"Maksimal {config.API_MAX_BULK_ITEMS} gambar per request", 413)))
+                        break
+                    count += 1
+                    await window.put(asyncio.ensure_future(run_item(item)))
+            except ApiError as e:
+                await window.put(_done(_error(e.message, e.status_code)))
+            except ClientDisconnect:
+                pass
+            finally:
+                body_done.set()
+                await source.aclose()
+            await window.put(None)
+
+        producer = asyncio.ensure_future(produce())
+        try:
+            while (task := await window.get()) is not None:
+                body, _ = await task
+                yield json.dumps(body, ensure_ascii=False) + "\n"
+            # Error tak terduga saat membaca body diteruskan (bukan ditelan)
+            await producer
+        finally:
+            # Client putus di tengah jalan: berhenti membaca body dan hentikan item yang belum selesai
+            producer.cancel()
+            while not window.empty():
+                task = window.get_nowait()
+                if task is not None:
+                    task.cancel()
+
+    async def _ndjson_items(request):
+        index = 0
+        async for line in iter_lines(request, _base64_limit()):
+            item_id = str(index)
+            index += 1
+            try:
+                payload = json.loads(line)
+                item_id = str(payload.get("id", item_id))
+                yield {
+                    "id": item_id,
+                    "data": decode_base64(payload.get("image_base64")),
+                    "gejala": _parse_gejala(payload.get("gejala")),
+                }
+            except ApiError as e:
+                yield {"id": item_id, "error": e.message}
+            except (ValueError, AttributeError):
+                yield {"id": item_id, "error": "Baris JSON tidak valid"}
+
+    def _multipart_uploads(form):
+        answers = form.get("gejala")
+        try:
+            answers = json.loads(answers) if answers else {}
+        except ValueError:
+            raise ApiError(422, "Field gejala harus JSON {nama_file: jawaban}")
+        uploads = [upload for upload in form.getlist("images") if not isinstance(upload, str)]
+        if not uploads:
+            raise ApiError(422, "Field file images wajib diisi")
+        return uploads, answers
+
+    async def _multipart_items(form, uploads, answers):
+        try:
+            for upload in uploads:
+                try:
+                    item = {
+                        "id": upload.filename,
+                        "data": await _upload_bytes(upload),
+                        "gejala": _parse_gejala(answers.get(upload.filename)),
+                    }
+                except ApiError as e:
+                    item = {"id": upload.filename, "error": e.message}
+                yield item
+        finally:
+            await form.close()
+
+    @router.get("/results/export")
+    def export_results(format: str = "jsonl", since: str = None, until: str = None,
+                       outcome: str = None, source: str = None):
+        """Hasil screening tersimpan sebagai JSONL/CSV, di-stream per chunk tanpa memuat seluruh tabel.
+        Filter: since/until (unix timestamp atau ISO), outcome (high, medium, low, no_face), source."""
+        if not config.RESULTS_EXPORT_API or screener.results is None:
+            return JSONResponse(*_error("Export hasil tidak aktif (AUTISENSE_RESULTS_EXPORT_API=1)", 404))
+        if format not in EXPORT_MEDIA_TYPES:
+            return JSONResponse(*_error(f"Format export tidak dikenal: {format} (pilih jsonl, csv)", 422))
+        if outcome is not None and outcome not in OUTCOMES:
+            return JSONResponse(*_error(f"Outcome tidak dikenal: {outcome} (pilih {', '.join(OUTCOMES)})", 422))
+        try:
+            window = parse_time(since), parse_time(until)
+        except ValueError as e:
+            return JSONResponse(*_error(str(e), 422))
+        # Baris yang masih di antrian penulis ikut ter-export
+        screener.results.flush(timeout=5)
+        rows = iter_results(screener.results.path, *window, outcome=outcome, source=source)
+        return StreamingResponse(
+            export_lines(rows, format),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="hasil_screening.{format}"'},
+        )
+
+    return router
+
+
+def _done(result):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(result)
+    return future
@@ -1,684 +1,281 @@
-import gradio as gr
-import tensorflow as tf
-import numpy as np
-import cv2
-from PIL import Image
-import os
-import gdown
 import os
 
-model_path = "model/model_deteksi_autisme"
-
-# Download hanya jika belum ada
-if not os.path.exists(model_path):
-    url = 'https://drive.google.com/uc?id=1jiJY34UFhyPAjybEKOvS82zuVhiIRrnI'  # Ganti dengan ID-mu
-    gdown.download(url, model_path, quiet=False)
-
-# Load model CNN dengan path yang lebih robust
-model_path = os.path.join(os.path.dirname(__file__), "model", "model_deteksi_autisme.h5")
-
-# Cek apakah model ada
-if not os.path.exists(model_path):
-    raise FileNotFoundError(f"Model tidak ditemukan di: {model_path}")
-
-try:
-    model = tf.keras.models.load_model(model_path)
-    print(f"✅ Model berhasil dimuat dari: {model_path}")
-except Exception as e:
-    raise Exception(f"❌ Gagal memuat model: {str(e)}")
+import gradio as gr
+import pandas as pd
+
+import config
+import metrics
+from assets import create_static_router, load_bundle
+from cache import InferenceCache
+from executors import Overloaded, StagePools
+from explain import Explainer, format_explanation
+from face_stage import FaceStage, configure_opencv_threads
+from model_service import ModelNotReady, ModelService
+from prefetch import SpeculativeRunner
+from results_store import create_result_store
+from screening import BUSY_MESSAGE, Screener, decide, pertanyaan
+from tta import create_tta
+from video import VideoAnalyzer, VideoError, format_video, live_status, timeline_rows
+
+# Model dimuat dan di-warmup di thread latar belakang, UI bisa langsung dibuka
+model_service = ModelService(config.BACKEND).start()
+
+# Tahap deteksi wajah: detector di-cache per thread, deteksi pada salinan beresolusi terbatas
+face_stage = FaceStage(
+    max_side=config.FACE_DETECT_MAX_SIDE,
+    crop=config.FACE_CROP,
+    margin=config.FACE_CROP_MARGIN,
+    max_faces=config.FACE_MAX_FACES,
+    primary_rule=config.FACE_PRIMARY_RULE,
+    stats_every=config.FACE_STATS_EVERY,
+)
+
+# Pool terpisah per tahap agar decode, OpenCV dan TensorFlow tidak berebut satu pool worker
+stage_pools = StagePools(
+    decode_workers=config.DECODE_WORKERS,
+    face_workers=config.FACE_WORKERS,
+    max_queue=config.STAGE_MAX_QUEUE,
+    video_workers=config.VIDEO_WORKERS,
+    video_max_queue=config.VIDEO_MAX_QUEUE,
+    explain_workers=config.EXPLAIN_WORKERS,
+    explain_max_queue=config.EXPLAIN_MAX_QUEUE,
+)
+configure_opencv_threads(config.OPENCV_THREADS)
+
+# Cache hasil analisis gambar (kotak wajah + skor CNN), dikunci dengan hash isi gambar
+inference_cache = InferenceCache(
+    max_bytes=config.CACHE_MAX_BYTES,
+    ttl_seconds=config.CACHE_TTL_SECONDS,
+)
+
+
+# Hasil screening disimpan ke SQLite oleh thread penulis di latar belakang (None = nonaktif)
+results_store = create_result_store()
+
+# Test-time augmentation opsional: varian crop wajah diskor dalam forward pass yang sama (None = nonaktif)
+tta = create_tta()
+
+# Pipeline screening (validasi, deteksi wajah, skor CNN), sama dengan CLI batch
+screener = Screener(
+    model_service, face_stage, inference_cache, face_pool=stage_pools.face, results=results_store, tta=tta,
+)
+analyze_image = screener.analyze_image
+
+# Peta Grad-CAM on-demand: memakai analisis yang di-cache, dihitung di pool "explain", cache sendiri
+explainer = Explainer(
+    screener,
+    InferenceCache(max_bytes=config.EXPLAIN_CACHE_MAX_BYTES, ttl_seconds=config.CACHE_TTL_SECONDS),
+    pool=stage_pools.explain,
+    size=config.EXPLAIN_SIZE,
+)
+
+# Mode video/webcam: sampling adaptif + pelacakan wajah, crop frame di-batch ke scheduler yang sama
+video_analyzer = VideoAnalyzer(face_stage, model_service)
+
+# Mulai analisis gambar begitu di-upload; pekerjaan lama dibatalkan jika gambar diganti
+speculative = SpeculativeRunner(analyze_image, max_workers=config.SPECULATIVE_WORKERS)
+
+
+# Statistik runtime untuk tuning, dipakai endpoint /stats
+def collect_stats():
+    return {
+        "model": model_service.readiness(),
+        "ui_queue": ui_queue_stats(),
+        "stages": stage_pools.stats(),
+        "scheduler": model_service.scheduler.stats() if model_service.scheduler else None,
+        "face_stage": face_stage.stats(),
+        "cache": inference_cache.stats(),
+        "speculative": speculative.stats(),
+        "explain": explainer.stats(),
+        "tta": tta.describe() if tta else None,
+        "tuning": config.TUNING,
+        "results_store": results_store.stats() if results_store else None,
+    }
+
+
+# Panjang antrian event Gradio (tersedia setelah server berjalan)
+def ui_queue_stats():
+    queue = getattr(iface, "_queue", None)
+    if queue is None:
+        return None
+    return {
+        "queued": len(queue),
+        "max_size": queue.max_size,
+        "active_workers": queue.get_active_worker_count(),
+    }
+
+
+# Nilai dari model, scheduler, pool dan cache yang diambil saat /metrics di-scrape
+def collect_metrics():
+    readiness = model_service.readiness()
+    model = readiness.get("model", {})
+    families = [
+        ("autisense_model_ready", "gauge", "1 jika model sudah dimuat dan di-warmup",
+         [({}, 1 if readiness["ready"] else 0)]),
+        ("autisense_model_load_seconds", "gauge", "Durasi memuat model",
+         [({"backend": config.BACKEND}, model.get("load_seconds"))]),
+        ("autisense_model_startup_seconds", "gauge", "Durasi dari start proses sampai model siap",
+         [({"backend": config.BACKEND}, readiness.get("startup_seconds"))]),
+    ]
+    queues = [({"queue": name}, s["queued"]) for name, s in stage_pools.stats().items()]
+    rejected = [({"queue": name}, s["rejected"]) for name, s in stage_pools.stats().items()]
+    if model_service.scheduler:
+        scheduler = model_service.scheduler.stats()
+        queues.append(({"queue": "inference"}, scheduler["queue_depth"]))
+        rejected.append(({"queue": "inference"}, scheduler["rejected"]))
+        families.append(("autisense_batch_items_total", "counter", "Jumlah gambar yang melewati forward pass CNN",
+                         [({}, scheduler["items"])]))
+        families.append(("autisense_batches_total", "counter", "Jumlah forward pass CNN",
+                         [({}, scheduler["batches"])]))
+    ui_queue = ui_queue_stats()
+    if ui_queue:
+        queues.append(({"queue": "ui"}, ui_queue["queued"]))
+    cache = inference_cache.stats()
+    families += [
+        ("autisense_queue_depth", "gauge", "Panjang antrian per tahap", queues),
+        ("autisense_queue_rejected_total", "counter", "Pekerjaan yang ditolak karena antrian penuh", rejected),
+        ("autisense_cache_requests_total", "counter", "Lookup cache hasil analisis",
+         [({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"])]),
+        ("autisense_explain_cache_requests_total", "counter", "Lookup cache peta Grad-CAM",
+         [({"result": "hit"}, explainer.cache.hits), ({"result": "miss"}, explainer.cache.misses)]),
+    ]
+    if results_store:
+        results = results_store.stats()
+        families += [
+            ("autisense_results_rows_total", "counter", "Hasil screening yang diterima penyimpanan hasil",
+             [({"result": "written"}, results["written"]), ({"result": "dropped"}, results["dropped"]),
+              ({"result": "error"}, results["errors"])]),
+            ("autisense_results_queue_depth", "gauge", "Hasil yang menunggu ditulis", [({}, results["queued"])]),
+        ]
+    return families
+
+
+metrics.REGISTRY.register_collector(collect_metrics)
 
-# Daftar pertanyaan gejala autisme
-pertanyaan = [
-    "👀 Menghindari kontak mata",
-    "🗣️ Terlambat bicara atau tidak berbicara",
-    "🔁 Sering mengulang kata atau gerakan (stimming)",
-    "🧏 Tidak merespons saat dipanggil namanya",
-    "🤝 Kesulitan berinteraksi atau bermain dengan anak lain"
-]
 
 # Fungsi prediksi utama
 def predict(image, gejala):
-    if image is None:
-        return "❗ Silakan upload gambar terlebih dahulu.", "", ""
+    return screener.predict(image, gejala)
 
-    try:
-        # Validasi gambar
-        if not isinstance(image, Image.Image):
-            return "❗ Format gambar tidak valid.", "", ""
-            
-        # Resize dan convert to array
-        image = image.resize((224, 224))
-        img_array = np.array(image)
-        
-        # Pastikan gambar memiliki 3 channel (RGB)
-        if len(img_array.shape) != 3 or img_array.shape[2] != 3:
-            return "❗ Gambar harus dalam format RGB.", "", ""
 
-        # Deteksi wajah menggunakan OpenCV
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-
-        if len(faces) == 0:
-            return (
-                "❌ Tidak terdeteksi wajah pada gambar.\n"
-                "Pastikan:\n"
-                "• Gambar menunjukkan wajah dengan jelas\n"
-                "• Wajah menghadap ke depan\n"
-                "• Pencahayaan cukup baik\n"
-                "• Format gambar JPG/PNG",
-                "", ""
-            )
-
-        # Proses gambar untuk prediksi
-        img_array = img_array.astype(np.float32) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-
-    except Exception as e:
-        return (
-            f"❌ Error memproses gambar: {str(e)}\n"
-            "Pastikan gambar dalam format yang valid (JPG/PNG).",
-            "", ""
-        )
-
-    # Prediksi CNN dengan error handling
+# Prediksi dari video (file upload/rekaman) atau sesi webcam live: (hasil, confidence, checklist, timeline)
+def predict_video(mode, video, live, gejala):
     try:
-        prediction = model.predict(img_array, verbose=0)
-        confidence = float(prediction[0][0])
-        pred_autism_from_image = confidence < 0.65
+        if mode == "video":
+            if video is None:
+                return "❗ Silakan upload video terlebih dahulu.", "", "", None
+            # Batas ukuran sama dengan endpoint API video
+            if os.path.getsize(video) > config.VIDEO_MAX_BYTES:
+                raise VideoError(f"Video melebihi batas {config.VIDEO_MAX_BYTES // (1024 * 1024)} MB")
+            analysis = stage_pools.video.run(video_analyzer.analyze_file, video)
+            source = "video"
+        else:
+            if live is None or not live.frames:
+                return "❗ Nyalakan webcam dan tunggu beberapa detik sebelum analisis.", "", "", None
+            analysis = live.finish()
+            source = "webcam"
+    except Overloaded:
+        metrics.SCREENINGS.inc(source="ui_video", outcome="busy")
+        return BUSY_MESSAGE, "", "", None
+    except VideoError as e:
+        metrics.SCREENINGS.inc(source="ui_video", outcome="invalid_image")
+        return f"❗ {e}", "", "", None
+    except ModelNotReady as e:
+        metrics.SCREENINGS.inc(source="ui_video", outcome="not_ready")
+        return str(e), "", "", None
     except Exception as e:
-        return (
-            f"❌ Error saat prediksi model: {str(e)}",
-            "", ""
-        )
+        # Error dari batch CNN (future.result()) tidak boleh menjatuhkan handler Gradio
+        metrics.SCREENINGS.inc(source="ui_video", outcome="error")
+        return f"❌ Error saat prediksi model: {str(e)}", "", "", None
+
+    metrics.SCREENINGS.inc(source=f"ui_{source}", outcome="no_face" if analysis.confidence is None else "ok")
+    hasil, confidence, checklist = format_video(analysis, gejala)
+    decision = None if analysis.confidence is None else decide(analysis.confidence, gejala)
+    screener.record_result(f"ui_{source}", decision, gejala, timings=analysis.throughput["stage_ms_total"])
+    timeline = pd.DataFrame(timeline_rows(analysis), columns=["waktu (detik)", "confidence"])
+    return hasil, confidence, checklist, timeline
+
+
+# Peta Grad-CAM wajah utama (gambar overlay, keterangan); hanya untuk analisis gambar
+def explain_image(image, mode):
+    if mode != "image":
+        return None, "ℹ️ Peta Grad-CAM hanya tersedia untuk analisis gambar."
+    try:
+        result, error = explainer.explain(image)
+    except Overloaded:
+        return None, BUSY_MESSAGE
+    if error:
+        return None, error
+    explanation, cached = result
+    return explanation.overlay, format_explanation(explanation, cached)
 
-    # Skor dari kuisioner
-    skor_gejala = len(gejala)
-    persen_gejala = (skor_gejala / len(pertanyaan)) * 100
-    pred_autism_from_form = persen_gejala >= 60    # Interpretasi hasil
-    if pred_autism_from_image and pred_autism_from_form:
-        hasil = "🔴 Tinggi Kemungkinan Autisme"
-        penjelasan = (
-            "Model mendeteksi kemungkinan autisme dari gambar wajah dan "
-            "gejala checklist juga mendukung. Segera konsultasi ke profesional."
-        )
-    elif pred_autism_from_image or pred_autism_from_form:
-        hasil = "🟠 Sedang / Perlu Observasi"
-        penjelasan = (
-            "Model atau checklist menunjukkan potensi gejala autisme. "
-            "Perlu pengamatan lebih lanjut atau konsultasi lanjutan."
-        )
-    else:
-        hasil = "🟢 Tidak Terindikasi Autisme"
-        penjelasan = (
-            "Model dan kuisioner tidak menunjukkan indikasi autisme. "
-            "Namun tetap pantau perkembangan anak secara berkala."
-        )
 
-    confidence_str = f"Confidence (Normal): {confidence:.2f} ({'Terdeteksi Autisme' if pred_autism_from_image else 'Normal'})"
-    checklist_str = f"Checklist Terpilih: {skor_gejala}/{len(pertanyaan)} → {persen_gejala:.0f}% kemungkinan Autisme"
-
-    hasil_akhir = (
-        f"{hasil}\n\n"
-        f"📷 Prediksi Gambar Wajah\n{confidence_str}\n\n"
-        f"📝 Hasil Kuisioner\n{checklist_str}\n\n"
-        f"📌 Kesimpulan\n{penjelasan}\n\n"
-        f"🔗 Konsultasi dan Penanganan Lebih Lanjut:\n"
-        f"- 👉 [Konsultasi Psikolog Anak - Halodoc](https://www.halodoc.com/cari-dokter/psikolog-anak)\n"
-        f"- 📖 [Penanganan Autisme - Halodoc](https://www.halodoc.com/kesehatan/autisme)"
-    )
+# gr.Image yang meneruskan path file upload tanpa decode; decode diperkecil + batas ukuran ada di ingest.py.
+# is_template: frontend tetap komponen Image bawaan Gradio
+class UploadImage(gr.Image):
+    is_template = True
+
+    def preprocess(self, payload):
+        return None if payload is None else str(payload.path)
 
-    return hasil_akhir, confidence_str, checklist_str
-
-# Custom CSS untuk styling per-page dengan warna yang mudah dibaca
-custom_css = """
-/* Background dan tema utama */
-.gradio-container {
-    background: linear-gradient(135deg, #a8c8ec 0%, #7faadb 50%, #5b8fd1 100%);
-    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-    min-height: 100vh;
-}
-
-/* Page containers */
-.page-container {
-    background: rgba(255, 255, 255, 0.98);
-    border-radius: 20px;
-    padding: 30px;
-    margin: 20px auto;
-    max-width: 900px;
-    box-shadow: 0 8px 25px rgba(0, 0, 0, 0.15);
-    text-align: center;
-}
-
-/* Header styling */
-.header-section {
-    text-align: center;
-    padding: 30px 20px;
-    background: white;
-    border-radius: 20px;
-    margin-bottom: 30px;
-    box-shadow: 0 5px 20px rgba(0, 0, 0, 0.1);
-}
-
-.logo-title {
-    color: #1a202c;
-    font-size: 3em;
-    font-weight: bold;
-    margin-bottom: 10px;
-    text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
-}
-
-.subtitle {
-    color: #2d3748;
-    font-size: 1.4em;
-    margin-bottom: 15px;
-    font-weight: 600;
-}
-
-.description {
-    color: #4a5568;
-    font-size: 1.1em;
-    line-height: 1.6;
-    max-width: 600px;
-    margin: 0 auto;
-}
-
-/* Content sections */
-.content-section {
-    background: white;
-    border-radius: 15px;
-    padding: 25px;
-    margin: 20px 0;
-    box-shadow: 0 3px 15px rgba(0, 0, 0, 0.1);
-    text-align: left;
-}
-
-.section-title {
-    color: white;
-    font-size: 1.5em;
-    font-weight: bold;
-    margin-bottom: 15px;
-    border-bottom: 2px solid #4299e1;
-    padding-bottom: 8px;
-    background: linear-gradient(45deg, #2b6cb0, #1a365d);
-    padding: 15px;
-    border-radius: 10px;
-    text-shadow: 1px 1px 2px rgba(0,0,0,0.3);
-}
-
-/* Illustration area */
-.illustration-area {
-    text-align: center;
-    padding: 40px 20px;
-    background: #f7fafc;
-    border-radius: 15px;
-    margin: 20px 0;
-}
-
-.illustration-text {
-    color: #4a5568;
-    font-size: 4em;
-    margin-bottom: 15px;
-}
-
-.illustration-caption {
-    color: #718096;
-    font-size: 1.1em;
-    font-weight: 500;
-}
-
-/* Warning dan info boxes */
-.warning-box {
-    background: #fef5e7;
-    border: 2px solid #ed8936;
-    border-radius: 12px;
-    padding: 20px;
-    margin: 20px 0;
-    color: #744210;
-    font-weight: 500;
-    text-align: left;
-}
-
-.info-box {
-    background: #ebf8ff;
-    border: 2px solid #4299e1;
-    border-radius: 12px;
-    padding: 20px;
-    margin: 20px 0;
-    color: #2c5282;
-    text-align: left;
-    font-weight: 500;
-}
-
-/* Footer styling */
-.footer-section {
-    text-align: center;
-    padding: 25px;
-    background: white;
-    border-radius: 15px;
-    margin-top: 30px;
-    box-shadow: 0 3px 15px rgba(0, 0, 0, 0.1);
-}
-
-.footer-title {
-    color: #1a202c;
-    font-size: 1.3em;
-    font-weight: bold;
-    margin-bottom: 15px;
-}
-
-.footer-link {
-    color: #2b6cb0 !important;
-    text-decoration: none;
-    font-weight: 700;
-    font-size: 1.1em;
-    transition: all 0.3s ease;
-    border-bottom: 2px solid transparent;
-}
-
-.footer-link:hover {
-    color: #1a365d !important;
-    border-bottom: 2px solid #2b6cb0;
-    text-shadow: 1px 1px 2px rgba(0,0,0,0.1);
-}
-
-/* Button styling yang lebih jelas */
-.btn, button {
-    background: linear-gradient(45deg, #2b6cb0, #1a365d) !important;
-    color: white !important;
-    border: none !important;
-    border-radius: 12px !important;
-    padding: 15px 30px !important;
-    font-size: 1.1em !important;
-    font-weight: bold !important;
-    margin: 10px !important;
-    transition: all 0.3s ease !important;
-    cursor: pointer !important;
-    box-shadow: 0 4px 15px rgba(43, 108, 176, 0.3) !important;
-    text-shadow: 1px 1px 2px rgba(0,0,0,0.2) !important;
-}
-
-.btn:hover, button:hover {
-    background: linear-gradient(45deg, #1a365d, #2c5282) !important;
-    transform: translateY(-2px) !important;
-    box-shadow: 0 6px 20px rgba(43, 108, 176, 0.4) !important;
-    color: white !important;
-}
-
-/* Primary button styling */
-.btn-primary, button[variant="primary"] {
-    background: linear-gradient(45deg, #2b6cb0, #1a365d) !important;
-    color: white !important;
-    font-weight: bold !important;
-    text-shadow: 1px 1px 2px rgba(0,0,0,0.3) !important;
-}
-
-/* Secondary button styling */
-.btn-secondary, button[variant="secondary"] {
-    background: linear-gradient(45deg, #4a5568, #2d3748) !important;
-    color: white !important;
-    font-weight: bold !important;
-    text-shadow: 1px 1px 2px rgba(0,0,0,0.3) !important;
-}
-
-/* Checkbox styling untuk lebih jelas */
-input[type="checkbox"] {
-    transform: scale(1.3);
-    margin-right: 10px;
-}
-
-/* Label untuk checkbox */
-.checkbox-group label {
-    color: #1a202c !important;
-    font-weight: 600 !important;
-    font-size: 1.1em !important;
-    cursor: pointer !important;
-    padding: 8px 12px !important;
-    border-radius: 8px !important;
-    transition: background-color 0.3s ease !important;
-}
-
-.checkbox-group label:hover {
-    background-color: #f7fafc !important;
-}
-
-/* Tab styling yang lebih jelas */
-.tab-nav button {
-    color: #1a202c !important;
-    font-weight: 600 !important;
-    background-color: #f7fafc !important;
-    border: 2px solid #e2e8f0 !important;
-}
-
-.tab-nav button.selected {
-    background-color: #2b6cb0 !important;
-    color: white !important;
-    border-color: #2b6cb0 !important;
-}
-
-/* Link dalam teks yang bisa diklik */
-a {
-    color: #2b6cb0 !important;
-    font-weight: 600 !important;
-    text-decoration: underline !important;
-}
-
-a:hover {
-    color: #1a365d !important;
-    text-shadow: 1px 1px 2px rgba(0,0,0,0.1) !important;
-}
-
-/* Upload area styling - PASTIKAN ICON TERLIHAT JELAS */
-.gr-form .gr-image,
-.gr-image-upload,
-.gr-image,
-.gradio-image {
-    background: transparent !important;
-    background-color: transparent !important;
-    border: none !important;
-    border-radius: 15px !important;
-    overflow: visible !important;
-    position: relative !important;
-    padding: 0 !important;
-}
-
-/* Hapus semua pseudo-elements yang bisa memberikan background */
-.gr-image-upload::before,
-.gr-image-upload::after,
-.gr-image::before,
-.gr-image::after {
-    display: none !important;
-    content: none !important;
-    background: none !important;
-}
-
-/* Drop zone tanpa background sama sekali */
-.gr-image-upload .drop-zone,
-.gr-image .drop-zone,
-.drop-zone {
-    background: transparent !important;
-    background-color: transparent !important;
-    border: none !important;
-    border-radius: 0 !important;
-    color: white !important;
-}
-
-/* Semua elemen child juga tanpa background */
-.gr-image-upload *,
-.gr-image * {
-    background: transparent !important;
-    background-color: transparent !important;
-}
-
-/* Icon upload, clipboard, dan web - STYLING ULTIMATE UNTUK VISIBILITY */
-.gr-image-upload svg,
-.gr-image-upload .icon,
-.gr-image-upload button svg,
-.gr-image-upload button .icon,
-.gr-image-upload button path,
-.gr-image-upload button use,
-.gr-image-upload button circle,
-.gr-image-upload button rect,
-.gr-image-upload button polygon,
-.gr-image svg,
-.gr-file-upload svg,
-.upload-area svg {
-    color: #ffffff !important;
-    fill: #ffffff !important;
-    stroke: #ffffff !important;
-    width: 24px !important;
-    height: 24px !important;
-    filter: drop-shadow(0 0 3px rgba(0,0,0,0.8)) !important;
-    z-index: 9999 !important;
-    position: relative !important;
-    opacity: 1 !important;
-    visibility: visible !important;
-    display: block !important;
-    pointer-events: auto !important;
-}
-
-/* Icon hover state */
-.gr-image-upload button:hover svg,
-.gr-image-upload button:hover .icon,
-.gr-image-upload button:hover path,
-.gr-image-upload button:hover use,
-.gr-image-upload button:hover circle,
-.gr-image-upload button:hover rect,
-.gr-image-upload button:hover polygon {
-    color: #f59e0b !important;
-    fill: #f59e0b !important;
-    stroke: #f59e0b !important;
-    filter: drop-shadow(0 0 5px rgba(245, 158, 11, 0.8)) !important;
-    opacity: 1 !important;
-}
-
-/* Override untuk semua kemungkinan selector icon */
-svg[data-name="folder"],
-svg[data-name="clipboard"],
-svg[data-name="camera"],
-svg[data-name="upload"],
-svg[data-name="web"],
-svg[data-name="file"],
-.gr-image-upload [data-testid*="icon"],
-.gr-image-upload [class*="icon"],
-.gr-image-upload .upload-icon,
-.gr-image-upload .file-icon,
-.gr-image-upload .clipboard-icon,
-.gr-image-upload .camera-icon {
-    color: white !important;
-    fill: white !important;
-    stroke: white !important;
-    z-index: 9999 !important;
-    opacity: 1 !important;
-    visibility: visible !important;
-    display: block !important;
-    filter: drop-shadow(0 0 3px rgba(0,0,0,0.8)) !important;
-}
-
-/* Styling untuk text dan label di upload area */
-.upload-text,
-.upload-icon,
-.file-upload svg,
-.file-upload .icon,
-.gr-image-upload .upload-text,
-.gr-image-upload .drop-text {
-    color: white !important;
-    fill: white !important;
-    text-shadow: 0 0 3px rgba(0,0,0,0.8) !important;
-    filter: drop-shadow(0 0 3px rgba(0,0,0,0.8)) !important;
-}
-
-/* Upload button dan icon styling */
-[data-testid="upload-button"],
-.gr-image-upload [data-testid="upload-button"] {
-    color: white !important;
-    background: rgba(43, 108, 176, 0.8) !important;
-    border: 1px solid white !important;
-}
-
-[data-testid="upload-button"]:hover,
-.gr-image-upload [data-testid="upload-button"]:hover {
-    background: rgba(26, 54, 93, 0.9) !important;
-    color: white !important;
-}
-
-[data-testid="upload-button"] svg,
-.gr-image-upload [data-testid="upload-button"] svg {
-    color: white !important;
-    fill: white !important;
-    filter: drop-shadow(0 0 3px rgba(0,0,0,0.8)) !important;
-}
-
-/* Button upload dengan styling khusus untuk icon file, clipboard, web */
-.gr-image-upload button[title*="file"],
-.gr-image-upload button[aria-label*="file"],
-.gr-image-upload button:nth-child(1),
-.gr-image-upload button:first-child {
-    background: transparent !important;
-    border: none !important;
-    color: white !important;
-    font-weight: normal !important;
-    text-shadow: none !important;
-    padding: 8px !important;
-}
-
-.gr-image-upload button[title*="clipboard"],
-.gr-image-upload button[aria-label*="clipboard"],
-.gr-image-upload button:nth-child(2) {
-    background: transparent !important;
-    border: none !important;
-    color: white !important;
-    font-weight: normal !important;
-    text-shadow: none !important;
-    padding: 8px !important;
-}
-
-.gr-image-upload button[title*="web"],
-.gr-image-upload button[aria-label*="web"],
-.gr-image-upload button:nth-child(3) {
-    background: transparent !important;
-    border: none !important;
-    color: white !important;
-    font-weight: normal !important;
-    text-shadow: none !important;
-    padding: 8px !important;
-}
-
-/* Hover effects sederhana untuk button upload */
-.gr-image-upload button[title*="file"]:hover,
-.gr-image-upload button:first-child:hover,
-.gr-image-upload button[title*="clipboard"]:hover,
-.gr-image-upload button:nth-child(2):hover,
-.gr-image-upload button[title*="web"]:hover,
-.gr-image-upload button:nth-child(3):hover {
-    background: rgba(255, 255, 255, 0.1) !important;
-    transform: none !important;
-    box-shadow: none !important;
-    color: #f59e0b !important;
-}
-
-/* Pastikan semua SVG dalam button upload terlihat */
-.gr-image-upload button svg {
-    color: white !important;
-    fill: white !important;
-    stroke: white !important;
-    opacity: 1 !important;
-    visibility: visible !important;
-    display: block !important;
-    z-index: 10000 !important;
-    filter: drop-shadow(0 0 2px rgba(0,0,0,0.8)) !important;
-}
-
-.gr-image-upload button:hover svg {
-    color: #f59e0b !important;
-    fill: #f59e0b !important;
-    stroke: #f59e0b !important;
-    filter: drop-shadow(0 0 3px rgba(245, 158, 11, 0.8)) !important;
-}
-
-/* Result text styling */
-.result-text {
-    color: #1a202c !important;
-    font-size: 1em !important;
-    line-height: 1.6 !important;
-    font-weight: 500 !important;
-}
-
-/* Result section headers - make them bold */
-.result-text:has-text("Prediksi Gambar Wajah"),
-.result-text:has-text("Hasil Kuisioner"),
-.result-text:has-text("Kesimpulan") {
-    font-weight: 700 !important;
-}
-"""
+# CSS dan potongan HTML halaman dilayani sebagai file statis ber-versi (lihat assets.py)
+static_assets = load_bundle()
 
 # Gradio Interface dengan layout per-page
-with gr.Blocks(css=custom_css, title="🧠 Autisense - Deteksi Dini Autisme", theme=gr.themes.Soft()) as iface:
+with gr.Blocks(head=static_assets.head(), title="🧠 Autisense - Deteksi Dini Autisme", theme=gr.themes.Soft()) as iface:
     
     # PAGE 1: HALAMAN UTAMA (HOME)
-    with gr.Group(visible=True) as home_page:
-        gr.HTML("""
-        <div class="page-container">
-            <div class="header-section">
-                <div class="logo-title">🧠 Autisense</div>
-                <div class="subtitle">Deteksi Dini Autisme pada Anak</div>
-                <div class="description">
-                    Aplikasi AI untuk screening awal potensi autisme melalui analisis wajah dan kuisioner gejala
-                </div>
-            </div>
-            
-            <div class="illustration-area">
-                <div class="illustration-text">👶👧👦</div>
-                <div class="illustration-caption">Bantu deteksi dini autisme pada anak dengan teknologi AI</div>
-            </div>
-              <div class="info-box">
-                <strong style="color: #1a365d; font-size: 1.2em;">ℹ️ Tentang Aplikasi:</strong><br><br>
-                <span style="color: #2d3748; font-weight: 500;">
-                Autisense menggunakan kecerdasan buatan untuk membantu deteksi dini autisme pada anak melalui:
-                <br>• Analisis gambar wajah dengan model CNN
-                <br>• Kuisioner gejala-gejala umum autisme
-                </span>
-            </div>
-        </div>
-        """)
+    with gr.Group(elem_id="page-home", elem_classes=["app-page", "active-page"]) as home_page:
+        gr.HTML(static_assets.include("pages/home.html"))
         
         with gr.Row():
             start_button = gr.Button("🚀 MULAI", variant="primary", size="lg")
             info_button = gr.Button("📚 Tentang Autisme", variant="secondary", size="lg")
     
     # PAGE 2: HALAMAN UPLOAD GAMBAR
-    with gr.Group(visible=False) as upload_page:
-        gr.HTML("""
-        <div class="page-container">
-            <div class="header-section">
-                <div class="logo-title">📷 Upload Gambar</div>
-                <div class="subtitle">Wajah Anak</div>                <div class="description">
-                    Upload gambar wajah anak untuk analisis dengan model AI
-                </div>
-            </div>
-        </div>
-        """)
+    with gr.Group(elem_id="page-upload", elem_classes="app-page") as upload_page:
+        gr.HTML(static_assets.include("pages/upload.html"))
         
         with gr.Row():
             with gr.Column():
                 gr.HTML('<div class="content-section">')
                 gr.Markdown('<div class="section-title">📁 Pilih Gambar</div>')
-                image_input = gr.Image(
-                    type="pil", 
-                    label="Upload gambar wajah anak (format JPG/PNG)",
-                    height=400
-                )
+                with gr.Tabs():
+                    with gr.Tab("📷 Gambar") as image_tab:
+                        image_input = UploadImage(
+                            type="filepath",
+                            label="Upload gambar wajah anak (format JPG/PNG)",
+                            height=400
+                        )
+                    # Video pendek (upload atau rekam): skor rata-rata dari banyak frame
+                    with gr.Tab("🎥 Video") as video_tab:
+                        video_input = gr.Video(
+                            sources=["upload", "webcam"],
+                            include_audio=True,
+                            label="Upload atau rekam video pendek wajah anak (MP4/WebM)",
+                            height=400
+                        )
+                    # Webcam live: frame dianalisis selama streaming, hasil diambil saat tombol analisis
+                    with gr.Tab("📹 Webcam Live") as webcam_tab:
+                        webcam_input = gr.Image(
+                            sources=["webcam"],
+                            streaming=True,
+                            type="numpy",
+                            label="Arahkan kamera ke wajah anak",
+                            height=400
+                        )
+                        webcam_status = gr.Markdown("🎥 Nyalakan webcam untuk memulai analisis live")
                 gr.HTML('</div>')
                 
-                gr.HTML("""
-                <div class="warning-box">
-                    <strong style="color: #744210; font-size: 1.1em;">⚠️ Panduan Upload:</strong><br>
-                    <span style="color: #744210; font-weight: 500;">
-                    • Pastikan gambar menunjukkan wajah dengan jelas<br>
-                    • Wajah menghadap ke depan<br>
-                    • Pencahayaan cukup baik<br>
-                    • Format JPG atau PNG
-                    </span>
-                </div>
-                """)
+                gr.HTML(static_assets.include("pages/upload_guide.html"))
         
         with gr.Row():
             back_to_home = gr.Button("⬅️ Kembali", variant="secondary", size="lg")
             to_questionnaire = gr.Button("Lanjutkan ➡️", variant="primary", size="lg")
     
     # PAGE 3: HALAMAN KUISIONER
-    with gr.Group(visible=False) as questionnaire_page:
-        gr.HTML("""
-        <div class="page-container">
-            <div class="header-section">
-                <div class="logo-title">📝 Kuisioner</div>
-                <div class="subtitle">Checklist Gejala Autisme</div>
-                <div class="description">
-                    Pilih gejala yang sesuai dengan kondisi anak Anda
-                </div>
-            </div>
-        </div>
-        """)
+    with gr.Group(elem_id="page-questionnaire", elem_classes="app-page") as questionnaire_page:
+        gr.HTML(static_assets.include("pages/questionnaire.html"))
         
         with gr.Row():
             with gr.Column():
@@ -695,18 +292,8 @@ with gr.Blocks(css=custom_css, title="🧠 Autisense - Deteksi Dini Autisme", th
             analyze_button = gr.Button("🔍 Analisis Sekarang", variant="primary", size="lg")
     
     # PAGE 4: HALAMAN HASIL DETEKSI
-    with gr.Group(visible=False) as results_page:
-        gr.HTML("""
-        <div class="page-container">
-            <div class="header-section">
-                <div class="logo-title">🧠 Hasil Deteksi</div>
-                <div class="subtitle">Analisis Lengkap</div>
-                <div class="description">
-                    Hasil prediksi berdasarkan gambar dan kuisioner
-                </div>
-            </div>
-        </div>
-        """)
+    with gr.Group(elem_id="page-results", elem_classes="app-page") as results_page:
+        gr.HTML(static_assets.include("pages/results.html"))
         
         with gr.Row():
             with gr.Column():
@@ -720,13 +307,22 @@ with gr.Blocks(css=custom_css, title="🧠 Autisense - Deteksi Dini Autisme", th
                 )
                 gr.HTML('</div>')
                 
-                with gr.Tabs():
-                    with gr.Tab("📊 Analisis Gambar"):
+                with gr.Tabs() as result_tabs:
+                    with gr.Tab("📊 Analisis Gambar", id="analysis"):
                         confidence_output = gr.Textbox(
                             label="Confidence Score",
                             lines=4,
                             elem_classes="result-text"
                         )
+
+                    # Dihitung hanya saat tab ini dibuka (tab pertama selalu aktif saat hasil tampil)
+                    with gr.Tab("🔥 Peta Grad-CAM", visible=config.EXPLAIN) as explain_tab:
+                        explain_output = gr.Image(
+                            label="Area wajah yang paling mempengaruhi skor model",
+                            interactive=False,
+                            height=config.EXPLAIN_SIZE
+                        )
+                        explain_status = gr.Markdown()
                     
                     with gr.Tab("📝 Skor Kuisioner"):
                         checklist_output = gr.Textbox(
@@ -734,188 +330,205 @@ with gr.Blocks(css=custom_css, title="🧠 Autisense - Deteksi Dini Autisme", th
                             lines=4,
                             elem_classes="result-text"
                         )
+
+                    # Confidence per frame (mode video/webcam)
+                    with gr.Tab("🎞️ Timeline Video"):
+                        timeline_output = gr.LinePlot(
+                            x="waktu (detik)",
+                            y="confidence",
+                            y_lim=[0, 1],
+                            label="Confidence per frame"
+                        )
         
-        gr.HTML("""
-        <div class="footer-section">
-            <div class="footer-title">🔗 Konsultasi Lebih Lanjut</div>
-            <p style="color: #2d3748; font-size: 1.1em; line-height: 1.6;">
-                <a href="https://www.halodoc.com/cari-dokter/psikolog-anak" target="_blank" class="footer-link">
-                    👉 Konsultasi Psikolog Anak - Halodoc
-                </a><br><br>
-                <a href="https://www.halodoc.com/kesehatan/autisme" target="_blank" class="footer-link">
-                    📖 Informasi Penanganan Autisme
-                </a>
-            </p>
-        </div>
-        """)
+        gr.HTML(static_assets.include("pages/results_footer.html"))
         
         with gr.Row():
             restart_button = gr.Button("🔄 Analisis Baru", variant="primary", size="lg")
     
     # PAGE 5: HALAMAN INFORMASI AUTISME
-    with gr.Group(visible=False) as info_page:
-        gr.HTML("""
-        <div class="page-container">
-            <div class="header-section">
-                <div class="logo-title">📚 Mengenal Autisme</div>
-                <div class="subtitle">Informasi Penting</div>
-            </div>
-            
-            <div class="content-section">
-                <div class="section-title">🎯 Apa itu Autisme?</div>
-                <div style="color: #2d3748; font-size: 1.1em; line-height: 1.6;">
-                    Autisme adalah gangguan perkembangan neurobiologis yang mempengaruhi komunikasi, 
-                    interaksi sosial, dan perilaku anak. Deteksi dini sangat penting untuk memberikan 
-                    intervensi yang tepat.
-                </div>
-            </div>
-            
-            <div class="content-section">
-                <div class="section-title">🔍 Gejala Umum Autisme:</div>
-                <div style="color: #2d3748; font-size: 1.1em; line-height: 1.8;">
-                    • Kesulitan komunikasi verbal dan non-verbal<br>
-                    • Menghindari kontak mata<br>
-                    • Perilaku repetitif (stimming)<br>
-                    • Kesulitan berinteraksi sosial<br>
-                    • Keterlambatan perkembangan bicara<br>
-                    • Sensitivitas terhadap suara, cahaya, atau tekstur
-                </div>
-            </div>
-            
-            <div class="content-section">
-                <div class="section-title">💡 Penanganan dan Terapi:</div>
-                <div style="color: #2d3748; font-size: 1.1em; line-height: 1.8;">
-                    • Terapi perilaku (ABA - Applied Behavior Analysis)<br>
-                    • Terapi wicara dan bahasa<br>
-                    • Terapi okupasi<br>
-                    • Pendidikan khusus<br>
-                    • Dukungan keluarga dan lingkungan
-                </div>
-            </div>
-              <div class="warning-box">
-                <strong style="color: #744210; font-size: 1.2em;">⚠️ Penting untuk Diingat:</strong><br><br>
-                <span style="color: #744210; font-weight: 500;">
-                Setiap anak dengan autisme adalah unik. Diagnosis dan penanganan harus dilakukan 
-                oleh profesional yang berpengalaman. Aplikasi ini hanya sebagai alat screening awal.
-                </span>
-            </div>
-        </div>
-        """)
+    with gr.Group(elem_id="page-info", elem_classes="app-page") as info_page:
+        gr.HTML(static_assets.include("pages/info.html"))
         
         back_to_main = gr.Button("⬅️ Kembali ke Beranda", variant="secondary", size="lg")
     
-    # FUNGSI NAVIGASI ANTAR HALAMAN
-    def show_upload_page():
-        return (
-            gr.update(visible=False),  # home_page
-            gr.update(visible=True),   # upload_page  
-            gr.update(visible=False),  # questionnaire_page
-            gr.update(visible=False),  # results_page
-            gr.update(visible=False)   # info_page
-        )
-    
-    def show_questionnaire_page():
-        return (
-            gr.update(visible=False),  # home_page
-            gr.update(visible=False),  # upload_page
-            gr.update(visible=True),   # questionnaire_page
-            gr.update(visible=False),  # results_page
-            gr.update(visible=False)   # info_page
-        )
-    
-    def show_results_page():
-        return (
-            gr.update(visible=False),  # home_page
-            gr.update(visible=False),  # upload_page
-            gr.update(visible=False),  # questionnaire_page
-            gr.update(visible=True),   # results_page
-            gr.update(visible=False)   # info_page
-        )
-    
-    def show_home_page():
-        return (
-            gr.update(visible=True),   # home_page
-            gr.update(visible=False),  # upload_page
-            gr.update(visible=False),  # questionnaire_page
-            gr.update(visible=False),  # results_page
-            gr.update(visible=False)   # info_page
-        )
-    
-    def show_info_page():
-        return (
-            gr.update(visible=False),  # home_page
-            gr.update(visible=False),  # upload_page
-            gr.update(visible=False),  # questionnaire_page
-            gr.update(visible=False),  # results_page
-            gr.update(visible=True)    # info_page
-        )
-    
-    def analyze_and_show_results(image, gejala):
-        hasil, confidence, checklist = predict(image, gejala)
-        
+    # Halaman tujuan setelah analisis, dibaca oleh navigasi di browser
+    page_target = gr.Textbox(visible=False)
+    # Sumber analisis (tab yang aktif) dan sesi webcam live milik tiap user
+    input_mode = gr.State("image")
+    live_session = gr.State(None)
+
+    # FUNGSI NAVIGASI ANTAR HALAMAN (berjalan di browser, tanpa request ke server)
+    SHOW_PAGE_JS = (
+        "(page) => { document.querySelectorAll('.app-page').forEach("
+        "(el) => el.classList.toggle('active-page', el.id === 'page-' + page)); "
+        "window.scrollTo(0, 0); }"
+    )
+
+    def show_page_js(page):
+        return f"() => ({SHOW_PAGE_JS})('{page}')"
+
+    def analyze_and_show_results(image, gejala, mode, video, live):
+        # Model belum siap: tetap di halaman kuisioner dan beri tahu user
+        if not model_service.ready:
+            gr.Warning(model_service.status_message())
+            return (
+                gr.update(),      # result_output
+                gr.update(),      # confidence_output
+                gr.update(),      # checklist_output
+                gr.update(),      # timeline_output
+                gr.update(),      # result_tabs
+                gr.update(),      # explain_output
+                gr.update(),      # explain_status
+                live,             # live_session
+                "questionnaire"   # page_target
+            )
+
+        timeline = None
+        if mode == "image":
+            with metrics.trace("ui_analyze"):
+                hasil, confidence, checklist = predict(image, gejala)
+        else:
+            with metrics.trace("ui_video"):
+                hasil, confidence, checklist, timeline = predict_video(mode, video, live, gejala)
+            # Sesi webcam selesai dianalisis; streaming berikutnya memulai sesi baru
+            live = None
+
         return (
-            gr.update(visible=False),  # home_page
-            gr.update(visible=False),  # upload_page
-            gr.update(visible=False),  # questionnaire_page
-            gr.update(visible=True),   # results_page
-            gr.update(visible=False),  # info_page
-            hasil,                     # result_output
-            confidence,                # confidence_output
-            checklist                  # checklist_output
+            hasil,       # result_output
+            confidence,  # confidence_output
+            checklist,   # checklist_output
+            timeline,    # timeline_output
+            # Hasil baru: kembali ke tab pertama, peta lama dihapus (dihitung lagi saat tab dibuka)
+            gr.Tabs(selected="analysis"),  # result_tabs
+            None,        # explain_output
+            "",          # explain_status
+            live,        # live_session
+            "results"    # page_target
         )
-    
+
+    def stream_webcam(frame, live):
+        if frame is None or not model_service.ready:
+            return live, gr.update()
+        # Sesi yang sudah selesai dianalisis tidak menerima frame lagi; streaming berikutnya memulai sesi baru
+        if live is None or live.finished is not None:
+            live = video_analyzer.live_session()
+        try:
+            live.push(frame)
+        except Overloaded:
+            # Antrian penuh: frame ini dilewati, streaming tetap jalan
+            return live, "⏳ Server sibuk, sebagian frame dilewati"
+        except Exception as e:
+            return live, f"❌ Error saat prediksi model: {str(e)}"
+        return live, live_status(live)
+
+    def start_speculative_analysis(image, request: gr.Request):
+        if not config.SPECULATIVE:
+            return
+        if image is None:
+            speculative.cancel(request.session_hash)
+        else:
+            speculative.start(request.session_hash, image)
+
     # EVENT HANDLERS
-    start_button.click(
-        show_upload_page,
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page]
+    # Upload/ganti/hapus gambar: analisis dimulai di latar belakang selama user mengisi kuisioner
+    image_input.change(
+        start_speculative_analysis,
+        inputs=[image_input],
+        outputs=None,
+        queue=False,
+        show_progress="hidden"
     )
-    
-    to_questionnaire.click(
-        show_questionnaire_page,
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page]
+
+    # Tab yang aktif menentukan sumber analisis
+    image_tab.select(lambda: "image", outputs=input_mode, queue=False, show_progress="hidden")
+    video_tab.select(lambda: "video", outputs=input_mode, queue=False, show_progress="hidden")
+    webcam_tab.select(lambda: "webcam", outputs=input_mode, queue=False, show_progress="hidden")
+
+    # Frame webcam yang datang saat frame sebelumnya masih dianalisis dilewati (always_last)
+    webcam_input.stream(
+        stream_webcam,
+        inputs=[webcam_input, live_session],
+        outputs=[live_session, webcam_status],
+        trigger_mode="always_last",
+        show_progress="hidden",
+        concurrency_limit=config.ANALYZE_CONCURRENCY,
+        concurrency_id="webcam",
     )
-    
+
+    start_button.click(None, js=show_page_js("upload"))
+    to_questionnaire.click(None, js=show_page_js("questionnaire"))
+
+    # Hanya analisis yang ke server; perpindahan ke halaman hasil dilakukan di browser
     analyze_button.click(
         analyze_and_show_results,
-        inputs=[image_input, checkbox_input],
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page, 
-                result_output, confidence_output, checklist_output]
+        inputs=[image_input, checkbox_input, input_mode, video_input, live_session],
+        outputs=[result_output, confidence_output, checklist_output, timeline_output,
+                 result_tabs, explain_output, explain_status, live_session, page_target],
+        # Beberapa sesi harus bisa menunggu bersamaan agar scheduler bisa membentuk batch;
+        # pekerjaan beratnya sendiri dibatasi oleh pool deteksi wajah dan antrian inferensi
+        concurrency_limit=config.ANALYZE_CONCURRENCY,
+        concurrency_id="analyze",
+    ).then(None, inputs=[page_target], js=SHOW_PAGE_JS)
+
+    # Grad-CAM dihitung saat tab dibuka, bukan di setiap analisis
+    explain_tab.select(
+        explain_image,
+        inputs=[image_input, input_mode],
+        outputs=[explain_output, explain_status],
+        concurrency_limit=config.ANALYZE_CONCURRENCY,
+        concurrency_id="explain",
     )
-    
+
     # Tombol navigasi
-    back_to_home.click(
-        show_home_page,
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page]
-    )
-    
-    back_to_upload.click(
-        show_upload_page,
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page]
-    )
-    
-    restart_button.click(
-        show_home_page,
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page]
-    )
-    
-    info_button.click(
-        show_info_page,
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page]
-    )
-    
-    back_to_main.click(
-        show_home_page,
-        outputs=[home_page, upload_page, questionnaire_page, results_page, info_page]
-    )
+    back_to_home.click(None, js=show_page_js("home"))
+    back_to_upload.click(None, js=show_page_js("upload"))
+    restart_button.click(None, js=show_page_js("home"))
+    info_button.click(None, js=show_page_js("info"))
+    back_to_main.click(None, js=show_page_js("home"))
+
+# Antrian event dibatasi: jika penuh, user langsung diberi tahu daripada menunggu tanpa batas
+iface.queue(max_size=config.UI_QUEUE_MAX_SIZE)
 
 if __name__ == "__main__":
+    import uvicorn
+
+    from api import create_api_router
+    from server import create_app
+
     print("🚀 Memulai Autisense - Aplikasi deteksi autisme...")
-    print(f"📍 Model dimuat dari: {model_path}")
-    print("🌐 Aplikasi akan berjalan di localhost")
+    print(f"📍 Backend model: {config.BACKEND} (dimuat di latar belakang)")
+    if config.TUNING["applied"]:
+        settings = ", ".join(f"{k.removeprefix('AUTISENSE_')}={v}" for k, v in config.TUNING["settings"].items())
+        print(f"🎛️ Profil tuning diterapkan ({config.TUNING['path']}): {settings}")
+    elif "reason" in config.TUNING:
+        print(f"⚠️ Profil tuning {config.TUNING['path']} tidak dipakai: {config.TUNING['reason']}")
+    print(f"🌐 Aplikasi akan berjalan di http://{config.HOST}:{config.PORT}")
+    print("🩺 Health check: /healthz (liveness), /readyz (readiness), statistik: /stats, metrik: /metrics")
+    print("🔌 API JSON: POST /api/v1/screen, POST /api/v1/screen/bulk, POST /api/v1/screen/video")
+    if tta:
+        print(f"🪞 TTA aktif: {tta.size} varian per wajah ({', '.join(tta.variants)}), agregasi {tta.aggregate_method}")
+        if tta.size > config.MAX_BATCH_SIZE:
+            print(f"⚠️ AUTISENSE_MAX_BATCH_SIZE ({config.MAX_BATCH_SIZE}) < jumlah varian TTA, satu wajah terbagi beberapa forward pass")
+    if results_store:
+        print(f"🗄️ Hasil screening disimpan ke: {results_store.path}")
     print("🎨 Menggunakan tampilan per-page sesuai desain")
-    
-    iface.launch(
-        server_name="127.0.0.1",
-        share=False,
-        debug=True
+    print(f"📦 Micro-batching: maks {config.MAX_BATCH_SIZE} gambar/batch, tunggu maks {config.MAX_WAIT_MS:.0f} ms")
+    print(
+        f"🧵 Worker: decode {config.DECODE_WORKERS}, deteksi wajah {config.FACE_WORKERS}, "
+        f"analisis bersamaan {config.ANALYZE_CONCURRENCY}, antrian UI maks {config.UI_QUEUE_MAX_SIZE}"
+    )
+
+    app = create_app(
+        iface,
+        model_service,
+        collect_stats,
+        # API JSON memakai screener (model, scheduler, cache) yang sama dengan UI
+        routers=[
+            create_api_router(
+                screener, model_service, decode_pool=stage_pools.decode,
+                video_analyzer=video_analyzer, video_pool=stage_pools.video,
+            ),
+            create_static_router(static_assets),
+        ],
     )
+    uvicorn.run(app, host=config.HOST, port=config.PORT)
@@ -0,0 +1,317 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from fastapi import APIRouter, Request
+from fastapi.responses import Response
+
+import config
+
+# Brotli opsional (pip install brotli); tanpa modul ini hanya varian gzip yang dibuat
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+URL_PREFIX = "/app-static"
+MANIFEST_NAME = "manifest.json"
+# Naikkan jika cara build berubah, agar hasil build lama dibuat ulang
+BUILD_FORMAT = "autisense-static-v1"
+MEDIA_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+def gradio_version():
+    import gradio
+
+    return gradio.__version__
+
+
+def _css_rules(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    if "@" in text:
+        raise ValueError("At-rule CSS (@media, @import, ...) belum didukung build aset")
+    for match in re.finditer(r"([^{}]+)\{([^{}]*)\}", text):
+        yield match.group(1), match.group(2)
+
+
+def minify_css(text, scope=None):
+    """Minify CSS (aturan datar tanpa at-rule). scope: awalan selector tambahan untuk tiap aturan.
+
+    CSS dari parameter css= Gradio dipasang dua kali oleh frontend: selector asli dan selector
+    berawalan `gradio-app .gradio-container.gradio-container-<versi> .contain` (spesifisitas lebih
+    tinggi). Dengan scope yang sama hasil stylesheet eksternal tampil identik.
+    """
+    rules = []
+    for selector, body in _css_rules(text):
+        selectors = [re.sub(r"\s*([>+~])\s*", r"\1", " ".join(s.split())) for s in selector.split(",")]
+        if scope:
+            selectors += [f"{scope} {s}" for s in selectors]
+        declarations = []
+        for declaration in body.split(";"):
+            if ":" not in declaration:
+                continue
+            name, value = declaration.split(":", 1)
+            value = re.sub(r"\s*!\s*important", "!important", " ".join(value.split()))
+            value = re.sub(r",\s+", ",", value)
+            declarations.append(f"{name.strip()}:{value}")
+        rules.append(f"{','.join(selectors)}{{{';'.join(declarations)}}}")
+    return "".join(rules)
+
+
+def minify_html(text):
+    """Hapus komentar dan spasi indentasi; spasi di antara elemen dalam satu baris dipertahankan."""
+    text = re.sub(r"<!--.*?-->", "", text, flags=re.S)
+    text = re.sub(r">\s*\n\s*<", "><", text)
+    return " ".join(text.split())
+
+
+def minify_js(text):
+    """Minify konservatif: hapus baris komentar dan indentasi (tanpa mengubah token)."""
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def _sources():
+    """Path relatif semua sumber aset (app.css, app.js, pages/*.html)."""
+    found = []
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for name in files:
+            if os.path.splitext(name)[1] in MEDIA_TYPES:
+                found.append(os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/"))
+    return sorted(found)
+
+
+def sources_digest(version=None):
+    digest = hashlib.sha256(f"{BUILD_FORMAT}\0{version or gradio_version()}".encode())
+    for name in _sources():
+        with open(os.path.join(STATIC_DIR, name), "rb") as f:
+            digest.update(f"\0{name}\0".encode() + f.read())
+    return digest.hexdigest()
+
+
+def _transform(name, text, version):
+    ext = os.path.splitext(name)[1]
+    if ext == ".css":
+        return minify_css(text, scope=f"gradio-app .gradio-container.gradio-container-{version.replace('.', '-')} .contain")
+    if ext == ".html":
+        return minify_html(text)
+    return minify_js(text)
+
+
+def compile_assets(version=None):
+    """(manifest, {nama ber-hash: {encoding: bytes}}) dari semua sumber; tidak menulis apa pun ke disk."""
+    version = version or gradio_version()
+    files, outputs = {}, {}
+    for name in _sources():
+        with open(os.path.join(STATIC_DIR, name), encoding="utf-8") as f:
+            source = f.read()
+        data = _transform(name, source, version).encode("utf-8")
+        etag = hashlib.sha256(data).hexdigest()[:16]
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{etag}{ext}"
+        entry = {"file": hashed, "etag": etag, "source_bytes": len(source.encode("utf-8")), "bytes": len(data)}
+        variants = {"identity": data}
+        compressed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(data, quality=11)
+        for encoding, payload in compressed.items():
+            # Varian terkompresi hanya disimpan jika memang lebih kecil
+            if len(payload) < len(data):
+                variants[encoding] = payload
+                entry[f"{encoding}_bytes"] = len(payload)
+        files[name] = entry
+        outputs[hashed] = variants
+
+    manifest = {"format": BUILD_FORMAT, "gradio_version": version, "sources_sha256": sources_digest(version),
+                "files": files}
+    return manifest, outputs
+
+
+def build(out_dir=DIST_DIR):
+    """Minify semua sumber ke out_dir dengan nama ber-hash isi + varian gzip/brotli, tulis manifest.
+
+    Hasil ditulis ke folder sementara di sebelah out_dir lalu dipindah dengan os.replace, sehingga
+    pembaca tidak pernah melihat build setengah jadi.
+    """
+    manifest, outputs = compile_assets()
+    out_dir = os.path.abspath(out_dir)
+    parent = os.path.dirname(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{os.path.basename(out_dir)}-", dir=parent)
+    old = None
+    try:
+        for hashed, variants in outputs.items():
+            path = os.path.join(tmp, hashed)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            for encoding, data in variants.items():
+                with open(path if encoding == "identity" else f"{path}.{encoding}", "wb") as f:
+                    f.write(data)
+        with open(os.path.join(tmp, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+        # mkdtemp membuat folder 0700; hasil build harus terbaca oleh user server
+        os.chmod(tmp, 0o755)
+        # os.replace tidak bisa menimpa folder yang berisi: build lama disingkirkan dulu, dihapus setelahnya
+        if os.path.exists(out_dir):
+            old = f"{tmp}.old"
+            os.replace(out_dir, old)
+        os.replace(tmp, out_dir)
+    except BaseException:
+        if old is not None and not os.path.exists(out_dir):
+            os.replace(old, out_dir)
+            old = None
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    finally:
+        if old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(out_dir=DIST_DIR):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_build(out_dir, manifest):
+    """{nama ber-hash: {encoding: bytes}} dari hasil build di disk."""
+    outputs = {}
+    for entry in manifest["files"].values():
+        path = os.path.join(out_dir, entry["file"])
+        with open(path, "rb") as f:
+            variants = {"identity": f.read()}
+        for encoding in ("br", "gzip"):
+            if f"{encoding}_bytes" in entry:
+                with open(f"{path}.{encoding}", "rb") as f:
+                    variants[encoding] = f.read()
+        outputs[entry["file"]] = variants
+    return outputs
+
+
+def load_bundle(out_dir=DIST_DIR):
+    """StaticBundle dari hasil `python assets.py build` jika masih sesuai sumber dan versi Gradio.
+
+    Jika belum ada atau usang, aset di-build di memori saja: start server tidak pernah menulis ke
+    folder source (aman untuk deployment read-only dan banyak worker yang start bersamaan).
+    """
+    manifest = read_manifest(out_dir)
+    if manifest is not None and manifest.get("sources_sha256") == sources_digest():
+        try:
+            return StaticBundle(manifest, read_build(out_dir, manifest))
+        except OSError as e:
+            print(f"⚠️ Hasil build aset di {out_dir} tidak lengkap ({e})")
+    manifest, outputs = compile_assets()
+    print(f"🗜️ Aset statis di-build di memori: {format_sizes(manifest)} (build ke disk: python assets.py build)")
+    return StaticBundle(manifest, outputs)
+
+
+def format_sizes(manifest):
+    files = manifest["files"].values()
+    minified = sum(e["bytes"] for e in files)
+    compressed = sum(e.get("br_bytes", e.get("gzip_bytes", e["bytes"])) for e in files)
+    return f"{len(manifest['files'])} file, {minified / 1024:.1f} KB minified ({compressed / 1024:.1f} KB terkompresi)"
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+# Aset hasil build di memori (total hanya puluhan KB), dilayani dengan ETag, Cache-Control dan kompresi
+class StaticBundle:
+    def __init__(self, manifest, outputs):
+        self.manifest = manifest
+        self._files = {}
+        for name, entry in manifest["files"].items():
+            variants = outputs[entry["file"]]
+            media_type = MEDIA_TYPES[os.path.splitext(name)[1]]
+            # Nama ber-hash tidak pernah berubah isinya (cache selamanya); nama logis harus divalidasi ulang
+            self._files[entry["file"]] = (entry["etag"], media_type, variants, True)
+            self._files[name] = (entry["etag"], media_type, variants, False)
+
+    def url(self, name):
+        return f"{URL_PREFIX}/{self.manifest['files'][name]['file']}"
+
+    def head(self):
+        """Tag <head>: stylesheet dan skrip pemuat potongan HTML (versi ber-hash)."""
+        return (
+            f'<link rel="stylesheet" href="{self.url("app.css")}">'
+            f'<script src="{self.url("app.js")}" defer></script>'
+        )
+
+    def include(self, name):
+        """Placeholder gr.HTML yang diisi app.js dari file HTML statis."""
+        return f'<div data-include="{self.url(name)}"></div>'
+
+    def response(self, path, headers):
+        if path not in self._files:
+            return Response(status_code=404)
+        etag, media_type, variants, immutable = self._files[path]
+        accepted = _accepted_encodings(headers.get("accept-encoding"))
+        encoding = next((e for e in ("br", "gzip") if e in variants and e in accepted), "identity")
+        tag = f'"{etag}"' if encoding == "identity" else f'"{etag}-{encoding}"'
+        response_headers = {
+            "ETag": tag,
+            "Cache-Control": f"public, max-age={config.STATIC_MAX_AGE}, immutable" if immutable else "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = headers.get("if-none-match")
+        if if_none_match:
+            tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+            if tag in tags or "*" in tags:
+                return Response(status_code=304, headers=response_headers)
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+        return Response(variants[encoding], media_type=media_type, headers=response_headers)
+
+
+def create_static_router(bundle):
+    router = APIRouter(include_in_schema=False)
+
+    @router.get(URL_PREFIX + "/{path:path}")
+    def static_file(path: str, request: Request):
+        return bundle.response(path, request.headers)
+
+    return router
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aset statis UI (static/)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="Minify + nama ber-hash + varian gzip/brotli ke static/dist")
+    build_parser.add_argument("--output", default=DIST_DIR)
+    args = parser.parse_args()
+    manifest = build(args.output)
+    for name, entry in manifest["files"].items():
+        compressed = entry.get("br_bytes", entry.get("gzip_bytes"))
+        print(f"   {name}: {entry['source_bytes']} → {entry['bytes']} B"
+              + (f" ({compressed} B terkompresi)" if compressed else "") + f" → {entry['file']}")
+    print(f"✅ {format_sizes(manifest)}")
+
+
+if __name__ == "__main__":
+    main()
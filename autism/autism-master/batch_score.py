@@ -0,0 +1,304 @@
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import config
+from face_stage import FaceStage
+from ingest import load_image
+from model_service import ModelService
+from screening import decide, face_confidences, parse_gejala, prepare_face, validate_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def iter_inputs(source):
+    """Item {id, image, gejala} dari folder gambar, manifest CSV atau manifest JSONL."""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    yield {"id": os.path.relpath(path, source), "image": path, "gejala": []}
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    if source.endswith(".csv"):
+        with open(source, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    elif source.endswith((".jsonl", ".ndjson")):
+        with open(source, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        raise ValueError(f"Input harus folder, .csv atau .jsonl: {source}")
+
+    for row in rows:
+        path = row.get("image") or row.get("path")
+        if not path:
+            raise ValueError(f"Baris manifest tanpa kolom image: {row}")
+        if not os.path.isabs(path):
+            path = os.path.join(base, path)
+        item = {"id": str(row.get("id") or row.get("image") or row.get("path")), "image": path, "gejala": []}
+        try:
+            item["gejala"] = parse_gejala(row.get("gejala"))
+        except (ValueError, TypeError) as e:
+            # Gejala tidak valid hanya menggagalkan baris ini, bukan seluruh run
+            item["error"] = f"Gejala tidak valid: {e}"
+        yield item
+
+
+# Output JSONL: satu baris per gambar, ditulis per batch; file output sekaligus checkpoint
+class JsonlWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def completed_ids(self):
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        valid_bytes = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["id"])
+                except (ValueError, KeyError):
+                    break
+                valid_bytes += len(line)
+        # Baris terakhir yang terpotong (proses berhenti saat menulis) dibuang
+        with open(self.path, "r+b") as f:
+            f.truncate(valid_bytes)
+        return done
+
+    def write(self, records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# Output Parquet: folder berisi part-*.parquet, tiap part ditulis atomik (tmp + rename)
+class ParquetWriter:
+    JSON_FIELDS = ("faces", "face_confidences", "gejala", "timings_ms")
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Output Parquet membutuhkan paket pyarrow (pip install pyarrow)") from e
+        self.pa, self.pq = pa, pq
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.schema = pa.schema([
+            ("id", pa.string()),
+            ("image", pa.string()),
+            ("status", pa.string()),
+            ("error", pa.string()),
+            ("faces", pa.string()),
+            ("face_confidences", pa.string()),
+            ("primary_face", pa.int64()),
+            ("confidence", pa.float64()),
+            ("outcome", pa.string()),
+            ("label", pa.string()),
+            ("image_positive", pa.bool_()),
+            ("checklist_count", pa.int64()),
+            ("checklist_percent", pa.float64()),
+            ("checklist_positive", pa.bool_()),
+            ("gejala", pa.string()),
+            ("timings_ms", pa.string()),
+        ])
+        self._parts = len(self._part_files())
+
+    def _part_files(self):
+        return sorted(
+            os.path.join(self.path, name) for name in os.listdir(self.path)
+            if name.startswith("part-") and name.endswith(".parquet")
+        )
+
+    def completed_ids(self):
+        done = set()
+        for part in self._part_files():
+            done.update(self.pq.read_table(part, columns=["id"]).column("id").to_pylist())
+        return done
+
+    def write(self, records):
+        rows = [
+            {name: (json.dumps(r.get(name), ensure_ascii=False) if name in self.JSON_FIELDS else r.get(name))
+             for name in self.schema.names}
+            for r in records
+        ]
+        table = self.pa.Table.from_pylist(rows, schema=self.schema)
+        final = os.path.join(self.path, f"part-{self._parts:06d}.parquet")
+        tmp = final + ".tmp"
+        self.pq.write_table(table, tmp)
+        os.replace(tmp, final)
+        self._parts += 1
+
+
+def _prepare(item, face_stage):
+    """Decode + deteksi wajah di worker; tensor dikumpulkan untuk batch CNN."""
+    if "error" in item:
+        return item, None, None, item["error"], {}
+    started = time.perf_counter()
+    try:
+        image = load_image(item["image"])
+        decode_ms = (time.perf_counter() - started) * 1000.0
+        img_array, error = validate_image(image)
+        if error:
+            return item, None, None, error, {"decode": decode_ms}
+        face, tensors = prepare_face(face_stage, img_array)
+        return item, face, tensors, None, {"decode": decode_ms, **face.timings}
+    except Exception as e:
+        return item, None, None, str(e), {}
+
+
+def _record(item, face, confidences, error, timings):
+    record = {"id": item["id"], "image": item["image"], "gejala": item["gejala"], "timings_ms": timings}
+    if error:
+        record.update(status="error", error=error)
+    elif confidences is None:
+        record.update(status="no_face", faces=[list(f) for f in face.faces])
+    else:
+        # Keputusan dari wajah utama; skor semua wajah ikut dicatat
+        decision = decide(confidences[face.primary], item["gejala"])
+        record.update(
+            status="ok",
+            faces=[list(f) for f in face.faces],
+            face_confidences=confidences,
+            primary_face=face.primary,
+            confidence=confidences[face.primary],
+            outcome=decision["outcome"],
+            label=decision["label"],
+            image_positive=decision["image_positive"],
+            checklist_count=decision["checklist_count"],
+            checklist_percent=decision["checklist_percent"],
+            checklist_positive=decision["checklist_positive"],
+        )
+    return record
+
+
+def run(source, output, fmt, backend_name=None, workers=4, batch_size=32, resume=False, progress_every=500):
+    writer = ParquetWriter(output) if fmt == "parquet" else JsonlWriter(output)
+    if resume:
+        done = writer.completed_ids()
+        print(f"↩️ Melanjutkan: {len(done)} gambar sudah diproses")
+    else:
+        if os.path.exists(output) and (fmt != "parquet" or os.listdir(output)):
+            raise FileExistsError(f"Output sudah ada: {output} (pakai --resume untuk melanjutkan)")
+        done = set()
+
+    service = ModelService(backend_name).start()
+    service.wait_ready()
+    if not service.ready:
+        raise RuntimeError(service.status_message())
+    backend = service.backend
+    face_stage = FaceStage(
+        max_side=config.FACE_DETECT_MAX_SIDE,
+        crop=config.FACE_CROP,
+        margin=config.FACE_CROP_MARGIN,
+        max_faces=config.FACE_MAX_FACES,
+        primary_rule=config.FACE_PRIMARY_RULE,
+    )
+
+    pending, ready = [], []
+    # Buffer batch dipakai ulang untuk setiap flush (crop uint8 disalin langsung ke sini)
+    batch_buffer = np.empty((batch_size,) + backend.input_shape, dtype=backend.input_dtype)
+    counts = {"ok": 0, "no_face": 0, "error": 0}
+    started = time.perf_counter()
+
+    def flush():
+        if pending:
+            inference_started = time.perf_counter()
+            # Semua wajah dari gambar-gambar pending; gambar dengan banyak wajah bisa terbagi dua batch
+            tensors = [tensor for p in pending for tensor in p[2]]
+            scores = []
+            for start in range(0, len(tensors), batch_size):
+                chunk = tensors[start:start + batch_size]
+                for i, tensor in enumerate(chunk):
+                    batch_buffer[i] = tensor
+                scores.extend(np.asarray(backend.run_batch(batch_buffer[:len(chunk)])).reshape(len(chunk), -1))
+            per_face_ms = (time.perf_counter() - inference_started) * 1000.0 / len(tensors)
+            offset = 0
+            for item, face, item_tensors, timings in pending:
+                item_scores = scores[offset:offset + len(item_tensors)]
+                offset += len(item_tensors)
+                ready.append(_record(item, face, face_confidences(face, item_scores), None,
+                                     {**timings, "inference": per_face_ms * len(item_tensors)}))
+            pending.clear()
+        if ready:
+            writer.write(ready)
+            for record in ready:
+                counts[record["status"]] += 1
+            ready.clear()
+
+    # Decode + deteksi wajah paralel; jendela terbatas agar memori tidak membengkak
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-decode") as executor:
+        window = deque()
+        items = (item for item in iter_inputs(source) if item["id"] not in done)
+        processed = 0
+        for item in items:
+            window.append(executor.submit(_prepare, item, face_stage))
+            if len(window) < workers * 4:
+                continue
+            processed += _collect(window.popleft().result(), pending, ready)
+            if sum(len(p[2]) for p in pending) >= batch_size:
+                flush()
+            if progress_every and processed % progress_every == 0:
+                _progress(processed, started)
+        while window:
+            processed += _collect(window.popleft().result(), pending, ready)
+            if sum(len(p[2]) for p in pending) >= batch_size:
+                flush()
+        flush()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"✅ Selesai: {sum(counts.values())} gambar dalam {elapsed:.1f}s "
+        f"({sum(counts.values()) / max(elapsed, 1e-9):.1f}/s) — ok {counts['ok']}, "
+        f"tanpa wajah {counts['no_face']}, error {counts['error']}"
+    )
+    return counts
+
+
+def _collect(result, pending, ready):
+    item, face, tensors, error, timings = result
+    if tensors is None:
+        ready.append(_record(item, face, None, error, timings))
+    else:
+        pending.append((item, face, tensors, timings))
+    return 1
+
+
+def _progress(processed, started):
+    elapsed = time.perf_counter() - started
+    print(f"⏳ {processed} gambar ({processed / max(elapsed, 1e-9):.1f}/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Screening massal gambar dari folder atau manifest CSV/JSONL (tanpa UI Gradio)"
+    )
+    parser.add_argument("source", help="Folder gambar atau manifest .csv/.jsonl (kolom image, gejala opsional)")
+    parser.add_argument("output", help="File .jsonl atau folder Parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), help="Default: dari ekstensi output")
+    parser.add_argument("--backend", default=config.BACKEND, help="keras, keras-predict, tflite atau onnx")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Thread decode + deteksi wajah")
+    parser.add_argument("--batch-size", type=int, default=32, help="Jumlah wajah per forward pass CNN")
+    parser.add_argument("--resume", action="store_true", help="Lewati gambar yang sudah ada di output")
+    parser.add_argument("--progress-every", type=int, default=500)
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "jsonl")
+    run(args.source, args.output, fmt, args.backend, args.workers, args.batch_size,
+        args.resume, args.progress_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# Benchmark dan load test pipeline screening; jalankan dari root project:
+#   python -m benchmarks micro   → microbenchmark per tahap predict()
+#   python -m benchmarks memory  → alokasi memori per request (tracemalloc), jalur lama vs sekarang
+#   python -m benchmarks video   → throughput mode video (frame/s) dan anggaran real-time
+#   python -m benchmarks load    → load test endpoint analisis (API HTTP atau Gradio)
+#   python -m benchmarks compare → bandingkan laporan JSON dengan baseline
@@ -0,0 +1,89 @@
+import argparse
+
+from benchmarks import report
+
+
+def _ints(value):
+    return tuple(int(v) for v in value.split(",") if v)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark pipeline screening")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(p, default_output):
+        p.add_argument("--output", default=default_output, help="File laporan JSON")
+        p.add_argument("--baseline", help="Laporan baseline; keluar dengan kode 1 jika ada regresi")
+        p.add_argument("--tolerance", type=float, default=0.15, help="Toleransi regresi relatif (0.15 = 15%%)")
+
+    micro = sub.add_parser("micro", help="Microbenchmark tiap tahap predict() dengan gambar sintetis")
+    micro.add_argument("--sizes", type=_ints, default=(480, 1080, 2160), help="Sisi gambar persegi, dipisah koma")
+    micro.add_argument("--batch-sizes", type=_ints, default=(1, 8))
+    micro.add_argument("--repeat", type=int, default=30)
+    micro.add_argument("--backend", default=None, help="Default: AUTISENSE_BACKEND")
+    micro.add_argument("--model", default=None, help="Default: model dari config, atau model pengganti")
+    add_common(micro, "benchmarks/results/micro.json")
+
+    load = sub.add_parser("load", help="Load test endpoint analisis (API HTTP atau Gradio)")
+    load.add_argument("--url", default="http://127.0.0.1:7860")
+    load.add_argument("--mode", choices=("api", "gradio"), default="api")
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--requests", type=int, default=200)
+    load.add_argument("--warmup", type=int, default=10)
+    load.add_argument("--size", type=int, default=1080, help="Sisi gambar sintetis")
+    load.add_argument("--spawn", action="store_true", help="Jalankan app_perpage.py sendiri selama test")
+    load.add_argument("--model-kind", default="real", help="Jenis model server (real/standin) untuk laporan")
+    add_common(load, "benchmarks/results/load.json")
+
+    memory = sub.add_parser("memory", help="Alokasi memori per request (tracemalloc): jalur lama vs sekarang")
+    memory.add_argument("--sizes", type=_ints, default=(1080, 3024, 4000), help="Sisi gambar JPEG sintetis")
+    memory.add_argument("--repeat", type=int, default=10)
+    add_common(memory, "benchmarks/results/memory.json")
+
+    video = sub.add_parser("video", help="Throughput mode video (frame/s): pelacakan vs deteksi tiap frame")
+    video.add_argument("--widths", type=_ints, default=(640, 1280, 1920), help="Lebar video sintetis 16:9")
+    video.add_argument("--seconds", type=float, default=10.0)
+    video.add_argument("--fps", type=int, default=30)
+    video.add_argument("--model", default=None, help="Default: model dari config, atau model pengganti")
+    add_common(video, "benchmarks/results/video.json")
+
+    cmp = sub.add_parser("compare", help="Bandingkan laporan dengan baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("baseline")
+    cmp.add_argument("--tolerance", type=float, default=0.15)
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        current = report.load_report(args.current)
+        report.print_results(current["results"])
+        raise SystemExit(0 if report.check_baseline(current, args.baseline, args.tolerance) else 1)
+
+    if args.command == "micro":
+        from benchmarks import micro as bench
+
+        result = bench.run(args.sizes, batch_sizes=args.batch_sizes, repeat=args.repeat,
+                           backend_name=args.backend, model_path=args.model)
+    elif args.command == "memory":
+        from benchmarks import memory as bench
+
+        result = bench.run(args.sizes, repeat=args.repeat)
+    elif args.command == "video":
+        from benchmarks import video as bench
+
+        result = bench.run(args.widths, seconds=args.seconds, fps=args.fps, model_path=args.model)
+    else:
+        from benchmarks import load as bench
+
+        result = bench.run(args.url, args.mode, args.concurrency, args.requests, args.warmup,
+                           args.size, args.spawn, args.model_kind)
+
+    print(f"📊 Hasil benchmark {result['meta']['kind']} (model {result['meta']['model']}):")
+    report.print_results(result["results"])
+    report.save_report(args.output, result)
+    if not report.check_baseline(result, args.baseline, args.tolerance):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
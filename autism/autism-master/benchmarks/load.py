@@ -0,0 +1,177 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+
+from benchmarks.report import metadata, summarize
+from benchmarks.standin import resolve_model
+from benchmarks.synthetic import encode_jpeg, make_image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class ApiClient:
+    """POST /api/v1/screen (multipart), hanya library standar."""
+
+    def __init__(self, url, timeout=60.0):
+        self.endpoint = url.rstrip("/") + "/api/v1/screen"
+        self.timeout = timeout
+
+    def screen(self, path, jpeg):
+        body, content_type = _multipart([("gejala", "1"), ("gejala", "3")], [("image", os.path.basename(path), jpeg)])
+        request = urllib.request.Request(self.endpoint, data=body, headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+class GradioClient:
+    """Event analisis di UI Gradio lewat gradio_client (sama seperti klik tombol di browser)."""
+
+    def __init__(self, url):
+        try:
+            from gradio_client import Client, handle_file
+        except ImportError as e:
+            raise ImportError("Mode gradio membutuhkan paket gradio_client") from e
+        self.client = Client(url, verbose=False)
+        self.handle_file = handle_file
+
+    def screen(self, path, jpeg):
+        result = self.client.predict(
+            self.handle_file(path), ["👀 Menghindari kontak mata"], api_name="/analyze_and_show_results"
+        )
+        return 200 if result and result[-1] == "results" else 500
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+
+def prepare_images(folder, count, size, kind="face"):
+    """Gambar JPEG berbeda untuk tiap request agar hasil tidak diambil dari cache server."""
+    images = []
+    for seed in range(count):
+        path = os.path.join(folder, f"{kind}_{size}_{seed}.jpg")
+        jpeg = encode_jpeg(make_image(kind, size, seed))
+        with open(path, "wb") as f:
+            f.write(jpeg)
+        images.append((path, jpeg))
+    return images
+
+
+def wait_ready(url, timeout=300.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url.rstrip("/") + "/readyz", timeout=5) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(1.0)
+    return False
+
+
+def spawn_server(url, extra_env=None):
+    """Jalankan app_perpage.py sebagai subprocess; model pengganti dipakai jika model asli tidak ada."""
+    parsed = urllib.parse.urlparse(url)
+    model_path, model_kind = resolve_model()
+    env = dict(os.environ, AUTISENSE_HOST=parsed.hostname or "127.0.0.1",
+               AUTISENSE_PORT=str(parsed.port or 7860), AUTISENSE_KERAS_MODEL=model_path, **(extra_env or {}))
+    process = subprocess.Popen([sys.executable, "app_perpage.py"], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process, model_kind
+
+
+def run(url="http://127.0.0.1:7860", mode="api", concurrency=8, requests=200, warmup=10,
+        size=1080, spawn=False, model_kind=None):
+    process, clients = None, []
+    folder = tempfile.mkdtemp(prefix="autisense-load-")
+    if spawn:
+        process, model_kind = spawn_server(url)
+    try:
+        if not wait_ready(url):
+            raise RuntimeError(f"Server {url} tidak siap (cek /readyz)")
+
+        images = prepare_images(folder, requests + warmup, size)
+        make_client = ApiClient if mode == "api" else GradioClient
+        clients = [make_client(url) for _ in range(concurrency)]
+        for i in range(warmup):
+            clients[0].screen(*images[requests + i])
+
+        # Tiap thread mengambil request berikutnya dari antrian bersama sampai habis
+        next_index = iter(range(requests))
+        lock = threading.Lock()
+        latencies, statuses = [], Counter()
+
+        def worker(client):
+            while True:
+                with lock:
+                    index = next(next_index, None)
+                if index is None:
+                    return
+                started = time.perf_counter()
+                status = client.screen(*images[index])
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                with lock:
+                    statuses[status] += 1
+                    if status == 200:
+                        latencies.append(elapsed_ms)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        for client in clients:
+            if hasattr(client, "close"):
+                client.close()
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        shutil.rmtree(folder, ignore_errors=True)
+
+    name = f"{mode}@c{concurrency}/{size}"
+    summary = summarize(latencies, elapsed_s=elapsed)
+    summary["status_counts"] = {str(k): v for k, v in sorted(statuses.items())}
+    summary["error_rate"] = 1.0 - statuses[200] / max(requests, 1)
+    return {
+        "meta": metadata(kind="load", model=model_kind, mode=mode, url=url, concurrency=concurrency,
+                         requests=requests, image_size=size),
+        "results": {name: summary},
+    }
@@ -0,0 +1,119 @@
+import io
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+from benchmarks.report import metadata
+from benchmarks.synthetic import encode_jpeg, make_image
+from face_stage import FaceStage, downscale, expand_box, get_detector
+from inference import INPUT_DTYPE, INPUT_SHAPE
+from ingest import load_image
+from screening import validate_image
+
+# Alokasi di bawah batas ini (objek Python kecil) tidak dihitung sebagai buffer
+BUFFER_MIN_BYTES = 4096
+
+
+def legacy_steps(face_stage):
+    """Jalur lama per request: decode penuh, salinan float32 /255, batch baru tiap forward pass."""
+    detector = get_detector()
+
+    def detect(state):
+        boxes = detector.detectMultiScale(
+            state["gray"], scaleFactor=face_stage.scale_factor, minNeighbors=face_stage.min_neighbors,
+            minSize=face_stage.min_size,
+        )
+        faces = [tuple(int(round(v / state["scale"])) for v in box) for box in np.asarray(boxes).reshape(-1, 4)]
+        state["box"] = expand_box(max(faces, key=lambda f: f[2] * f[3]), state["rgb"].shape, face_stage.margin)
+
+    def crop(state):
+        x, y, w, h = state["box"]
+        state["crop"] = cv2.resize(state["rgb"][y:y + h, x:x + w], face_stage.output_size,
+                                   interpolation=cv2.INTER_AREA)
+
+    return [
+        ("decode", lambda s: s.update(image=Image.open(io.BytesIO(s["jpeg"])).convert("RGB"))),
+        ("to_array", lambda s: s.update(rgb=np.asarray(s["image"]))),
+        ("downscale", lambda s: s.update(zip(("small", "scale"), downscale(s["rgb"], face_stage.max_side)))),
+        ("grayscale", lambda s: s.update(gray=cv2.cvtColor(s["small"], cv2.COLOR_RGB2GRAY))),
+        ("detect", detect),
+        ("crop", crop),
+        ("normalize", lambda s: s.update(tensor=s["crop"].astype(np.float32) / 255.0)),
+        ("batch", lambda s: s.update(batch=np.stack([s["tensor"]]))),
+    ]
+
+
+def current_steps(face_stage, batch_buffer):
+    """Jalur sekarang: ingest diperkecil, buffer per thread, crop uint8 disalin ke buffer batch."""
+    def batch(state):
+        batch_buffer[0] = state["face"].crop
+
+    return [
+        ("ingest", lambda s: s.update(image=load_image(s["jpeg"]))),
+        ("validate", lambda s: s.update(rgb=validate_image(s["image"])[0])),
+        ("face_stage", lambda s: s.update(face=face_stage.run(s["rgb"]))),
+        ("batch", batch),
+    ]
+
+
+def measure(steps, jpeg):
+    """Byte yang dialokasikan tiap tahap (puncak tracemalloc selama tahap) untuk satu request.
+
+    Buffer piksel hasil decode PIL dialokasikan di luar allocator Python sehingga tidak terlihat
+    tracemalloc; ukurannya dicatat terpisah dari dimensi gambar hasil decode.
+    """
+    state = {"jpeg": jpeg}
+    stages = {}
+    request_base = peak = tracemalloc.get_traced_memory()[0]
+    for name, fn in steps:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        fn(state)
+        stage_peak = tracemalloc.get_traced_memory()[1]
+        stages[name] = stage_peak - base
+        peak = max(peak, stage_peak)
+    peak -= request_base
+    width, height = state["image"].size
+    return stages, peak, width * height * 3
+
+
+def run_path(steps, jpegs):
+    samples = [measure(steps, jpeg) for jpeg in jpegs]
+    stages = {name: float(np.median([s[0][name] for s in samples])) for name in samples[0][0]}
+    return {
+        "n": len(samples),
+        "allocated_kb": sum(stages.values()) / 1024.0,
+        "peak_kb": float(np.median([s[1] for s in samples])) / 1024.0,
+        "pil_decode_kb": float(np.median([s[2] for s in samples])) / 1024.0,
+        "buffers_allocated": sum(1 for v in stages.values() if v >= BUFFER_MIN_BYTES),
+        "stages_kb": {name: v / 1024.0 for name, v in stages.items()},
+    }
+
+
+def run(sizes=(1080, 3024, 4000), repeat=10, warmup=3):
+    face_stage = FaceStage(
+        max_side=config.FACE_DETECT_MAX_SIDE, crop=config.FACE_CROP, margin=config.FACE_CROP_MARGIN
+    )
+    batch_buffer = np.empty((8,) + INPUT_SHAPE, dtype=INPUT_DTYPE)
+    paths = {"legacy": legacy_steps(face_stage), "current": current_steps(face_stage, batch_buffer)}
+    results = {}
+
+    tracemalloc.start()
+    try:
+        for size in sizes:
+            jpegs = [encode_jpeg(make_image("face", size, seed)) for seed in range(repeat + warmup)]
+            for name, steps in paths.items():
+                # Warmup: buffer per thread dan detector dibuat sebelum diukur (kondisi steady state)
+                for jpeg in jpegs[:warmup]:
+                    measure(steps, jpeg)
+                results[f"{name}@{size}"] = run_path(steps, jpegs[warmup:])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "meta": metadata(kind="memory", model="none", repeat=repeat, face_detect_max_side=face_stage.max_side),
+        "results": results,
+    }
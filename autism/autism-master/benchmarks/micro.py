@@ -0,0 +1,160 @@
+import functools
+import io
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+from benchmarks.report import metadata, summarize
+from benchmarks.standin import resolve_model
+from benchmarks.synthetic import encode_jpeg, make_image
+from cache import InferenceCache, image_key
+from face_stage import FaceStage, downscale, expand_box, get_detector
+from ingest import load_image
+from inference import create_backend, random_batch
+from model_service import ModelService
+from screening import Screener, decide, format_result, pertanyaan, validate_image
+from tta import TestTimeAugmentation
+
+
+def _time(fn, repeat, warmup=3):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return samples
+
+
+def bench_image_stages(face_stage, size, kind, repeat):
+    """Tahap-tahap predict() untuk satu resolusi dan jenis gambar."""
+    rgb = make_image(kind, size)
+    jpeg = encode_jpeg(rgb)
+    pil = Image.fromarray(rgb)
+    small, _ = downscale(rgb, face_stage.max_side)
+    gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+    detector = get_detector()
+    faces = face_stage.detect(rgb)[0]
+    # Tanpa wajah (noise): crop diukur pada kotak tengah agar tahapnya tetap terukur
+    box = expand_box(max(faces, key=lambda f: f[2] * f[3]), rgb.shape, face_stage.margin) if faces else \
+        expand_box((size // 4, size // 4, size // 2, size // 2), rgb.shape, face_stage.margin)
+    x, y, w, h = box
+    gray_buffer = np.empty_like(gray)
+
+    stages = {
+        "decode": lambda: Image.open(io.BytesIO(jpeg)).convert("RGB"),
+        "ingest": lambda: load_image(jpeg),
+        "validate": lambda: validate_image(pil),
+        "hash": lambda: image_key(rgb, face_stage.signature(), "bench"),
+        "downscale": lambda: downscale(rgb, face_stage.max_side, reuse=True),
+        "grayscale": lambda: cv2.cvtColor(small, cv2.COLOR_RGB2GRAY, dst=gray_buffer),
+        "detect": lambda: detector.detectMultiScale(
+            gray, scaleFactor=face_stage.scale_factor, minNeighbors=face_stage.min_neighbors,
+            minSize=face_stage.min_size,
+        ),
+        "crop": lambda: cv2.resize(rgb[y:y + h, x:x + w], face_stage.output_size, interpolation=cv2.INTER_AREA),
+        "face_stage": lambda: face_stage.run(rgb),
+    }
+    results = {f"{stage}@{size}/{kind}": summarize(_time(fn, repeat)) for stage, fn in stages.items()}
+    return results, len(faces)
+
+
+def bench_inference(backend, batch_sizes, repeat):
+    results = {}
+    rng = np.random.default_rng(0)
+    for size in batch_sizes:
+        batch = random_batch(rng, size, backend.input_shape, backend.input_dtype)
+        samples = _time(functools.partial(backend.run_batch, batch), repeat)
+        summary = summarize(samples, elapsed_s=sum(samples) / 1000.0)
+        # Throughput dalam gambar/detik, bukan batch/detik
+        summary["throughput_per_s"] *= size
+        results[f"inference@b{size}"] = summary
+    return results
+
+
+def bench_tta(backend, repeat):
+    """Biaya TTA satu wajah: membuat varian, lalu varian diskor dalam satu batch vs satu per satu."""
+    tta = TestTimeAugmentation()
+    crop = random_batch(np.random.default_rng(0), 1, backend.input_shape, np.uint8)[0]
+    variants = tta.expand([crop])
+    batch = np.stack(variants).astype(backend.input_dtype)
+    singles = [v[None].astype(backend.input_dtype) for v in variants]
+    n = tta.size
+    return {
+        f"tta_expand@{n}": summarize(_time(lambda: tta.expand([crop]), repeat)),
+        f"tta_batched@{n}": summarize(_time(lambda: tta.aggregate_crops(backend.run_batch(batch)), repeat)),
+        f"tta_sequential@{n}": summarize(_time(lambda: [backend.run_batch(b) for b in singles], repeat)),
+    }
+
+
+def bench_format(repeat):
+    gejala = pertanyaan[:2]
+    return {"format": summarize(_time(lambda: format_result(decide(0.5, gejala)), repeat))}
+
+
+def bench_end_to_end(backend_name, model_path, face_stage, sizes, repeat, kinds=("face", "group")):
+    """predict() lengkap di proses ini (cache nonaktif), gambar berbeda tiap panggilan.
+
+    Jenis "group" (4 wajah, diskor dalam satu forward pass) dibandingkan dengan "face" (1 wajah).
+    """
+    service = ModelService(backend_name, model_path).start()
+    if not service.wait_ready():
+        raise RuntimeError(service.status_message())
+    screener = Screener(service, face_stage, InferenceCache(max_bytes=0))
+    results = {}
+    try:
+        for size in sizes:
+            for kind in kinds:
+                # Bytes JPEG seperti upload asli, sehingga ingest ikut terukur
+                images = [encode_jpeg(make_image(kind, size, seed)) for seed in range(repeat + 3)]
+                index = iter(range(len(images)))
+                samples = _time(
+                    lambda images=images, index=index: screener.predict(images[next(index)], pertanyaan[:1]), repeat
+                )
+                results[f"predict@{size}/{kind}"] = summarize(samples, elapsed_s=sum(samples) / 1000.0)
+    finally:
+        service.close()
+    return results
+
+
+def run(sizes=(480, 1080, 2160), kinds=("face", "noise", "group"), batch_sizes=(1, 8), repeat=30,
+        backend_name=None, model_path=None):
+    backend_name = backend_name or config.BACKEND
+    model_kind = "real"
+    if backend_name.startswith("keras"):
+        model_path, model_kind = resolve_model(model_path)
+
+    face_stage = FaceStage(
+        max_side=config.FACE_DETECT_MAX_SIDE, crop=config.FACE_CROP, margin=config.FACE_CROP_MARGIN,
+        max_faces=config.FACE_MAX_FACES, primary_rule=config.FACE_PRIMARY_RULE,
+    )
+    results, detected = {}, {}
+    for size in sizes:
+        for kind in kinds:
+            stage_results, n_faces = bench_image_stages(face_stage, size, kind, repeat)
+            results.update(stage_results)
+            detected[f"{size}/{kind}"] = n_faces
+
+    backend = create_backend(backend_name, model_path).load()
+    backend.warmup(sorted(set(batch_sizes) | {TestTimeAugmentation().size}))
+    results.update(bench_inference(backend, batch_sizes, repeat))
+    results.update(bench_tta(backend, repeat))
+    results.update(bench_format(repeat))
+    results.update(bench_end_to_end(backend_name, model_path, face_stage, sizes, repeat))
+
+    return {
+        "meta": metadata(
+            kind="micro",
+            model=model_kind,
+            backend=backend_name,
+            model_path=model_path or backend.path,
+            repeat=repeat,
+            face_detect_max_side=config.FACE_DETECT_MAX_SIDE,
+            faces_detected=detected,
+        ),
+        "results": results,
+    }
@@ -0,0 +1,128 @@
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+# Metrik yang dibandingkan dengan baseline: latensi dan memori (naik = regresi), throughput (turun = regresi)
+LATENCY_KEYS = ("p50_ms", "p95_ms", "allocated_kb", "peak_kb")
+THROUGHPUT_KEYS = ("throughput_per_s",)
+
+
+def summarize(samples_ms, elapsed_s=None):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if not len(samples):
+        return {"n": 0}
+    summary = {
+        "n": int(len(samples)),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "max_ms": float(samples.max()),
+    }
+    if elapsed_s:
+        summary["throughput_per_s"] = len(samples) / elapsed_s
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def metadata(**extra):
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        **extra,
+    }
+
+
+def save_report(path, report):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Laporan disimpan di: {path}")
+
+
+def load_report(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current, baseline, tolerance=0.15):
+    """Daftar regresi (teks) antara laporan sekarang dan baseline; toleransi relatif, mis. 0.15 = 15%."""
+    regressions = []
+    for key in ("kind", "model"):
+        if current["meta"].get(key) != baseline["meta"].get(key):
+            raise ValueError(
+                f"Laporan tidak sebanding: {key} {current['meta'].get(key)} vs baseline {baseline['meta'].get(key)}"
+            )
+
+    for name, base in baseline["results"].items():
+        result = current["results"].get(name)
+        if result is None or not result.get("n") or not base.get("n"):
+            continue
+        for key in LATENCY_KEYS:
+            if key in base and result[key] > base[key] * (1 + tolerance):
+                regressions.append(
+                    f"{name} {key}: {result[key]:.2f} vs baseline {base[key]:.2f} (+{result[key] / base[key] - 1:.0%})"
+                )
+        for key in THROUGHPUT_KEYS:
+            if key in base and result.get(key, 0.0) < base[key] * (1 - tolerance):
+                regressions.append(
+                    f"{name} {key}: {result.get(key, 0.0):.2f} vs baseline {base[key]:.2f} "
+                    f"({result.get(key, 0.0) / base[key] - 1:.0%})"
+                )
+    return regressions
+
+
+def print_results(results):
+    for name, r in results.items():
+        if not r.get("n"):
+            print(f"   {name}: tidak ada sampel")
+            continue
+        if "allocated_kb" in r:
+            stages = ", ".join(f"{stage} {kb:.0f}" for stage, kb in r["stages_kb"].items())
+            print(
+                f"   {name}: dialokasikan {r['allocated_kb']:.0f} KB ({r['buffers_allocated']} buffer), "
+                f"puncak {r['peak_kb']:.0f} KB, decode PIL {r['pil_decode_kb']:.0f} KB — {stages}"
+            )
+            continue
+        if "realtime_factor" in r:
+            budget = "real-time" if r["within_budget"] else "DI BAWAH anggaran real-time"
+            print(
+                f"   {name}: {r['throughput_per_s']:.1f} frame/s ({r['realtime_factor']:.1f}x real-time, {budget}), "
+                f"{r['n']} frame dianalisis ({r['analyzed_per_s']:.1f}/s, stride akhir {r['final_stride']}), "
+                f"{r['detections']} deteksi + {r['tracked']} track"
+            )
+            continue
+        line = f"   {name}: p50 {r['p50_ms']:.2f} ms, p95 {r['p95_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms"
+        if "throughput_per_s" in r:
+            line += f", {r['throughput_per_s']:.1f}/s"
+        print(line)
+
+
+def check_baseline(report, baseline_path, tolerance):
+    """Bandingkan dengan baseline jika diberikan; True jika tidak ada regresi."""
+    if not baseline_path:
+        return True
+    regressions = compare(report, load_report(baseline_path), tolerance)
+    if regressions:
+        print(f"❌ {len(regressions)} regresi dibanding baseline (toleransi {tolerance:.0%}):")
+        for line in regressions:
+            print(f"   {line}")
+        return False
+    print(f"✅ Tidak ada regresi dibanding baseline (toleransi {tolerance:.0%})")
+    return True
@@ -0,0 +1,79 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+def synthetic_face(size, seed=0):
+    """Gambar RGB persegi berisi wajah kartun yang terdeteksi Haar cascade (offline, deterministik)."""
+    rng = np.random.default_rng(seed)
+    img = np.full((size, size, 3), 90, np.uint8)
+    c = size // 2
+    r = int(size * 0.3)
+    # Wajah, mata + alis gelap (pola terang-gelap yang dicari Haar), hidung, mulut
+    cv2.ellipse(img, (c, c), (int(r * 0.78), r), 0, 0, 360, (225, 190, 165), -1)
+    eye_y, eye_x = c - int(r * 0.18), int(r * 0.33)
+    for dx in (-eye_x, eye_x):
+        cv2.ellipse(img, (c + dx, eye_y), (int(r * 0.2), int(r * 0.11)), 0, 0, 360, (70, 50, 45), -1)
+        cv2.ellipse(img, (c + dx, eye_y - int(r * 0.2)), (int(r * 0.22), int(r * 0.05)), 0, 0, 360, (50, 35, 30), -1)
+    cv2.ellipse(img, (c, c + int(r * 0.15)), (int(r * 0.1), int(r * 0.06)), 0, 0, 360, (180, 140, 120), -1)
+    cv2.ellipse(img, (c, c + int(r * 0.48)), (int(r * 0.28), int(r * 0.08)), 0, 0, 360, (120, 60, 60), -1)
+    img = cv2.GaussianBlur(img, (0, 0), max(1, size / 200))
+    # Noise per seed: isi piksel (dan hash cache) berbeda untuk tiap gambar
+    return np.clip(img + rng.normal(0, 4, img.shape), 0, 255).astype(np.uint8)
+
+
+def synthetic_group(size, seed=0, grid=2):
+    """Foto grup sintetis: grid x grid wajah dengan ukuran berbeda-beda (jalur banyak wajah)."""
+    img = np.full((size, size, 3), 90, np.uint8)
+    cell = size // grid
+    for row in range(grid):
+        for col in range(grid):
+            index = row * grid + col
+            # Wajah pertama terbesar, sisanya mengecil agar aturan wajah utama terukur
+            face_size = max(32, int(cell * (1.0 - 0.12 * index)))
+            offset = (cell - face_size) // 2
+            y, x = row * cell + offset, col * cell + offset
+            img[y:y + face_size, x:x + face_size] = synthetic_face(face_size, seed * grid * grid + index)
+    return img
+
+
+def random_image(size, seed=0):
+    """Noise RGB acak tanpa wajah (jalur no-face)."""
+    return np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+
+
+def make_image(kind, size, seed=0):
+    if kind == "face":
+        return synthetic_face(size, seed)
+    if kind == "noise":
+        return random_image(size, seed)
+    if kind == "group":
+        return synthetic_group(size, seed)
+    raise ValueError(f"Jenis gambar tidak dikenal: {kind}")
+
+
+def encode_jpeg(rgb, quality=90):
+    buffer = io.BytesIO()
+    Image.fromarray(rgb).save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def write_video(path, seconds=10.0, width=1280, fps=30, face_size=240, seed=0):
+    """Video MP4 16:9 dengan wajah sintetis yang bergerak mendatar (untuk benchmark mode video)."""
+    height = width * 9 // 16
+    face = synthetic_face(face_size, seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Tidak bisa menulis video: {path}")
+    try:
+        for i in range(int(seconds * fps)):
+            frame = np.full((height, width, 3), 90, np.uint8)
+            x = int((width - face_size) * (0.5 + 0.4 * np.sin(i / 40.0)))
+            y = (height - face_size) // 2
+            frame[y:y + face_size, x:x + face_size] = face
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+    finally:
+        writer.release()
+    return path
@@ -0,0 +1,65 @@
+import os
+import tempfile
+
+import config
+from benchmarks.report import metadata
+from benchmarks.standin import resolve_model
+from benchmarks.synthetic import write_video
+from face_stage import FaceStage
+from model_service import ModelService
+from video import VideoAnalyzer
+
+# Konfigurasi yang dibandingkan: pelacakan vs deteksi tiap frame (semua frame dianalisis),
+# lalu mode bawaan dengan sampling adaptif
+CASES = {
+    "track": {"sample_fps": 1000.0, "realtime": 0.01},
+    "detect_every_frame": {"sample_fps": 1000.0, "realtime": 0.01, "redetect_every": 1},
+    "adaptive": {},
+}
+
+
+def _row(analysis):
+    t = analysis.throughput
+    return {
+        "n": t["frames_decoded"],
+        "throughput_per_s": t["processing_fps"],
+        "analyzed_per_s": t["analyzed_fps"],
+        "realtime_factor": t["realtime_factor"],
+        # Dinilai terhadap anggaran dari config, bukan opsi realtime kasus yang memaksa stride 1
+        "within_budget": t["realtime_factor"] >= config.VIDEO_REALTIME,
+        "final_stride": t["final_stride"],
+        "detections": t["detections"],
+        "tracked": t["tracked"],
+        "frames_with_face": analysis.summary["frames_with_face"],
+    }
+
+
+def run(widths=(640, 1280, 1920), seconds=10.0, fps=30, model_path=None):
+    model_path, model_kind = resolve_model(model_path)
+    service = ModelService("keras", model_path).start()
+    if not service.wait_ready():
+        raise RuntimeError(service.status_message())
+    face_stage = FaceStage(
+        max_side=config.FACE_DETECT_MAX_SIDE, crop=config.FACE_CROP, margin=config.FACE_CROP_MARGIN
+    )
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for width in widths:
+                path = write_video(os.path.join(tmp, f"face_{width}.mp4"), seconds, width, fps)
+                # Putaran pertama tidak diukur: detector per thread dan buffer dibuat dulu
+                VideoAnalyzer(face_stage, service, max_seconds=1.0).analyze_file(path)
+                for name, options in CASES.items():
+                    analysis = VideoAnalyzer(face_stage, service, **options).analyze_file(path)
+                    results[f"video@{width}/{name}"] = _row(analysis)
+    finally:
+        service.close()
+
+    return {
+        "meta": metadata(
+            kind="video", model=model_kind, model_path=model_path, seconds=seconds, source_fps=fps,
+            sample_fps=config.VIDEO_SAMPLE_FPS, realtime=config.VIDEO_REALTIME,
+            redetect_every=config.VIDEO_REDETECT_EVERY, face_detect_max_side=config.FACE_DETECT_MAX_SIDE,
+        ),
+        "results": results,
+    }
@@ -0,0 +1,118 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _estimate_size(value):
+    """Perkiraan ukuran nilai dalam byte (array numpy dihitung dari nbytes)."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes + 112
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if hasattr(value, "__slots__"):
+        return sys.getsizeof(value) + sum(
+            _estimate_size(getattr(value, name, None)) for name in value.__slots__
+        )
+    return sys.getsizeof(value)
+
+
+def image_key(img_array, *versions):
+    """Kunci cache dari isi piksel gambar (setelah decode) plus versi preprocessing/model."""
+    digest = hashlib.sha256()
+    digest.update(str((img_array.shape, img_array.dtype.str) + versions).encode())
+    digest.update(np.ascontiguousarray(img_array).data)
+    return digest.hexdigest()
+
+
+# Cache LRU dengan batas total byte dan TTL per entri
+class InferenceCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl_seconds=3600.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if self.ttl and expires_at < time.monotonic():
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key):
+        """Seperti get() tanpa menghitung hit/miss; untuk cek ulang di dalam single-flight."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl and entry[2] < time.monotonic()):
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, nbytes=None):
+        if not self.enabled:
+            return
+        size = nbytes if nbytes is not None else _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, (_, old_size, _) = next(iter(self._entries.items()))
+                self._remove(old_key, old_size)
+                self.evictions += 1
+
+    def _remove(self, key, size):
+        del self._entries[key]
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,197 @@
+import json
+import os
+
+
+# Profil hasil `python tune.py sweep` (thread TensorFlow, oneDNN, ukuran batch, konkurensi) untuk mesin ini.
+# Isinya dipakai sebagai nilai default variabel AUTISENSE_*; environment variable tetap diprioritaskan.
+# "off" = profil tidak dipakai.
+TUNING_PROFILE = os.environ.get("AUTISENSE_TUNING_PROFILE") or os.path.join(
+    os.environ.get("AUTISENSE_MODEL_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "model"),
+    "tuning_profile.json",
+)
+
+
+def _load_tuning_profile(path):
+    """Baca profil tuning; mengembalikan (settings, info). Profil untuk jumlah core lain diabaikan."""
+    info = {"path": path, "applied": False}
+    if path == "off" or not os.path.exists(path):
+        return {}, info
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        settings = dict(profile["settings"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        info["reason"] = f"profil tidak valid: {e}"
+        return {}, info
+    info["created_at"] = profile.get("created_at")
+    if profile.get("cpu_count") != os.cpu_count():
+        info["reason"] = f"dibuat untuk {profile.get('cpu_count')} core, mesin ini {os.cpu_count()} core"
+        return {}, info
+    info["applied"] = True
+    info["settings"] = settings
+    return settings, info
+
+
+_TUNING_SETTINGS, TUNING = _load_tuning_profile(TUNING_PROFILE)
+
+
+# Konfigurasi aplikasi, semua nilai bisa di-override lewat environment variable
+def _env_value(name):
+    value = os.environ.get(name)
+    return value if value not in (None, "") else _TUNING_SETTINGS.get(name)
+
+
+def _env_int(name, default):
+    value = _env_value(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name, default):
+    value = _env_value(name)
+    return float(value) if value not in (None, "") else default
+
+
+def _env_str(name, default):
+    value = _env_value(name)
+    return str(value) if value not in (None, "") else default
+
+
+# Micro-batching inferensi CNN
+MAX_BATCH_SIZE = _env_int("AUTISENSE_MAX_BATCH_SIZE", 8)
+MAX_WAIT_MS = _env_float("AUTISENSE_MAX_WAIT_MS", 10.0)
+BATCH_STATS_EVERY = _env_int("AUTISENSE_BATCH_STATS_EVERY", 200)
+
+# Pool per tahap: decode gambar dan deteksi wajah (OpenCV melepas GIL) berjalan di thread terpisah.
+# Antrian tiap tahap dibatasi; jika penuh request ditolak (backpressure) daripada menumpuk.
+DECODE_WORKERS = _env_int("AUTISENSE_DECODE_WORKERS", 2)
+FACE_WORKERS = _env_int("AUTISENSE_FACE_WORKERS", max(1, min(4, (os.cpu_count() or 2) // 2)))
+STAGE_MAX_QUEUE = _env_int("AUTISENSE_STAGE_MAX_QUEUE", 32)
+INFERENCE_MAX_QUEUE = _env_int("AUTISENSE_INFERENCE_MAX_QUEUE", 64)
+# Thread internal OpenCV per panggilan (-1 = bawaan OpenCV); 1 mencegah oversubscription bila FACE_WORKERS > 1
+OPENCV_THREADS = _env_int("AUTISENSE_OPENCV_THREADS", -1)
+# Thread pool TensorFlow (0 = bawaan TF, biasanya semua core)
+TF_INTRA_OP_THREADS = _env_int("AUTISENSE_TF_INTRA_OP_THREADS", 0)
+TF_INTER_OP_THREADS = _env_int("AUTISENSE_TF_INTER_OP_THREADS", 0)
+# Optimasi oneDNN TensorFlow ("1"/"0", kosong = bawaan TF). Dibaca TF saat di-import,
+# jadi diteruskan ke TF_ENABLE_ONEDNN_OPTS di sini sebelum modul lain memuat TensorFlow.
+TF_ONEDNN = _env_str("AUTISENSE_TF_ONEDNN", "")
+if TF_ONEDNN:
+    os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", TF_ONEDNN)
+
+# Antrian event Gradio: batas sesi analisis bersamaan dan panjang antrian
+ANALYZE_CONCURRENCY = _env_int("AUTISENSE_ANALYZE_CONCURRENCY", MAX_BATCH_SIZE)
+UI_QUEUE_MAX_SIZE = _env_int("AUTISENSE_UI_QUEUE_MAX_SIZE", 64)
+
+# Lokasi file model
+MODEL_DIR = _env_str("AUTISENSE_MODEL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model"))
+KERAS_MODEL_PATH = _env_str("AUTISENSE_KERAS_MODEL", os.path.join(MODEL_DIR, "model_deteksi_autisme.h5"))
+TFLITE_MODEL_PATH = _env_str("AUTISENSE_TFLITE_MODEL", os.path.join(MODEL_DIR, "model_deteksi_autisme_int8.tflite"))
+ONNX_MODEL_PATH = _env_str("AUTISENSE_ONNX_MODEL", os.path.join(MODEL_DIR, "model_deteksi_autisme.onnx"))
+
+# Sumber model .h5 (dicatat di model/manifest.json dengan SHA-256 + ukuran, diambil atomik & bisa dilanjutkan):
+# URL Google Drive/HTTP, path file lokal, atau repositori — folder / URL berakhiran "/" berisi
+# manifest.json + file model (lihat `python model_store.py publish`)
+MODEL_SOURCE = _env_str("AUTISENSE_MODEL_SOURCE", "https://drive.google.com/uc?id=1jiJY34UFhyPAjybEKOvS82zuVhiIRrnI")
+MODEL_SHA256 = _env_str("AUTISENSE_MODEL_SHA256", "")  # hanya untuk sumber satu file; kosong = tidak dicek
+MODEL_VERSION = _env_str("AUTISENSE_MODEL_VERSION", "1")
+# Eksperimental: backend keras memuat bobot dari layout mmap (dikonversi sekali dari .h5) daripada
+# mem-parsing HDF5. TensorFlow tetap menyalin bobot ke variabelnya, jadi memori tidak dibagi antar proses.
+MODEL_MMAP = _env_int("AUTISENSE_MODEL_MMAP", 0) == 1
+
+# Backend inferensi: "keras" (tf.function + warmup), "keras-predict" (model.predict),
+# "tflite" (hasil quantize.py) atau "onnx" (hasil export_onnx.py)
+BACKEND = _env_str("AUTISENSE_BACKEND", "keras")
+TFLITE_NUM_THREADS = _env_int("AUTISENSE_TFLITE_THREADS", 0)
+ONNX_INTRA_OP_THREADS = _env_int("AUTISENSE_ONNX_INTRA_OP_THREADS", 0)
+ONNX_INTER_OP_THREADS = _env_int("AUTISENSE_ONNX_INTER_OP_THREADS", 0)
+
+# Mode pre-fork: jumlah proses replika model (1 = inferensi di proses server seperti biasa).
+# Tensor dikirim ke replika lewat ring buffer shared memory, bukan di-pickle.
+REPLICAS = _env_int("AUTISENSE_REPLICAS", 1)
+REPLICA_THREADS = _env_int("AUTISENSE_REPLICA_THREADS", 0)  # 0 = jumlah core / jumlah replika
+REPLICA_SLOTS = _env_int("AUTISENSE_REPLICA_SLOTS", 2)
+REPLICA_START_TIMEOUT = _env_float("AUTISENSE_REPLICA_START_TIMEOUT", 300.0)
+REPLICA_BATCH_TIMEOUT = _env_float("AUTISENSE_REPLICA_BATCH_TIMEOUT", 60.0)
+
+# Ingest gambar upload: batas dicek dari ukuran file dan header sebelum decode,
+# JPEG di-decode langsung mendekati INGEST_MAX_SIDE (sebaiknya >= FACE_DETECT_MAX_SIDE)
+INGEST_MAX_SIDE = _env_int("AUTISENSE_INGEST_MAX_SIDE", 1280)
+INGEST_MAX_BYTES = _env_int("AUTISENSE_INGEST_MAX_BYTES", 25 * 1024 * 1024)
+INGEST_MAX_PIXELS = _env_int("AUTISENSE_INGEST_MAX_PIXELS", 64_000_000)
+
+# Tahap deteksi wajah
+FACE_DETECT_MAX_SIDE = _env_int("AUTISENSE_FACE_DETECT_MAX_SIDE", 640)
+FACE_CROP = _env_int("AUTISENSE_FACE_CROP", 1) == 1
+FACE_CROP_MARGIN = _env_float("AUTISENSE_FACE_CROP_MARGIN", 0.2)
+# Semua wajah (maks FACE_MAX_FACES) diskor dalam satu forward pass; keputusan memakai wajah utama:
+# "largest" (terbesar) atau "central" (paling dekat ke tengah gambar)
+FACE_MAX_FACES = _env_int("AUTISENSE_FACE_MAX_FACES", 8)
+FACE_PRIMARY_RULE = _env_str("AUTISENSE_FACE_PRIMARY_RULE", "largest")
+FACE_STATS_EVERY = _env_int("AUTISENSE_FACE_STATS_EVERY", 200)
+
+# Mode video/webcam: frame disampling (adaptif terhadap anggaran real-time), wajah dilacak antar frame
+# dengan template matching dan dideteksi ulang tiap VIDEO_REDETECT_EVERY frame yang dianalisis
+VIDEO_SAMPLE_FPS = _env_float("AUTISENSE_VIDEO_SAMPLE_FPS", 5.0)
+VIDEO_REALTIME = _env_float("AUTISENSE_VIDEO_REALTIME", 1.0)  # kecepatan minimum: 1.0 = secepat video diputar
+VIDEO_REDETECT_EVERY = _env_int("AUTISENSE_VIDEO_REDETECT_EVERY", 10)
+VIDEO_TRACK_MIN_SCORE = _env_float("AUTISENSE_VIDEO_TRACK_MIN_SCORE", 0.6)
+VIDEO_MAX_SECONDS = _env_float("AUTISENSE_VIDEO_MAX_SECONDS", 120.0)
+VIDEO_MAX_BYTES = _env_int("AUTISENSE_VIDEO_MAX_BYTES", 100 * 1024 * 1024)
+VIDEO_WORKERS = _env_int("AUTISENSE_VIDEO_WORKERS", 1)
+VIDEO_MAX_QUEUE = _env_int("AUTISENSE_VIDEO_MAX_QUEUE", 4)
+
+# Tracing: cetak rincian tahap per request beserta trace ID (1 = semua request),
+# atau hanya request yang lebih lambat dari TRACE_SLOW_MS (0 = nonaktif)
+TRACE_LOG = _env_int("AUTISENSE_TRACE_LOG", 0) == 1
+TRACE_SLOW_MS = _env_float("AUTISENSE_TRACE_SLOW_MS", 0.0)
+
+# Server
+HOST = _env_str("AUTISENSE_HOST", "127.0.0.1")
+PORT = _env_int("AUTISENSE_PORT", 7860)
+
+# Cache hasil deteksi wajah + skor CNN per isi gambar (0 = nonaktif)
+CACHE_MAX_BYTES = _env_int("AUTISENSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_TTL_SECONDS = _env_float("AUTISENSE_CACHE_TTL_SECONDS", 3600.0)
+
+# Test-time augmentation: tiap crop wajah diskor bersama variannya (flip, crop kecil, kecerahan) dalam
+# forward pass yang sama; confidence = rata-rata (atau trimmed mean) skor varian, std = ketidakpastian.
+# Naikkan MAX_BATCH_SIZE ke >= jumlah varian x wajah agar satu gambar tetap satu forward pass.
+TTA = _env_int("AUTISENSE_TTA", 0) == 1
+TTA_VARIANTS = _env_str("AUTISENSE_TTA_VARIANTS", "identity,flip,zoom,zoom_flip,shift_tl,shift_br,bright,dark")
+TTA_AGGREGATE = _env_str("AUTISENSE_TTA_AGGREGATE", "trimmed_mean")  # mean atau trimmed_mean
+TTA_TRIM = _env_float("AUTISENSE_TTA_TRIM", 0.125)  # porsi skor terendah & tertinggi yang dibuang
+TTA_ZOOM = _env_float("AUTISENSE_TTA_ZOOM", 0.9)  # sisi crop kecil relatif terhadap crop wajah
+TTA_BRIGHTNESS = _env_float("AUTISENSE_TTA_BRIGHTNESS", 0.15)  # perubahan kecerahan varian bright/dark
+
+# Peta Grad-CAM di tab hasil: dihitung hanya saat tab dibuka, di pool sendiri, disimpan di cache terbatas
+EXPLAIN = _env_int("AUTISENSE_EXPLAIN", 1) == 1
+EXPLAIN_WORKERS = _env_int("AUTISENSE_EXPLAIN_WORKERS", 1)
+EXPLAIN_MAX_QUEUE = _env_int("AUTISENSE_EXPLAIN_MAX_QUEUE", 8)
+EXPLAIN_CACHE_MAX_BYTES = _env_int("AUTISENSE_EXPLAIN_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+EXPLAIN_SIZE = _env_int("AUTISENSE_EXPLAIN_SIZE", 320)  # sisi terpanjang gambar overlay (px)
+
+# Analisis spekulatif saat gambar di-upload, sebelum user selesai mengisi kuisioner
+SPECULATIVE = _env_int("AUTISENSE_SPECULATIVE", 1) == 1
+SPECULATIVE_WORKERS = _env_int("AUTISENSE_SPECULATIVE_WORKERS", 2)
+
+# API HTTP JSON
+API_MAX_IMAGE_BYTES = _env_int("AUTISENSE_API_MAX_IMAGE_BYTES", 20 * 1024 * 1024)
+API_MAX_BULK_ITEMS = _env_int("AUTISENSE_API_MAX_BULK_ITEMS", 256)
+API_BULK_CONCURRENCY = _env_int("AUTISENSE_API_BULK_CONCURRENCY", 8)
+# Item bulk yang sudah dibaca tapi hasilnya belum dikirim (bytes gambarnya ditahan di memori);
+# pembacaan body menunggu jika penuh
+API_BULK_WINDOW = _env_int("AUTISENSE_API_BULK_WINDOW", 2 * API_BULK_CONCURRENCY)
+
+# Penyimpanan hasil screening (SQLite) untuk audit & analitik; "off" = tidak disimpan.
+# Baris ditulis thread latar belakang per batch (maks RESULTS_BATCH_SIZE baris atau tiap RESULTS_FLUSH_MS);
+# jika antrian penulis penuh, hasil dibuang daripada menahan request.
+RESULTS_DB = _env_str("AUTISENSE_RESULTS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "results.db"))
+RESULTS_JOURNAL_MODE = _env_str("AUTISENSE_RESULTS_JOURNAL_MODE", "wal")
+RESULTS_BATCH_SIZE = _env_int("AUTISENSE_RESULTS_BATCH_SIZE", 64)
+RESULTS_FLUSH_MS = _env_float("AUTISENSE_RESULTS_FLUSH_MS", 1000.0)
+RESULTS_MAX_QUEUE = _env_int("AUTISENSE_RESULTS_MAX_QUEUE", 10000)
+# GET /api/v1/results/export (streaming JSONL/CSV); nonaktif secara default karena berisi data screening
+RESULTS_EXPORT_API = _env_int("AUTISENSE_RESULTS_EXPORT_API", 0) == 1
+
+# Aset statis UI (static/, di-build ke static/dist oleh assets.py): URL ber-hash isi di-cache selama STATIC_MAX_AGE detik
+STATIC_MAX_AGE = _env_int("AUTISENSE_STATIC_MAX_AGE", 31536000)
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class Overloaded(RuntimeError):
+    pass
+
+
+# Executor per tahap (decode, deteksi wajah): jumlah thread dan panjang antrian dibatasi sendiri-sendiri.
+# Antrian penuh → submit langsung ditolak (backpressure) daripada menumpuk pekerjaan tanpa batas.
+class StagePool:
+    def __init__(self, name, max_workers, max_queue, window=2048):
+        if max_workers < 1:
+            raise ValueError(f"Jumlah worker {name} minimal 1")
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max(0, max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"stage-{name}")
+        self._lock = threading.Lock()
+        self._pending = 0  # sedang jalan + menunggu di antrian
+        self._active = 0
+        self._peak_queued = 0
+        self._waits = deque(maxlen=window)
+        self._run_times = deque(maxlen=window)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise Overloaded(f"Antrian {self.name} penuh ({self.max_queue}), coba lagi sebentar")
+            self._pending += 1
+            self._peak_queued = max(self._peak_queued, self._pending - self._active)
+        try:
+            return self._executor.submit(self._run, time.perf_counter(), fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def run(self, fn, *args, **kwargs):
+        """Jalankan fn di pool ini dan tunggu hasilnya (dipanggil dari thread request)."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self, enqueued_at, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self._active += 1
+            self._waits.append(started - enqueued_at)
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._active -= 1
+                self._pending -= 1
+                self._run_times.append(finished - started)
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def queued(self):
+        with self._lock:
+            return self._pending - self._active
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits, dtype=np.float64) * 1000.0
+            run_times = np.array(self._run_times, dtype=np.float64) * 1000.0
+            info = {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._pending - self._active,
+                "peak_queued": self._peak_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+        def _pct(values, q):
+            return float(np.percentile(values, q)) if len(values) else 0.0
+
+        info["queue_wait_ms"] = {"p50": _pct(waits, 50), "p95": _pct(waits, 95), "max": _pct(waits, 100)}
+        info["run_ms"] = {"mean": float(run_times.mean()) if len(run_times) else 0.0, "p95": _pct(run_times, 95)}
+        return info
+
+
+# Pool untuk decode gambar (API), deteksi wajah (OpenCV melepas GIL, jadi thread cukup),
+# analisis video (satu video = satu pekerjaan panjang, antriannya pendek sendiri)
+# dan peta Grad-CAM (forward + backward di luar scheduler, hanya saat diminta).
+# Inferensi CNN sudah punya antrian sendiri di BatchScheduler.
+class StagePools:
+    def __init__(self, decode_workers, face_workers, max_queue, video_workers=1, video_max_queue=4,
+                 explain_workers=1, explain_max_queue=8):
+        self.decode = StagePool("decode", decode_workers, max_queue)
+        self.face = StagePool("face", face_workers, max_queue)
+        self.video = StagePool("video", video_workers, video_max_queue)
+        self.explain = StagePool("explain", explain_workers, explain_max_queue)
+
+    def stats(self):
+        return {"decode": self.decode.stats(), "face": self.face.stats(), "video": self.video.stats(),
+                "explain": self.explain.stats()}
+
+    def shutdown(self, wait=True):
+        self.decode.shutdown(wait)
+        self.face.shutdown(wait)
+        self.video.shutdown(wait)
+        self.explain.shutdown(wait)
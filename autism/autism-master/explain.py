@@ -0,0 +1,236 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import config
+import metrics
+from executors import Overloaded
+from prefetch import SingleFlight
+from screening import CONFIDENCE_THRESHOLD, ScreeningError
+
+# Naikkan jika cara menghitung/menggambar peta berubah agar overlay lama di cache tidak terpakai
+GRADCAM_VERSION = "gradcam-v1"
+
+NO_FACE_EXPLANATION = "❌ Tidak ada wajah yang dianalisis, peta Grad-CAM tidak tersedia."
+
+
+class ExplainError(RuntimeError):
+    pass
+
+
+class Explanation:
+    __slots__ = ("overlay", "heatmap", "confidence", "positive", "layer", "ms")
+
+    def __init__(self, overlay, heatmap, confidence, positive, layer, ms):
+        self.overlay = overlay        # gambar wajah utama RGB uint8 dengan heatmap di atasnya
+        self.heatmap = heatmap        # peta Grad-CAM 0..1 pada resolusi feature map
+        self.confidence = confidence  # skor CNN wajah utama (dari analisis yang di-cache)
+        self.positive = positive      # True = peta menjelaskan arah "Terdeteksi Autisme"
+        self.layer = layer            # nama layer konvolusi yang dipakai
+        self.ms = ms                  # durasi menghitung peta
+
+
+def _is_chain(model):
+    """True jika model berupa rantai layer tanpa cabang (Sequential atau functional linear)."""
+    import tensorflow as tf
+
+    if isinstance(model, tf.keras.Sequential):
+        return True
+    if len(model.inputs) != 1 or len(model.outputs) != 1:
+        return False
+    previous = None
+    for layer in model.get_config()["layers"]:
+        inbound = layer["inbound_nodes"]
+        if previous is None:
+            if inbound:
+                return False
+        elif len(inbound) != 1 or len(inbound[0]) != 1 or inbound[0][0][0] != previous:
+            return False
+        previous = layer["name"]
+    return True
+
+
+def _flatten(model):
+    """Layer dalam urutan pemanggilan; sub-model linear (mis. model asli di dalam wrapper uint8) dibuka."""
+    import tensorflow as tf
+
+    layers = []
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.layers.InputLayer):
+            continue
+        if isinstance(layer, tf.keras.Model) and _is_chain(layer):
+            layers += _flatten(layer)
+        else:
+            layers.append(layer)
+    return layers
+
+
+# Grad-CAM pada model Keras: bobot tiap channel feature map konvolusi terakhir = rata-rata gradien
+# skor terhadap channel tersebut. Forward dan backward berjalan dalam satu tf.function.
+class GradCam:
+    def __init__(self, model, input_shape):
+        import tensorflow as tf
+
+        if not _is_chain(model):
+            raise ExplainError("Grad-CAM hanya mendukung model berupa rantai layer (Sequential/functional linear)")
+        self.layers = _flatten(model)
+        # Output 4-D terakhir = feature map konvolusi terakhir (backbone bersarang dihitung satu layer);
+        # dimensi output tiap layer diambil dari satu forward pass dummy
+        x = tf.zeros((1,) + tuple(input_shape), model.inputs[0].dtype)
+        self.index = None
+        for i, layer in enumerate(self.layers):
+            x = layer(x, training=False)
+            if len(x.shape) == 4:
+                self.index = i
+        if self.index is None:
+            raise ExplainError("Model tidak punya layer konvolusi untuk Grad-CAM")
+        self.layer = self.layers[self.index].name
+        self._fn = tf.function(
+            self._compute,
+            input_signature=[tf.TensorSpec((1,) + tuple(input_shape), model.inputs[0].dtype),
+                             tf.TensorSpec((), tf.float32)],
+        )
+
+    def _compute(self, batch, direction):
+        import tensorflow as tf
+
+        with tf.GradientTape() as tape:
+            x = batch
+            for i, layer in enumerate(self.layers):
+                x = layer(x, training=False)
+                if i == self.index:
+                    features = x
+                    tape.watch(features)
+            target = direction * tf.reshape(tf.cast(x, tf.float32), (-1,))[0]
+        grads = tape.gradient(target, features)
+        weights = tf.reduce_mean(grads, axis=(1, 2), keepdims=True)
+        cam = tf.nn.relu(tf.reduce_sum(tf.cast(features, tf.float32) * weights, axis=-1))[0]
+        return cam / (tf.reduce_max(cam) + 1e-8)
+
+    def __call__(self, crop, positive):
+        """Peta 0..1 untuk crop uint8; positive=True menyorot area yang menurunkan skor Normal."""
+        direction = -1.0 if positive else 1.0
+        return self._fn(crop[None], np.float32(direction)).numpy()
+
+
+def render_overlay(rgb, box, heatmap, size=320, alpha=0.4):
+    """Area crop wajah pada gambar asli (sisi terpanjang = size) dengan heatmap JET di atasnya."""
+    x, y, w, h = box
+    scale = size / float(max(w, h))
+    out_size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_LINEAR
+    base = cv2.resize(rgb[y:y + h, x:x + w], out_size, interpolation=interpolation)
+    heat = cv2.resize(heatmap.astype(np.float32), out_size, interpolation=cv2.INTER_LINEAR)
+    heat = cv2.applyColorMap(np.uint8(np.clip(heat, 0.0, 1.0) * 255), cv2.COLORMAP_JET)
+    return cv2.addWeighted(base, 1.0 - alpha, cv2.cvtColor(heat, cv2.COLOR_BGR2RGB), alpha, 0.0)
+
+
+# Penjelasan Grad-CAM on-demand untuk wajah utama. Memakai analisis gambar yang sudah di-cache
+# (kotak crop + skor), jadi deteksi wajah dan skor tidak dihitung ulang; model Keras baru dimuat saat
+# peta pertama diminta. Hasilnya disimpan di cache sendiri yang dibatasi byte.
+class Explainer:
+    def __init__(self, screener, cache, pool=None, size=320, alpha=0.4):
+        self.screener = screener
+        self.cache = cache
+        # StagePool khusus Grad-CAM; None = jalan di thread pemanggil
+        self.pool = pool
+        self.size = size
+        self.alpha = alpha
+        self.flights = SingleFlight()
+        self._gradcam = None
+        self._lock = threading.Lock()
+        self.computed = 0
+
+    def signature(self):
+        return f"{GRADCAM_VERSION}:{self.size}:{self.alpha}"
+
+    def _model(self):
+        """Model Keras untuk gradien: milik backend keras jika ada, selain itu file .h5 dimuat sekali."""
+        with self._lock:
+            if self._gradcam is None:
+                backend = self.screener.model_service.backend
+                model = getattr(backend, "model", None)
+                if model is None:
+                    import tensorflow as tf
+
+                    from inference import with_rescaling
+
+                    # Backend TFLite/ONNX/replika tidak menyimpan model Keras di proses ini
+                    started = time.perf_counter()
+                    model = with_rescaling(tf.keras.models.load_model(config.KERAS_MODEL_PATH, compile=False))
+                    print(f"🔥 Model Keras untuk Grad-CAM dimuat ({time.perf_counter() - started:.2f}s)")
+                self._gradcam = GradCam(model, backend.input_shape)
+            return self._gradcam
+
+    # Mengembalikan ((explanation, dari_cache), pesan_error); Overloaded diteruskan ke pemanggil
+    def explain(self, image):
+        img_array, cache_key, error = self.screener.prepare(image)
+        if error:
+            return None, error
+        key = f"{cache_key}:{self.signature()}"
+        explanation = self.cache.get(key)
+        if explanation is not None:
+            return (explanation, True), None
+
+        # Normalnya hit cache: analisis sudah dihitung saat tombol analisis (atau spekulatif saat upload)
+        analysis, error = self.screener.analyze_prepared(img_array, cache_key)
+        if error:
+            return None, error
+        if analysis.crop_box is None:
+            return None, ScreeningError(NO_FACE_EXPLANATION, "no_face")
+
+        def compute():
+            explanation = self.cache.peek(key)
+            if explanation is None:
+                if self.pool is not None:
+                    explanation = self.pool.run(self._compute, img_array, analysis)
+                else:
+                    explanation = self._compute(img_array, analysis)
+                self.cache.put(key, explanation)
+                metrics.record("explain", explanation.ms)
+            return explanation
+
+        # Klik berulang pada gambar yang sama menunggu peta yang sedang dihitung
+        try:
+            explanation = self.flights.do(key, compute)
+        except Overloaded:
+            raise
+        except Exception as e:
+            return None, ScreeningError(f"❌ Gagal membuat peta Grad-CAM: {e}")
+        return (explanation, False), None
+
+    def _compute(self, img_array, analysis):
+        started = time.perf_counter()
+        gradcam = self._model()
+        face_stage = self.screener.face_stage
+        x, y, w, h = analysis.crop_box
+        crop = cv2.resize(img_array[y:y + h, x:x + w], face_stage.output_size, interpolation=cv2.INTER_AREA)
+        positive = analysis.confidence < CONFIDENCE_THRESHOLD
+        heatmap = gradcam(crop, positive)
+        overlay = render_overlay(img_array, analysis.crop_box, heatmap, self.size, self.alpha)
+        with self._lock:
+            self.computed += 1
+        return Explanation(overlay, heatmap, analysis.confidence, positive, gradcam.layer,
+                           (time.perf_counter() - started) * 1000.0)
+
+    def stats(self):
+        return {
+            "computed": self.computed,
+            "model_loaded": self._gradcam is not None,
+            "layer": self._gradcam.layer if self._gradcam is not None else None,
+            "cache": self.cache.stats(),
+        }
+
+
+def format_explanation(explanation, cached=False):
+    direction = "Terdeteksi Autisme" if explanation.positive else "Normal"
+    source = "dari cache" if cached else f"dihitung {explanation.ms:.0f} ms"
+    summary = (
+        f"🔥 Area merah paling mendorong skor wajah utama ke arah **{direction}** "
+        f"(confidence {explanation.confidence:.2f}; layer `{explanation.layer}`, {source})."
+    )
+    if not explanation.heatmap.max() > 0:
+        summary += "\nTidak ada area yang mendorong skor ke arah tersebut (peta kosong)."
+    return summary + "\n\nPeta ini alat bantu interpretasi model, bukan diagnosis."
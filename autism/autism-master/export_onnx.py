@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import numpy as np
+
+import config
+from inference import INPUT_SHAPE, KerasBackend, OnnxBackend, random_batch, with_rescaling
+
+
+def export(model_path, output_path, opset=13):
+    import tensorflow as tf
+    import tf2onnx
+
+    # Input uint8: layer Rescaling(1/255) ikut diekspor ke graph ONNX
+    model = with_rescaling(tf.keras.models.load_model(model_path))
+    spec = [tf.TensorSpec((None,) + INPUT_SHAPE, tf.uint8, name="input")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=output_path)
+    return output_path
+
+
+def _mean_latency_ms(backend, batch, runs):
+    backend.run_batch(batch)
+    started = time.perf_counter()
+    for _ in range(runs):
+        backend.run_batch(batch)
+    return (time.perf_counter() - started) / runs * 1000.0
+
+
+def verify(model_path, onnx_path, n_samples=16, runs=30, atol=1e-4):
+    """Bandingkan output dan latensi ONNX Runtime terhadap model Keras asli."""
+    keras_backend = KerasBackend(model_path).load()
+    onnx_backend = OnnxBackend(
+        onnx_path,
+        intra_op_threads=config.ONNX_INTRA_OP_THREADS,
+        inter_op_threads=config.ONNX_INTER_OP_THREADS,
+    ).load()
+
+    batch = random_batch(np.random.default_rng(0), n_samples)
+    expected = np.asarray(keras_backend.run_batch(batch)).reshape(-1)
+    actual = np.asarray(onnx_backend.run_batch(batch)).reshape(-1)
+    single = batch[:1]
+    return {
+        "max_abs_diff": float(np.max(np.abs(expected - actual))),
+        "atol": atol,
+        "ok": bool(np.allclose(expected, actual, atol=atol)),
+        "keras_load_seconds": keras_backend.load_seconds,
+        "onnx_load_seconds": onnx_backend.load_seconds,
+        "keras_latency_ms": _mean_latency_ms(keras_backend, single, runs),
+        "onnx_latency_ms": _mean_latency_ms(onnx_backend, single, runs),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export model .h5 ke ONNX untuk backend onnx")
+    parser.add_argument("--model", default=config.KERAS_MODEL_PATH)
+    parser.add_argument("--output", default=config.ONNX_MODEL_PATH)
+    parser.add_argument("--opset", type=int, default=13)
+    parser.add_argument("--skip-verify", action="store_true")
+    args = parser.parse_args()
+
+    export(args.model, args.output, args.opset)
+    print(f"✅ Model ONNX disimpan di: {args.output}")
+    if args.skip_verify:
+        return
+
+    result = verify(args.model, args.output)
+    status = "✅" if result["ok"] else "❌"
+    print(f"{status} Selisih maksimum output: {result['max_abs_diff']:.2e} (toleransi {result['atol']:.0e})")
+    print(
+        f"⏱️ Load: keras {result['keras_load_seconds']:.2f}s vs onnx {result['onnx_load_seconds']:.2f}s, "
+        f"latensi batch 1: keras {result['keras_latency_ms']:.2f} ms vs onnx {result['onnx_latency_ms']:.2f} ms"
+    )
+    if not result["ok"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+
+# Naikkan jika logika deteksi/crop berubah agar cache hasil lama tidak terpakai
+PREPROCESS_VERSION = "face-v3"
+
+# Aturan wajah utama (dipakai untuk keputusan) jika ada beberapa wajah
+PRIMARY_RULES = ("largest", "central")
+_local = threading.local()
+
+
+# Detector Haar di-cache per thread: parsing XML hanya sekali per worker,
+# dan satu CascadeClassifier tidak dipakai bersamaan oleh beberapa thread
+def get_detector():
+    detector = getattr(_local, "detector", None)
+    if detector is None:
+        detector = cv2.CascadeClassifier(CASCADE_PATH)
+        if detector.empty():
+            raise RuntimeError(f"Gagal memuat Haar cascade: {CASCADE_PATH}")
+        _local.detector = detector
+    return detector
+
+
+# Buffer per thread yang dipakai ulang antar gambar (piksel hasil decode, salinan kecil, grayscale);
+# hanya dialokasikan ulang jika gambar berikutnya lebih besar
+def workspace(name, shape):
+    buffers = getattr(_local, "buffers", None)
+    if buffers is None:
+        buffers = _local.buffers = {}
+    size = int(np.prod(shape))
+    flat = buffers.get(name)
+    if flat is None or flat.size < size:
+        flat = buffers[name] = np.empty(size, dtype=np.uint8)
+    return flat[:size].reshape(shape)
+
+
+# Thread internal OpenCV per panggilan; bila deteksi sudah paralel di beberapa worker,
+# nilai kecil mencegah worker saling berebut core (-1 = biarkan bawaan OpenCV)
+def configure_opencv_threads(threads):
+    if threads is not None and threads >= 0:
+        cv2.setNumThreads(threads)
+
+
+class FaceResult:
+    __slots__ = ("faces", "primary", "scored", "boxes", "crops", "timings")
+
+    def __init__(self, faces, primary, scored, boxes, crops, timings):
+        self.faces = faces      # semua kotak wajah (x, y, w, h) pada koordinat gambar asli
+        self.primary = primary  # indeks wajah utama di faces, None jika tidak ada wajah
+        self.scored = scored    # indeks wajah yang di-crop (wajah utama selalu pertama)
+        self.boxes = boxes      # kotak crop per wajah di scored
+        self.crops = crops      # crop RGB uint8 ukuran output (input CNN) per wajah di scored
+        self.timings = timings  # durasi per tahap dalam ms
+
+    @property
+    def box(self):
+        """Kotak crop wajah utama, None jika tidak ada wajah."""
+        return self.boxes[0] if self.boxes else None
+
+    @property
+    def crop(self):
+        """Crop wajah utama, None jika tidak ada wajah."""
+        return self.crops[0] if self.crops else None
+
+
+def downscale(rgb, max_side, reuse=False):
+    """Salinan gambar dengan sisi terpanjang maksimal max_side, beserta faktor skalanya.
+
+    reuse=True menulis ke buffer milik thread ini; isinya tertimpa oleh gambar berikutnya.
+    """
+    height, width = rgb.shape[:2]
+    scale = min(1.0, max_side / float(max(height, width)))
+    if scale >= 1.0:
+        return rgb, 1.0
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    dst = workspace("small", (size[1], size[0]) + rgb.shape[2:]) if reuse else None
+    return cv2.resize(rgb, size, dst=dst, interpolation=cv2.INTER_AREA), scale
+
+
+def primary_face(faces, image_shape, rule="largest"):
+    """Indeks wajah utama: terbesar, atau yang pusatnya paling dekat ke tengah gambar."""
+    if not faces:
+        return None
+    if rule == "central":
+        height, width = image_shape[:2]
+        return min(
+            range(len(faces)),
+            key=lambda i: (faces[i][0] + faces[i][2] / 2.0 - width / 2.0) ** 2
+            + (faces[i][1] + faces[i][3] / 2.0 - height / 2.0) ** 2,
+        )
+    if rule != "largest":
+        raise ValueError(f"Aturan wajah utama tidak dikenal: {rule} (pilih {', '.join(PRIMARY_RULES)})")
+    return max(range(len(faces)), key=lambda i: faces[i][2] * faces[i][3])
+
+
+def expand_box(box, image_shape, margin):
+    """Perbesar kotak wajah dengan margin dan jadikan persegi, dipotong di tepi gambar."""
+    x, y, w, h = box
+    height, width = image_shape[:2]
+    side = int(round(max(w, h) * (1.0 + 2.0 * margin)))
+    side = min(side, width, height)
+    cx, cy = x + w / 2.0, y + h / 2.0
+    left = int(round(min(max(cx - side / 2.0, 0), width - side)))
+    top = int(round(min(max(cy - side / 2.0, 0), height - side)))
+    return left, top, side, side
+
+
+class FaceStage:
+    def __init__(self, max_side=640, output_size=(224, 224), crop=True, margin=0.2,
+                 scale_factor=1.1, min_neighbors=5, min_size=(30, 30),
+                 max_faces=8, primary_rule="largest", stats_every=0, window=2048):
+        if primary_rule not in PRIMARY_RULES:
+            raise ValueError(f"Aturan wajah utama tidak dikenal: {primary_rule} (pilih {', '.join(PRIMARY_RULES)})")
+        self.max_side = max_side
+        self.output_size = tuple(output_size)
+        self.crop = crop
+        self.margin = margin
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = tuple(min_size)
+        # Jumlah wajah maksimum yang di-crop dan diskor per gambar (1 = hanya wajah utama)
+        self.max_faces = max(1, max_faces)
+        self.primary_rule = primary_rule
+        self.stats_every = stats_every
+
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._window = window
+        self._runs = 0
+        self._no_face = 0
+
+    def signature(self):
+        """Versi preprocessing plus parameter yang mempengaruhi hasil, untuk kunci cache."""
+        return (
+            f"{PREPROCESS_VERSION}:{self.max_side}:{self.output_size}:{int(self.crop)}:{self.margin}:"
+            f"{self.scale_factor}:{self.min_neighbors}:{self.min_size}:{self.max_faces}:{self.primary_rule}"
+        )
+
+    def detect(self, rgb):
+        """Deteksi wajah pada salinan kecil, kotak dikembalikan dalam koordinat gambar asli."""
+        faces, _, _, _, timings = self._detect(rgb)
+        return faces, timings
+
+    def small_gray(self, rgb, timings):
+        """(salinan kecil, skala, grayscale) di buffer per thread; isinya tertimpa oleh gambar berikutnya."""
+        started = time.perf_counter()
+        small, scale = downscale(rgb, self.max_side, reuse=True)
+        timings["downscale"] = (time.perf_counter() - started) * 1000.0
+
+        started = time.perf_counter()
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY, dst=workspace("gray", small.shape[:2]))
+        timings["grayscale"] = (time.perf_counter() - started) * 1000.0
+        return small, scale, gray
+
+    def detect_small(self, gray, timings):
+        """Kotak wajah (x, y, w, h) pada koordinat salinan kecil."""
+        started = time.perf_counter()
+        boxes = get_detector().detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=self.min_size,
+        )
+        timings["detect"] = (time.perf_counter() - started) * 1000.0
+        return [tuple(int(v) for v in box) for box in np.asarray(boxes).reshape(-1, 4)]
+
+    def _detect(self, rgb):
+        # Salinan kecil dan grayscale ditulis ke buffer per thread; salinan kecil juga sumber crop
+        timings = {}
+        small, scale, gray = self.small_gray(rgb, timings)
+        small_faces = self.detect_small(gray, timings)
+        faces = [tuple(int(round(v / scale)) for v in box) for box in small_faces]
+        return faces, small_faces, small, scale, timings
+
+    def _crop_source(self, rgb, small, scale, small_face, face):
+        """(gambar sumber, kotak di sumber, kotak di gambar asli) untuk crop.
+
+        Salinan kecil dipakai jika kotaknya masih >= ukuran output (tanpa upsampling),
+        sehingga resize crop membaca piksel yang sudah ada di cache, bukan gambar asli.
+        """
+        out_w, out_h = self.output_size
+        if self.crop:
+            small_box = expand_box(small_face, small.shape, self.margin)
+            if scale < 1.0 and small_box[2] >= max(out_w, out_h):
+                return small, small_box, tuple(int(round(v / scale)) for v in small_box)
+            box = expand_box(face, rgb.shape, self.margin)
+            return rgb, box, box
+        full = (0, 0, rgb.shape[1], rgb.shape[0])
+        if scale < 1.0 and small.shape[1] >= out_w and small.shape[0] >= out_h:
+            return small, (0, 0, small.shape[1], small.shape[0]), full
+        return rgb, full, full
+
+    def crop_face(self, rgb, small, scale, small_face, timings):
+        """(kotak crop di gambar asli, crop RGB uint8 ukuran output) untuk satu kotak wajah di salinan kecil."""
+        started = time.perf_counter()
+        face = tuple(int(round(v / scale)) for v in small_face)
+        source, (x, y, w, h), box = self._crop_source(rgb, small, scale, small_face, face)
+        # Array baru (bukan buffer thread): crop menunggu di antrian scheduler setelah fungsi ini selesai
+        crop = cv2.resize(source[y:y + h, x:x + w], self.output_size, interpolation=cv2.INTER_AREA)
+        timings["crop"] = (time.perf_counter() - started) * 1000.0
+        return box, crop
+
+    def run(self, rgb):
+        faces, small_faces, small, scale, timings = self._detect(rgb)
+        primary = primary_face(faces, rgb.shape, self.primary_rule)
+        scored, boxes, crops = [], [], []
+        if faces:
+            # Wajah utama lebih dulu, lalu wajah lain dari yang terbesar sampai max_faces;
+            # tanpa crop wajah (seluruh gambar) hanya ada satu input CNN
+            others = sorted((i for i in range(len(faces)) if i != primary),
+                            key=lambda i: faces[i][2] * faces[i][3], reverse=True)
+            scored = ([primary] + others)[:self.max_faces if self.crop else 1]
+            crop_ms = 0.0
+            for i in scored:
+                # Margin agar dahi dan dagu ikut
+                box, crop = self.crop_face(rgb, small, scale, small_faces[i], timings)
+                crop_ms += timings["crop"]
+                boxes.append(box)
+                crops.append(crop)
+            timings["crop"] = crop_ms
+
+        self._record(timings, found=bool(faces))
+        return FaceResult(faces, primary, scored, boxes, crops, timings)
+
+    def _record(self, timings, found):
+        with self._lock:
+            self._runs += 1
+            if not found:
+                self._no_face += 1
+            for stage, value in timings.items():
+                self._timings.setdefault(stage, deque(maxlen=self._window)).append(value)
+            log_now = self.stats_every and self._runs % self.stats_every == 0
+        if log_now:
+            print(f"📊 {self.format_stats()}")
+
+    def stats(self):
+        with self._lock:
+            timings = {k: np.array(v) for k, v in self._timings.items()}
+            runs, no_face = self._runs, self._no_face
+        return {
+            "runs": runs,
+            "no_face": no_face,
+            "max_side": self.max_side,
+            "stage_ms": {
+                stage: {
+                    "mean": float(values.mean()),
+                    "p50": float(np.percentile(values, 50)),
+                    "p95": float(np.percentile(values, 95)),
+                }
+                for stage, values in timings.items() if len(values)
+            },
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        stages = ", ".join(
+            f"{stage} {v['mean']:.1f} ms (p95 {v['p95']:.1f})" for stage, v in s["stage_ms"].items()
+        )
+        return f"Face stage: {s['runs']} gambar, {s['no_face']} tanpa wajah, {stages}"
@@ -0,0 +1,415 @@
+import argparse
+import io
+import threading
+import time
+
+import numpy as np
+
+import config
+
+INPUT_SHAPE = (224, 224, 3)
+# Input backend: crop wajah RGB uint8 apa adanya; skala /255 sudah menjadi layer di dalam graph model
+INPUT_DTYPE = np.uint8
+
+
+def with_rescaling(model):
+    """Bungkus model Keras (input float 0..1) agar menerima uint8 0..255 lewat layer Rescaling(1/255)."""
+    import tensorflow as tf
+
+    if model.inputs[0].dtype == tf.uint8:
+        return model
+    inputs = tf.keras.Input(tuple(model.inputs[0].shape[1:]), dtype=tf.uint8, name="image_uint8")
+    rescaled = tf.keras.layers.Rescaling(1.0 / 255.0, name="rescale_uint8")(inputs)
+    return tf.keras.Model(inputs, model(rescaled), name=f"{model.name}_uint8")
+
+
+def scale_legacy_input(batch):
+    """Batch uint8 → float32 0..1 untuk file model lama yang dibuat sebelum Rescaling masuk graph."""
+    return np.multiply(batch, np.float32(1.0 / 255.0), dtype=np.float32)
+
+
+def random_batch(rng, batch_size, input_shape=INPUT_SHAPE, dtype=INPUT_DTYPE):
+    """Batch acak untuk parity/benchmark sesuai dtype input model."""
+    shape = (batch_size,) + tuple(input_shape)
+    if np.issubdtype(dtype, np.integer):
+        return rng.integers(0, 256, shape, dtype=dtype)
+    return rng.random(shape, dtype=np.float32)
+
+
+# Antarmuka backend inferensi: load, warmup, run_batch, describe.
+# UI dan scheduler hanya bergantung pada antarmuka ini, engine dipilih lewat config.
+class InferenceBackend:
+    name = "base"
+
+    def __init__(self, path, input_shape=INPUT_SHAPE):
+        self.path = path
+        self.input_shape = tuple(input_shape)
+        self.input_dtype = INPUT_DTYPE
+        self.load_seconds = None
+        self.warmup_seconds = {}
+        # Isi file model yang sudah dibaca proses induk (mode replika); jika ada, dipakai menggantikan path
+        self.content = None
+
+    def load(self):
+        started = time.perf_counter()
+        self._load()
+        self.load_seconds = time.perf_counter() - started
+        return self
+
+    def _load(self):
+        raise NotImplementedError
+
+    def run_batch(self, batch):
+        """Batch uint8 (N, 224, 224, 3) → array skor (N, 1).
+
+        Buffer batch dipakai ulang oleh scheduler: backend tidak boleh menyimpan referensinya.
+        """
+        raise NotImplementedError
+
+    def __call__(self, batch):
+        return self.run_batch(batch)
+
+    def warmup(self, batch_sizes=(1,)):
+        """Jalankan batch dummy agar request pertama tidak menanggung biaya inisialisasi."""
+        for size in batch_sizes:
+            dummy = np.zeros((size,) + self.input_shape, dtype=self.input_dtype)
+            started = time.perf_counter()
+            self.run_batch(dummy)
+            self.warmup_seconds[size] = time.perf_counter() - started
+        return dict(self.warmup_seconds)
+
+    def describe(self):
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "input_shape": list(self.input_shape),
+            "input_dtype": np.dtype(self.input_dtype).name,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": dict(self.warmup_seconds),
+        }
+
+
+# Jalur cepat: panggil model langsung lewat tf.function dengan signature tetap,
+# tanpa data adapter dan iterasi tf.data yang dibuat model.predict di setiap panggilan
+class CompiledModel:
+    def __init__(self, model, input_shape=INPUT_SHAPE):
+        import tensorflow as tf
+
+        self.model = model
+        self.input_shape = tuple(input_shape)
+        self.dtype = model.inputs[0].dtype.as_numpy_dtype
+        self._tf = tf
+        self._fn = tf.function(
+            self._forward,
+            input_signature=[tf.TensorSpec((None,) + self.input_shape, model.inputs[0].dtype)],
+            reduce_retracing=True,
+        )
+
+    def _forward(self, batch):
+        return self.model(batch, training=False)
+
+    def __call__(self, batch):
+        batch = np.asarray(batch, dtype=self.dtype)
+        return self._fn(self._tf.constant(batch)).numpy()
+
+    def warmup(self, batch_sizes=(1,)):
+        """Trace dan jalankan model dengan batch dummy agar request pertama tidak menunggu."""
+        timings = {}
+        for size in batch_sizes:
+            dummy = np.zeros((size,) + self.input_shape, dtype=self.dtype)
+            started = time.perf_counter()
+            self(dummy)
+            timings[size] = time.perf_counter() - started
+        return timings
+
+
+def configure_tf_threads(intra_op_threads=0, inter_op_threads=0):
+    """Atur thread pool TensorFlow; harus dipanggil sebelum operasi TF pertama (0 = bawaan TF)."""
+    import tensorflow as tf
+
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        # Runtime TF sudah terinisialisasi (mis. dipanggil dua kali dalam satu proses)
+        print(f"⚠️ Thread pool TensorFlow tidak bisa diubah: {e}")
+
+
+class KerasBackend(InferenceBackend):
+    name = "keras"
+
+    def __init__(self, path, compiled=True, input_shape=INPUT_SHAPE,
+                 intra_op_threads=None, inter_op_threads=None, mmap_dir=None):
+        super().__init__(path, input_shape)
+        self.compiled = compiled
+        # Folder layout mmap (model_store.prepare_mmap); jika ada, dipakai menggantikan file .h5
+        self.mmap_dir = mmap_dir
+        self.intra_op_threads = config.TF_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        self.inter_op_threads = config.TF_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads
+        self.model = None
+        self._run = None
+
+    def _load(self):
+        import tensorflow as tf
+
+        configure_tf_threads(self.intra_op_threads, self.inter_op_threads)
+        if self.mmap_dir is not None:
+            from model_store import load_mmap_model
+
+            model = load_mmap_model(self.mmap_dir)
+        elif self.content is not None:
+            import h5py
+
+            with h5py.File(io.BytesIO(self.content), "r") as f:
+                model = tf.keras.models.load_model(f)
+        else:
+            model = tf.keras.models.load_model(self.path)
+        # Skala /255 dijalankan di graph (layer Rescaling), input model langsung uint8
+        self.model = with_rescaling(model)
+        if self.compiled:
+            self._run = CompiledModel(self.model, self.input_shape)
+        else:
+            self._run = lambda batch: self.model.predict(batch, verbose=0)
+
+    def run_batch(self, batch):
+        return self._run(np.asarray(batch, dtype=self.input_dtype))
+
+    def describe(self):
+        info = super().describe()
+        info["mode"] = "tf.function" if self.compiled else "model.predict"
+        info["weights"] = "mmap" if self.mmap_dir else "h5"
+        if self.model is not None:
+            import tensorflow as tf
+
+            info["intra_op_threads"] = tf.config.threading.get_intra_op_parallelism_threads()
+            info["inter_op_threads"] = tf.config.threading.get_inter_op_parallelism_threads()
+        return info
+
+
+# Model TFLite (hasil quantize.py)
+class TFLiteBackend(InferenceBackend):
+    name = "tflite"
+
+    def __init__(self, path, num_threads=None, input_shape=INPUT_SHAPE):
+        super().__init__(path, input_shape)
+        self.num_threads = num_threads or None
+        self.interpreter = None
+        self._batch_size = None
+        # Interpreter TFLite tidak thread-safe
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+        if self.content is not None:
+            self.interpreter = Interpreter(model_content=self.content, num_threads=self.num_threads)
+        else:
+            self.interpreter = Interpreter(model_path=self.path, num_threads=self.num_threads)
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(
+                self._input["index"], (batch_size,) + self.input_shape
+            )
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def _quantize_input(self, batch):
+        dtype = self._input["dtype"]
+        scale, zero_point = self._input["quantization"]
+        # Model baru: input uint8 mentah (Rescaling di graph). Model lama: float 0..1, mungkin terkuantisasi
+        if not scale and np.issubdtype(dtype, np.integer):
+            return batch.astype(dtype, copy=False)
+        batch = scale_legacy_input(batch)
+        if dtype == np.float32:
+            return batch
+        info = np.iinfo(dtype)
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+    def _dequantize_output(self, output):
+        if self._output["dtype"] == np.float32:
+            return output
+        scale, zero_point = self._output["quantization"]
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def run_batch(self, batch):
+        batch = np.asarray(batch, dtype=self.input_dtype)
+        with self._lock:
+            self._resize(len(batch))
+            self.interpreter.set_tensor(self._input["index"], self._quantize_input(batch))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output["index"])
+        return self._dequantize_output(output)
+
+    def describe(self):
+        info = super().describe()
+        info["num_threads"] = self.num_threads
+        if self.interpreter is not None:
+            info["model_input_dtype"] = np.dtype(self._input["dtype"]).name
+        return info
+
+
+# Model ONNX (hasil export_onnx.py) dijalankan dengan ONNX Runtime di CPU
+class OnnxBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, path, intra_op_threads=0, inter_op_threads=0, input_shape=INPUT_SHAPE):
+        super().__init__(path, input_shape)
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.session = None
+
+    def _load(self):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError(
+                "Backend onnx membutuhkan paket onnxruntime (pip install onnxruntime)"
+            ) from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.intra_op_threads
+        options.inter_op_num_threads = self.inter_op_threads
+        self.session = ort.InferenceSession(
+            self.content if self.content is not None else self.path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_name = self.session.get_inputs()[0].name
+        self._output_name = self.session.get_outputs()[0].name
+        # Ekspor lama (sebelum Rescaling masuk graph) menerima float 0..1
+        self._legacy_float = self.session.get_inputs()[0].type == "tensor(float)"
+
+    def run_batch(self, batch):
+        batch = np.asarray(batch, dtype=self.input_dtype)
+        if self._legacy_float:
+            batch = scale_legacy_input(batch)
+        return self.session.run([self._output_name], {self._input_name: batch})[0]
+
+    def describe(self):
+        info = super().describe()
+        info["intra_op_threads"] = self.intra_op_threads
+        info["inter_op_threads"] = self.inter_op_threads
+        if self.session is not None:
+            info["providers"] = self.session.get_providers()
+            info["model_input_dtype"] = "float32" if self._legacy_float else "uint8"
+        return info
+
+
+def create_backend(name=None, path=None, threads=None, mmap_dir=None):
+    """Buat backend (belum dimuat) sesuai nama di config.BACKEND.
+
+    threads menggantikan jumlah thread intra-op dari config (dipakai tiap proses replika);
+    mmap_dir hanya dipakai backend keras.
+    """
+    name = name or config.BACKEND
+    if name in ("keras", "keras-predict"):
+        return KerasBackend(path or config.KERAS_MODEL_PATH, compiled=(name == "keras"),
+                            intra_op_threads=threads, inter_op_threads=1 if threads else None,
+                            mmap_dir=mmap_dir)
+    if name == "tflite":
+        return TFLiteBackend(path or config.TFLITE_MODEL_PATH, num_threads=threads or config.TFLITE_NUM_THREADS)
+    if name == "onnx":
+        return OnnxBackend(
+            path or config.ONNX_MODEL_PATH,
+            intra_op_threads=threads or config.ONNX_INTRA_OP_THREADS,
+            inter_op_threads=1 if threads else config.ONNX_INTER_OP_THREADS,
+        )
+    raise ValueError(f"Backend tidak dikenal: {name} (pilihan: {', '.join(BACKENDS)})")
+
+
+BACKENDS = ("keras", "keras-predict", "tflite", "onnx")
+
+
+def parity_check(model, compiled, n_samples=8, seed=0, atol=1e-4):
+    """Bandingkan output CompiledModel dengan model.predict pada input acak."""
+    batch = random_batch(np.random.default_rng(seed), n_samples, compiled.input_shape, compiled.dtype)
+    expected = model.predict(batch, verbose=0)
+    actual = compiled(batch)
+    max_abs_diff = float(np.max(np.abs(expected - actual)))
+    return {
+        "samples": n_samples,
+        "max_abs_diff": max_abs_diff,
+        "atol": atol,
+        "ok": max_abs_diff <= atol,
+    }
+
+
+def compare_latency(model, compiled, batch_size=1, runs=50, warmup_runs=5):
+    """Ukur latensi model.predict vs CompiledModel untuk ukuran batch yang sama."""
+    batch = random_batch(np.random.default_rng(1), batch_size, compiled.input_shape, compiled.dtype)
+
+    def _measure(fn):
+        for _ in range(warmup_runs):
+            fn(batch)
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn(batch)
+            samples.append((time.perf_counter() - started) * 1000.0)
+        samples = np.array(samples)
+        return {
+            "mean_ms": float(samples.mean()),
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)),
+        }
+
+    result = {
+        "batch_size": batch_size,
+        "runs": runs,
+        "predict": _measure(lambda x: model.predict(x, verbose=0)),
+        "compiled": _measure(compiled),
+    }
+    result["speedup"] = result["predict"]["mean_ms"] / max(result["compiled"]["mean_ms"], 1e-9)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cek kesamaan output dan bandingkan latensi model.predict vs tf.function"
+    )
+    parser.add_argument(
+        "--model",
+        default=config.KERAS_MODEL_PATH,
+    )
+    parser.add_argument("--batch-sizes", default="1,8", help="Ukuran batch dipisah koma")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    import tensorflow as tf
+
+    model = with_rescaling(tf.keras.models.load_model(args.model))
+    compiled = CompiledModel(model)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b]
+    compiled.warmup(batch_sizes)
+
+    parity = parity_check(model, compiled)
+    status = "✅" if parity["ok"] else "❌"
+    print(f"{status} Selisih maksimum output: {parity['max_abs_diff']:.2e} (toleransi {parity['atol']:.0e})")
+
+    for size in batch_sizes:
+        lat = compare_latency(model, compiled, batch_size=size, runs=args.runs)
+        print(
+            f"⏱️ batch {size}: model.predict {lat['predict']['mean_ms']:.2f} ms, "
+            f"tf.function {lat['compiled']['mean_ms']:.2f} ms "
+            f"(p95 {lat['predict']['p95_ms']:.2f} vs {lat['compiled']['p95_ms']:.2f} ms) "
+            f"→ {lat['speedup']:.1f}x lebih cepat"
+        )
+
+    if not parity["ok"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+import config
+from face_stage import workspace
+
+# Format yang diterima; JPEG multi-gambar dari sebagian kamera ponsel terbaca sebagai MPO
+ALLOWED_FORMATS = ("JPEG", "PNG", "WEBP", "BMP")
+DRAFT_FORMATS = ("JPEG", "MPO")
+# Baris per potongan saat menyalin piksel PIL ke buffer (salinan sementara hanya beberapa ratus KB)
+COPY_ROWS = 32
+
+# Tag EXIF Orientation → transformasi agar gambar tegak (sama seperti ImageOps.exif_transpose)
+EXIF_ORIENTATION = 0x0112
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+class IngestError(ValueError):
+    pass
+
+
+# File melebihi batas byte/piksel (API menjawab 413, bukan 422)
+class ImageTooLarge(IngestError):
+    pass
+
+
+def signature(max_side=None):
+    """Versi ingest untuk kunci cache: piksel hasil decode bergantung pada batas sisi."""
+    return f"ingest:{max_side or config.INGEST_MAX_SIDE}"
+
+
+def _byte_size(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    return os.path.getsize(os.fspath(source))
+
+
+def _draft_size(size, max_side):
+    # Ukuran minimal yang diminta ke libjpeg: sisi terpanjang tetap >= max_side,
+    # libjpeg memilih skala 1/2, 1/4 atau 1/8 terbesar yang masih memenuhi
+    width, height = size
+    scale = max_side / max(width, height)
+    return max(1, int(width * scale + 0.5)), max(1, int(height * scale + 0.5))
+
+
+def load_image(source, max_side=None, max_bytes=None, max_pixels=None):
+    """Decode file gambar (path atau bytes) menjadi PIL RGB tegak dengan sisi terpanjang <= max_side.
+
+    Batas byte dan piksel diperiksa dari ukuran file dan header sebelum piksel di-decode.
+    JPEG di-decode langsung pada resolusi yang diperkecil (draft mode libjpeg).
+    """
+    max_side = max_side or config.INGEST_MAX_SIDE
+    max_bytes = max_bytes or config.INGEST_MAX_BYTES
+    max_pixels = max_pixels or config.INGEST_MAX_PIXELS
+
+    try:
+        size = _byte_size(source)
+    except (OSError, TypeError) as e:
+        raise IngestError(f"File gambar tidak bisa dibaca: {e}")
+    if size == 0:
+        raise IngestError("File gambar kosong")
+    if size > max_bytes:
+        raise ImageTooLarge(f"Ukuran file {size / 1e6:.1f} MB melebihi batas {max_bytes / 1e6:.1f} MB")
+
+    fp = io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source
+    try:
+        # Image.open hanya membaca header; piksel baru di-decode saat convert(). Bom dekompresi ditolak
+        # oleh batas piksel di bawah (atau DecompressionBombError PIL untuk header yang sangat besar)
+        with Image.open(fp, formats=ALLOWED_FORMATS) as image:
+            width, height = image.size
+            if width * height > max_pixels:
+                raise ImageTooLarge(
+                    f"Resolusi {width}x{height} ({width * height / 1e6:.0f} MP) melebihi batas "
+                    f"{max_pixels / 1e6:.0f} MP"
+                )
+            if image.format in DRAFT_FORMATS and max(width, height) > max_side:
+                image.draft("RGB", _draft_size(image.size, max_side))
+            orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+            rgb = image.convert("RGB")
+    except IngestError:
+        raise
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(f"Gambar ditolak (decompression bomb): {e}")
+    except Image.UnidentifiedImageError:
+        raise IngestError(f"Format gambar tidak didukung (gunakan {'/'.join(ALLOWED_FORMATS[:3])})")
+    except Exception as e:
+        raise IngestError(f"Gambar tidak bisa dibaca: {e}")
+
+    # Sisa pengecilan (PNG, atau JPEG setelah skala 1/2-1/8) dan rotasi dilakukan pada gambar kecil
+    if max(rgb.size) > max_side:
+        rgb.thumbnail((max_side, max_side), Image.Resampling.BILINEAR, reducing_gap=2.0)
+    if orientation in ORIENTATION_TRANSPOSE:
+        rgb = rgb.transpose(ORIENTATION_TRANSPOSE[orientation])
+    return rgb
+
+
+def to_array(image):
+    """Piksel PIL RGB → array (H, W, 3) uint8 di buffer per thread yang dipakai ulang.
+
+    np.asarray(image) membuat salinan bytes seukuran gambar penuh tiap request; di sini piksel disalin
+    per potongan baris langsung ke buffer. Isinya tertimpa oleh gambar berikutnya di thread yang sama.
+    """
+    width, height = image.size
+    out = workspace("rgb", (height, width, 3))
+    for top in range(0, height, COPY_ROWS):
+        bottom = min(top + COPY_ROWS, height)
+        out[top:bottom] = np.asarray(image.crop((0, top, width, bottom)))
+    return out
@@ -0,0 +1,224 @@
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import config
+
+# Batas bucket histogram latensi (detik)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Label {self.name} harus {self.labelnames}, bukan {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key, state):
+        counts, total, n = state
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            labels = key + (("le", _format_value(bound)),)
+            lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+# Registry metrik dalam format teks Prometheus, tanpa dependensi tambahan
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def register_collector(self, collect):
+        """collect() dipanggil saat scrape dan mengembalikan list (nama, tipe, help, [(labels, nilai)])."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            metrics, collectors = list(self._metrics), list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            try:
+                families = collect()
+            except Exception as e:
+                lines.append(f"# collector error: {_escape(e)}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "autisense_stage_seconds", "Durasi tiap tahap screening", ("stage",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "autisense_request_seconds", "Durasi total satu analisis", ("endpoint",)
+)
+SCREENINGS = REGISTRY.counter(
+    "autisense_screenings_total",
+    "Jumlah analisis per hasil (ok, no_face, invalid_image, not_ready, busy, error)",
+    ("source", "outcome"),
+)
+VIDEO_PROCESSING_FPS = REGISTRY.histogram(
+    "autisense_video_processing_fps",
+    "Frame video yang diproses per detik (file: termasuk frame yang dilewati, webcam: frame dianalisis)",
+    ("source",),
+    buckets=(1, 2.5, 5, 10, 15, 24, 30, 60, 120, 240),
+)
+
+
+class Trace:
+    __slots__ = ("trace_id", "name", "spans", "started")
+
+    def __init__(self, name, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.name = name
+        self.spans = []
+        self.started = time.perf_counter()
+
+
+_current = contextvars.ContextVar("autisense_trace", default=None)
+
+
+def current_trace_id():
+    trace_ = _current.get()
+    return trace_.trace_id if trace_ is not None else None
+
+
+def record(stage, ms):
+    """Catat durasi tahap (ms) ke histogram dan ke trace request yang sedang berjalan."""
+    STAGE_SECONDS.observe(ms / 1000.0, stage=stage)
+    trace_ = _current.get()
+    if trace_ is not None:
+        trace_.spans.append((stage, ms))
+
+
+@contextmanager
+def span(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, (time.perf_counter() - started) * 1000.0)
+
+
+# Satu trace per request: durasi total masuk histogram, rincian tahap dicetak bersama trace ID
+# jika AUTISENSE_TRACE_LOG=1 atau request lebih lambat dari AUTISENSE_TRACE_SLOW_MS
+@contextmanager
+def trace(name, trace_id=None):
+    trace_ = Trace(name, trace_id)
+    token = _current.set(trace_)
+    try:
+        yield trace_
+    finally:
+        _current.reset(token)
+        total_ms = (time.perf_counter() - trace_.started) * 1000.0
+        REQUEST_SECONDS.observe(total_ms / 1000.0, endpoint=name)
+        slow = config.TRACE_SLOW_MS and total_ms >= config.TRACE_SLOW_MS
+        if config.TRACE_LOG or slow:
+            stages = ", ".join(f"{stage} {ms:.1f}" for stage, ms in trace_.spans)
+            print(f"🔎 trace {trace_.trace_id} {name} {total_ms:.1f} ms — {stages}")
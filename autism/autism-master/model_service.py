@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+import traceback
+
+import config
+from inference import create_backend
+from model_store import ensure_model, prepare_mmap
+from replicas import ReplicaBackend
+from scheduler import BatchScheduler
+
+# Status siklus hidup model
+STARTING = "starting"
+DOWNLOADING = "downloading"
+LOADING = "loading"
+WARMING_UP = "warming_up"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelNotReady(RuntimeError):
+    pass
+
+
+# Memuat model di thread latar belakang agar UI dan health check bisa langsung hidup
+class ModelService:
+    def __init__(self, backend_name=None, model_path=None):
+        self.backend_name = backend_name or config.BACKEND
+        # None = path model dari config sesuai backend
+        self.model_path = model_path
+        self.backend = None
+        self.scheduler = None
+        self.artifact = None  # entri manifest model .h5 (versi, sha256, ukuran)
+        self.state = STARTING
+        self.error = None
+        self.started_at = time.time()
+        self.ready_at = None
+        self._ready = threading.Event()
+        self._finished = threading.Event()
+        self._thread = None
+        self._replicas = None
+
+    def start(self):
+        if self._thread is None:
+            if config.REPLICAS > 1:
+                # Replika di-fork sekarang, dari thread pemanggil sebelum thread loader berjalan. File model
+                # yang sudah ada dibaca sekali sebelum fork (dibagi copy-on-write); model baru di-parse di
+                # replika setelah file diunduh/diverifikasi oleh thread loader
+                self._replicas = ReplicaBackend(
+                    self.backend_name,
+                    self.model_path,
+                    replicas=config.REPLICAS,
+                    threads=config.REPLICA_THREADS or None,
+                    slots=config.REPLICA_SLOTS,
+                    max_batch_size=config.MAX_BATCH_SIZE,
+                    start_timeout=config.REPLICA_START_TIMEOUT,
+                    batch_timeout=config.REPLICA_BATCH_TIMEOUT,
+                ).fork(preload=not (self.backend_name.startswith("keras") and config.MODEL_MMAP))
+            self._thread = threading.Thread(target=self._load, name="model-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _load(self):
+        try:
+            keras = self.backend_name.startswith("keras")
+            # Model .h5 dari config diambil/diverifikasi lewat model store (hanya untuk backend keras)
+            if keras and self.model_path is None:
+                self.state = DOWNLOADING
+                self.artifact = ensure_model(config.KERAS_MODEL_PATH)
+
+            self.state = LOADING
+            mmap_dir = None
+            if keras and config.MODEL_MMAP:
+                mmap_dir = prepare_mmap(self.model_path or config.KERAS_MODEL_PATH, isolated=config.REPLICAS > 1)
+            if self._replicas is not None:
+                # Model dimuat di proses replika; proses ini hanya membagi batch ke replika
+                backend = self._replicas
+                backend.mmap_dir = mmap_dir
+            else:
+                backend = create_backend(self.backend_name, self.model_path, mmap_dir=mmap_dir)
+            if not os.path.exists(backend.path):
+                raise FileNotFoundError(f"Model tidak ditemukan di: {backend.path}")
+            backend.load()
+            print(f"✅ Model berhasil dimuat dari: {backend.path} (backend {backend.name}, {backend.load_seconds:.2f}s)")
+
+            # Warmup sebelum menerima request agar user pertama tidak menunggu tracing/alokasi
+            self.state = WARMING_UP
+            warmup_times = backend.warmup(sorted({1, config.MAX_BATCH_SIZE}))
+            print(f"🔥 Warmup model selesai: {', '.join(f'batch {b}: {t:.2f}s' for b, t in warmup_times.items())}")
+
+            # Scheduler micro-batching: request dari banyak sesi digabung jadi satu forward pass
+            self.scheduler = BatchScheduler(
+                backend.run_batch,
+                max_batch_size=config.MAX_BATCH_SIZE,
+                max_wait_ms=config.MAX_WAIT_MS,
+                stats_every=config.BATCH_STATS_EVERY,
+                max_queue=config.INFERENCE_MAX_QUEUE,
+                # Mode replika: satu batch berjalan per replika secara bersamaan
+                max_inflight=getattr(backend, "max_inflight", 1),
+            ).start()
+            self.backend = backend
+            self.ready_at = time.time()
+            self.state = READY
+            self._ready.set()
+        except Exception as e:
+            if self._replicas is not None:
+                self._replicas.close()
+            self.error = str(e)
+            self.state = FAILED
+            print(f"❌ Gagal memuat model: {e}")
+            traceback.print_exc()
+        finally:
+            self._finished.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def model_version(self):
+        """Identitas model yang sedang dipakai (backend + file + ukuran + waktu ubah)."""
+        if self.backend is None:
+            return None
+        stat = os.stat(self.backend.path)
+        return f"{self.backend.name}:{os.path.basename(self.backend.path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+    def wait_ready(self, timeout=None):
+        """Tunggu sampai loading selesai (berhasil atau gagal); True jika model siap."""
+        self._finished.wait(timeout)
+        return self.ready
+
+    def predict(self, tensor, timeout=None):
+        if not self.ready:
+            raise ModelNotReady(self.status_message())
+        return self.scheduler.predict(tensor, timeout)
+
+    def submit(self, tensor):
+        """Masukkan tensor ke scheduler tanpa menunggu hasilnya (Future); dipakai mode video."""
+        if not self.ready:
+            raise ModelNotReady(self.status_message())
+        return self.scheduler.submit(tensor)
+
+    def predict_many(self, tensors, timeout=None):
+        """Skor beberapa tensor (mis. semua wajah satu gambar) dalam forward pass yang sama."""
+        if not self.ready:
+            raise ModelNotReady(self.status_message())
+        return [future.result(timeout) for future in self.scheduler.submit_many(tensors)]
+
+    def close(self):
+        """Hentikan scheduler dan tutup backend (mis. proses replika) saat server berhenti."""
+        if self.scheduler is not None:
+            self.scheduler.stop(timeout=5)
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            close()
+
+    def status_message(self):
+        if self.state == FAILED:
+            return f"❌ Model gagal dimuat: {self.error}"
+        if self.state == READY:
+            return "✅ Model siap digunakan."
+        return "⏳ Model sedang disiapkan (warming up). Silakan coba lagi dalam beberapa detik."
+
+    # Liveness: proses hidup dan loader tidak gagal permanen
+    def liveness(self):
+        return {"status": "failed" if self.state == FAILED else "alive", "state": self.state}
+
+    # Readiness: hanya siap setelah model dimuat dan di-warmup
+    def readiness(self):
+        info = {
+            "ready": self.ready,
+            "state": self.state,
+            "uptime_seconds": time.time() - self.started_at,
+        }
+        if self.error:
+            info["error"] = self.error
+        if self.ready:
+            info["model"] = self.backend.describe()
+            if self.artifact is not None:
+                info["artifact"] = {k: self.artifact.get(k) for k in ("version", "sha256", "size", "source")}
+            info["startup_seconds"] = self.ready_at - self.started_at
+        return info
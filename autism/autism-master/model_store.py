@@ -0,0 +1,374 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from contextlib import contextmanager
+
+import numpy as np
+
+import config
+
+MANIFEST_NAME = "manifest.json"
+CHUNK_SIZE = 1 << 20
+# Layout bobot untuk memory-map: architecture.json + weights.bin (tiap tensor rata 64 byte) + index.json
+MMAP_FORMAT = "autisense-mmap-v1"
+MMAP_ALIGN = 64
+
+
+class ModelStoreError(RuntimeError):
+    pass
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _local_path(source):
+    """Path lokal untuk sumber berupa path atau URL file://, None untuk URL http(s)."""
+    parsed = urllib.parse.urlparse(source)
+    if parsed.scheme == "file":
+        return urllib.request.url2pathname(parsed.path)
+    if parsed.scheme in ("http", "https"):
+        return None
+    return source
+
+
+def _is_repository(source):
+    # Repositori = folder (atau URL berakhiran "/") berisi manifest.json + file model
+    local = _local_path(source)
+    return os.path.isdir(local) if local is not None else source.endswith("/")
+
+
+def _join(base, name):
+    if _local_path(base) is not None and urllib.parse.urlparse(base).scheme != "file":
+        return os.path.join(base, name)
+    return urllib.parse.urljoin(base if base.endswith("/") else base + "/", name)
+
+
+def read_manifest(source):
+    """Manifest lokal atau remote: {"files": {nama: {version, sha256, size, ...}}}."""
+    local = _local_path(source)
+    try:
+        if local is not None:
+            with open(local) as f:
+                return json.load(f)
+        with urllib.request.urlopen(source, timeout=30) as response:
+            return json.loads(response.read())
+    except FileNotFoundError:
+        return {"files": {}}
+    except (OSError, ValueError) as e:
+        raise ModelStoreError(f"Manifest tidak bisa dibaca dari {source}: {e}")
+
+
+@contextmanager
+def _store_lock(model_dir):
+    # Beberapa proses server di satu node tidak mengunduh/konversi file yang sama bersamaan
+    os.makedirs(model_dir, exist_ok=True)
+    with open(os.path.join(model_dir, ".store.lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _copy_resumable(src, part):
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    if offset > os.path.getsize(src):
+        offset = 0
+    with open(src, "rb") as fin, open(part, "ab" if offset else "wb") as fout:
+        fin.seek(offset)
+        shutil.copyfileobj(fin, fout, CHUNK_SIZE)
+
+
+def _download_resumable(url, part):
+    # Lanjutkan dari file .part dengan header Range; server tanpa dukungan Range → unduh ulang dari awal
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    request = urllib.request.Request(url, headers={"Range": f"bytes={offset}-"} if offset else {})
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            mode = "ab" if offset and response.status == 206 else "wb"
+            with open(part, mode) as f:
+                shutil.copyfileobj(response, f, CHUNK_SIZE)
+    except urllib.error.HTTPError as e:
+        # 416: .part sudah lengkap dari percobaan sebelumnya
+        if e.code != 416 or not offset:
+            raise ModelStoreError(f"Gagal mengunduh {url}: HTTP {e.code}")
+
+
+def _download_gdrive(url, part, resume=True):
+    import gdown
+
+    # gdown menulis ke file sementara lalu memindahkannya; resume=True melanjutkan file sementara itu
+    if gdown.download(url, part, quiet=False, resume=resume) is None:
+        raise ModelStoreError(f"Gagal mengunduh {url}")
+
+
+def fetch_file(source, dest, expected_sha256=None, expected_size=None):
+    """Ambil file ke dest secara atomik: unduh/copy ke dest.part (bisa dilanjutkan), cek, lalu rename.
+
+    Mengembalikan (sha256, ukuran).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    part = dest + ".part"
+    # Tanpa SHA-256, .part yang disambung tidak bisa diverifikasi (ukuran saja tidak mendeteksi isi yang
+    # salah): selalu mulai dari awal
+    resume = bool(expected_sha256)
+    if not resume and os.path.exists(part):
+        print(f"⚠️ {part} tidak dilanjutkan (tidak ada SHA-256 untuk verifikasi), unduh ulang dari awal")
+        os.remove(part)
+    local = _local_path(source)
+    if "drive.google.com" in source:
+        _download_gdrive(source, part, resume)
+    elif local is not None:
+        _copy_resumable(local, part)
+    else:
+        _download_resumable(source, part)
+
+    size = os.path.getsize(part)
+    if expected_size is not None and size != expected_size:
+        if size > expected_size:
+            os.remove(part)
+        raise ModelStoreError(f"Ukuran {source} {size} byte, seharusnya {expected_size} byte")
+    digest = sha256_file(part)
+    if expected_sha256 and digest != expected_sha256.lower():
+        os.remove(part)
+        raise ModelStoreError(f"SHA-256 {source} tidak cocok: {digest} vs {expected_sha256}")
+    with open(part, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(part, dest)
+    return digest, size
+
+
+def _entry_matches(path, entry):
+    stat = os.stat(path)
+    return entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+
+
+def ensure_model(path=None, source=None, sha256=None, version=None):
+    """Pastikan file model ada dan terverifikasi; mengembalikan entri manifest lokal.
+
+    File yang sudah ada dan tercatat di manifest (ukuran + mtime sama) tidak di-hash ulang.
+    Sumber repositori menentukan SHA-256/versi lewat manifest-nya; sumber satu file memakai
+    `sha256` (opsional) — tanpa itu hash file pertama yang diunduh dicatat sebagai acuan.
+    """
+    path = path or config.KERAS_MODEL_PATH
+    source = source or config.MODEL_SOURCE
+    sha256 = (sha256 or config.MODEL_SHA256 or "").lower() or None
+    version = version or config.MODEL_VERSION
+    name = os.path.basename(path)
+    model_dir = os.path.dirname(os.path.abspath(path))
+    manifest_path = os.path.join(model_dir, MANIFEST_NAME)
+
+    with _store_lock(model_dir):
+        manifest = read_manifest(manifest_path)
+        manifest.setdefault("files", {})
+        entry = manifest["files"].get(name)
+
+        file_source, expected_size = source, None
+        if _is_repository(source):
+            remote = read_manifest(_join(source, MANIFEST_NAME))["files"].get(name)
+            if remote is None:
+                raise ModelStoreError(f"{name} tidak ada di manifest repositori {source}")
+            file_source = _join(source, name)
+            sha256, expected_size, version = remote["sha256"], remote.get("size"), remote.get("version", version)
+
+        if os.path.exists(path):
+            if entry is None or not _entry_matches(path, entry):
+                # File diletakkan manual (atau berubah): hash sekali lalu catat di manifest
+                entry = {"version": version, "sha256": sha256_file(path), "source": "local"}
+            if sha256 is None or entry["sha256"] == sha256:
+                return _record(manifest_path, manifest, name, path, entry)
+            print(f"⚠️ {name} tidak sesuai versi sumber ({entry['sha256'][:12]} vs {sha256[:12]}), mengunduh ulang")
+
+        print(f"⬇️ Mengambil model {name} dari {file_source}")
+        started = time.perf_counter()
+        digest, size = fetch_file(file_source, path, sha256, expected_size)
+        print(f"✅ Model {name} ({size / 1e6:.1f} MB, sha256 {digest[:12]}) diambil dalam "
+              f"{time.perf_counter() - started:.1f}s")
+        entry = {"version": version, "sha256": digest, "source": file_source, "fetched_at": time.time()}
+        return _record(manifest_path, manifest, name, path, entry)
+
+
+def _record(manifest_path, manifest, name, path, entry):
+    stat = os.stat(path)
+    entry = {**entry, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if manifest["files"].get(name) != entry:
+        manifest["files"][name] = entry
+        _write_json_atomic(manifest_path, manifest)
+    return entry
+
+
+def publish(path, repository, version=None):
+    """Salin file model ke repositori (folder yang bisa disajikan file server) dan perbarui manifest-nya."""
+    name = os.path.basename(path)
+    os.makedirs(repository, exist_ok=True)
+    digest, size = fetch_file(path, os.path.join(repository, name))
+    manifest_path = os.path.join(repository, MANIFEST_NAME)
+    manifest = read_manifest(manifest_path)
+    manifest.setdefault("files", {})[name] = {
+        "version": version or config.MODEL_VERSION, "sha256": digest, "size": size, "published_at": time.time(),
+    }
+    _write_json_atomic(manifest_path, manifest)
+    return manifest["files"][name]
+
+
+def mmap_dir_for(path):
+    return os.path.splitext(path)[0] + ".mmap"
+
+
+def _source_info(h5_path):
+    stat = os.stat(h5_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def mmap_is_fresh(h5_path, out_dir=None):
+    out_dir = out_dir or mmap_dir_for(h5_path)
+    try:
+        with open(os.path.join(out_dir, "index.json")) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return index.get("format") == MMAP_FORMAT and index.get("source") == _source_info(h5_path)
+
+
+def convert_to_mmap(h5_path, out_dir=None):
+    """Konversi .h5 ke layout yang bobotnya bisa di-memory-map; ditulis ke folder sementara lalu di-rename."""
+    import tensorflow as tf
+
+    out_dir = out_dir or mmap_dir_for(h5_path)
+    model = tf.keras.models.load_model(h5_path, compile=False)
+    tmp = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    weights, offset = [], 0
+    with open(os.path.join(tmp, "weights.bin"), "wb") as f:
+        for variable, value in zip(model.weights, model.get_weights()):
+            value = np.ascontiguousarray(value)
+            padding = -offset % MMAP_ALIGN
+            f.write(b"\0" * padding)
+            offset += padding
+            weights.append({"name": variable.name, "dtype": value.dtype.str, "shape": list(value.shape),
+                            "offset": offset})
+            value.tofile(f)
+            offset += value.nbytes
+        f.flush()
+        os.fsync(f.fileno())
+    with open(os.path.join(tmp, "architecture.json"), "w") as f:
+        f.write(model.to_json())
+    _write_json_atomic(os.path.join(tmp, "index.json"), {
+        "format": MMAP_FORMAT, "source": _source_info(h5_path), "bytes": offset, "weights": weights,
+    })
+
+    # Folder lama dipindah dulu agar pembaca tidak pernah melihat layout setengah jadi
+    old = f"{out_dir}.old-{os.getpid()}"
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old)
+    os.replace(tmp, out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    return out_dir
+
+
+def prepare_mmap(h5_path, isolated=False):
+    """Folder layout mmap untuk h5_path, dikonversi ulang jika belum ada atau .h5 berubah.
+
+    isolated=True menjalankan konversi (yang memuat TensorFlow) di proses terpisah, agar proses
+    induk mode replika tetap bebas TensorFlow sebelum fork.
+    """
+    out_dir = mmap_dir_for(h5_path)
+    if isolated:
+        if not mmap_is_fresh(h5_path, out_dir):
+            subprocess.run([sys.executable, os.path.abspath(__file__), "convert", "--model", h5_path], check=True)
+        return out_dir
+    with _store_lock(os.path.dirname(os.path.abspath(h5_path))):
+        if not mmap_is_fresh(h5_path, out_dir):
+            started = time.perf_counter()
+            convert_to_mmap(h5_path, out_dir)
+            print(f"🗂️ Bobot model dikonversi ke layout mmap: {out_dir} ({time.perf_counter() - started:.1f}s)")
+    return out_dir
+
+
+def load_mmap_model(out_dir):
+    """Bangun model dari architecture.json lalu isi bobot dari weights.bin lewat np.memmap.
+
+    Bobot dibaca dari page cache yang dibagi semua proses di node ini (tanpa parsing HDF5);
+    TensorFlow tetap menyalinnya sekali ke variabel modelnya.
+    """
+    import tensorflow as tf
+
+    with open(os.path.join(out_dir, "index.json")) as f:
+        index = json.load(f)
+    with open(os.path.join(out_dir, "architecture.json")) as f:
+        model = tf.keras.models.model_from_json(f.read())
+    if len(model.weights) != len(index["weights"]):
+        raise ModelStoreError(f"Layout mmap {out_dir} tidak cocok dengan arsitekturnya, jalankan konversi ulang")
+    if index["bytes"]:
+        buffer = np.memmap(os.path.join(out_dir, "weights.bin"), dtype=np.uint8, mode="r")
+        values = []
+        for variable, w in zip(model.weights, index["weights"]):
+            value = np.ndarray(w["shape"], dtype=np.dtype(w["dtype"]), buffer=buffer, offset=w["offset"])
+            # Sebagian layer (mis. Normalization) menyimpan skalar sebagai (1,) di .h5
+            values.append(value.reshape(variable.shape) if value.size == np.prod(variable.shape) else value)
+        model.set_weights(values)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Penyimpanan model: fetch terverifikasi, publish, konversi mmap")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch = sub.add_parser("fetch", help="Ambil model dari AUTISENSE_MODEL_SOURCE (atau --source)")
+    fetch.add_argument("--source", default=None)
+    fetch.add_argument("--sha256", default=None)
+    verify = sub.add_parser("verify", help="Hash ulang file model dan bandingkan dengan manifest")
+    verify.add_argument("--model", default=config.KERAS_MODEL_PATH)
+    convert = sub.add_parser("convert", help="Konversi .h5 ke layout bobot mmap")
+    convert.add_argument("--model", default=config.KERAS_MODEL_PATH)
+    pub = sub.add_parser("publish", help="Salin model ke folder repositori + manifest (untuk file server)")
+    pub.add_argument("repository")
+    pub.add_argument("--model", default=config.KERAS_MODEL_PATH)
+    pub.add_argument("--version", default=None)
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        entry = ensure_model(source=args.source, sha256=args.sha256)
+        print(json.dumps(entry, indent=2))
+    elif args.command == "verify":
+        entry = read_manifest(os.path.join(os.path.dirname(os.path.abspath(args.model)), MANIFEST_NAME))
+        entry = entry.get("files", {}).get(os.path.basename(args.model))
+        if entry is None:
+            raise SystemExit(f"❌ {args.model} belum tercatat di manifest")
+        digest = sha256_file(args.model)
+        ok = digest == entry["sha256"]
+        print(f"{'✅' if ok else '❌'} {args.model}: sha256 {digest} (manifest {entry['sha256']})")
+        raise SystemExit(0 if ok else 1)
+    elif args.command == "convert":
+        print(f"✅ Layout mmap: {prepare_mmap(args.model)}")
+    else:
+        entry = publish(args.model, args.repository, args.version)
+        print(f"✅ Dipublikasikan ke {args.repository}: sha256 {entry['sha256']}, versi {entry['version']}")
+
+
+if __name__ == "__main__":
+    main()
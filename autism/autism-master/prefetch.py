@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# Satu pekerjaan per kunci: pemanggil kedua dengan kunci yang sama menunggu hasil pemanggil pertama
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class _Job:
+    __slots__ = ("future", "cancelled")
+
+    def __init__(self):
+        self.future = None
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+# Analisis spekulatif: mulai begitu gambar di-upload, satu pekerjaan aktif per sesi
+class SpeculativeRunner:
+    def __init__(self, fn, max_workers=2, max_sessions=1024):
+        self.fn = fn
+        self.max_sessions = max_sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculative")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self.started = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self, session_id, *args):
+        """Batalkan pekerjaan lama sesi ini lalu jalankan fn(*args, cancelled=event) di latar belakang."""
+        job = _Job()
+        with self._lock:
+            previous = self._jobs.pop(session_id, None)
+            self._jobs[session_id] = job
+            # Sesi lama yang tidak pernah ditutup dibuang paling awal
+            while len(self._jobs) > self.max_sessions:
+                _, stale = self._jobs.popitem(last=False)
+                stale.cancel()
+            self.started += 1
+        if previous is not None:
+            self._cancel_job(previous)
+        job.future = self._executor.submit(self._run, job, args)
+        return job.future
+
+    def cancel(self, session_id):
+        with self._lock:
+            job = self._jobs.pop(session_id, None)
+        if job is not None:
+            self._cancel_job(job)
+
+    def _cancel_job(self, job):
+        if job.future is None or not job.future.done():
+            job.cancel()
+            with self._lock:
+                self.cancelled += 1
+
+    def _run(self, job, args):
+        if job.cancelled.is_set():
+            return None
+        try:
+            result = self.fn(*args, cancelled=job.cancelled)
+        except JobCancelled:
+            return None
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "active_sessions": len(self._jobs),
+                "started": self.started,
+                "cancelled": self.cancelled,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
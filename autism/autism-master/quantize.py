@@ -0,0 +1,223 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+import config
+from face_stage import FaceStage
+from inference import INPUT_DTYPE, INPUT_SHAPE, TFLiteBackend, random_batch, with_rescaling
+from ingest import IngestError, load_image, to_array
+from screening import CONFIDENCE_THRESHOLD
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def create_face_stage():
+    """FaceStage dengan parameter yang sama seperti server, agar kalibrasi melihat input CNN yang sebenarnya."""
+    return FaceStage(
+        max_side=config.FACE_DETECT_MAX_SIDE,
+        output_size=INPUT_SHAPE[:2],
+        crop=config.FACE_CROP,
+        margin=config.FACE_CROP_MARGIN,
+        max_faces=1,
+        primary_rule=config.FACE_PRIMARY_RULE,
+    )
+
+
+# Preprocessing sama dengan server: decode lewat ingest (orientasi EXIF, downscale draft/max-side), crop wajah
+# utama 224x224, RGB uint8 (skala /255 ada di graph model); None jika gambar ditolak ingest atau tidak ada
+# wajah (gambar seperti itu ditolak server dan tidak pernah sampai ke model)
+def load_image_tensor(path, face_stage):
+    try:
+        image = load_image(path)
+    except IngestError:
+        return None
+    result = face_stage.run(to_array(image))
+    if not result.crops:
+        return None
+    return np.asarray(result.crops[0], dtype=INPUT_DTYPE)
+
+
+def list_images(directory):
+    paths = sorted(
+        os.path.realpath(os.path.join(root, name))
+        for root, _, files in os.walk(directory)
+        for name in files
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise FileNotFoundError(f"Tidak ada gambar di: {directory}")
+    return paths
+
+
+def load_image_set(paths, face_stage, label):
+    tensors = [t for t in (load_image_tensor(p, face_stage) for p in paths) if t is not None]
+    if len(tensors) < len(paths):
+        print(f"⚠️ {len(paths) - len(tensors)} gambar {label} dilewati (ditolak ingest atau tidak ada wajah)")
+    if not tensors:
+        raise ValueError(f"Tidak ada wajah terdeteksi di gambar {label}")
+    return np.stack(tensors)
+
+
+def split_images(calibration_paths, eval_paths, eval_fraction, limit, seed=0):
+    """(kalibrasi, evaluasi) yang tidak beririsan: tanpa folder eval, sebagian gambar kalibrasi disisihkan."""
+    if eval_paths is None:
+        if not 0.0 < eval_fraction < 1.0:
+            raise ValueError("--eval-fraction harus di antara 0 dan 1")
+        shuffled = list(calibration_paths)
+        np.random.default_rng(seed).shuffle(shuffled)
+        held_out = max(1, int(round(len(shuffled) * eval_fraction)))
+        if held_out >= len(shuffled):
+            raise ValueError("Gambar kalibrasi terlalu sedikit untuk disisihkan sebagai data evaluasi")
+        eval_paths, calibration_paths = sorted(shuffled[:held_out]), sorted(shuffled[held_out:])
+    else:
+        # Gambar yang juga ada di folder eval tidak dipakai untuk kalibrasi
+        excluded = set(eval_paths)
+        calibration_paths = [p for p in calibration_paths if p not in excluded]
+        if not calibration_paths:
+            raise ValueError("Semua gambar kalibrasi juga ada di folder eval")
+    if limit:
+        calibration_paths = calibration_paths[:limit]
+    return calibration_paths, eval_paths
+
+
+def convert_dynamic_range(model):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    return converter.convert()
+
+
+def convert_full_integer(model, calibration):
+    """Kuantisasi int8 penuh; input uint8 mentah dan output float32 agar preprocessing tidak berubah."""
+    def representative_dataset():
+        for tensor in calibration:
+            yield [tensor[np.newaxis]]
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.uint8
+    converter.inference_output_type = tf.float32
+    return converter.convert()
+
+
+def _predict_all(fn, images, batch_size=16):
+    outputs = [np.asarray(fn(images[i:i + batch_size])).reshape(-1) for i in range(0, len(images), batch_size)]
+    return np.concatenate(outputs)
+
+
+def _latency_ms(fn, runs=30):
+    sample = np.zeros((1,) + INPUT_SHAPE, dtype=INPUT_DTYPE)
+    fn(sample)
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn(sample)
+    return (time.perf_counter() - started) / runs * 1000.0
+
+
+def compare_scores(reference, scores, threshold=CONFIDENCE_THRESHOLD):
+    drift = np.abs(scores - reference)
+    flips = (reference < threshold) != (scores < threshold)
+    return {
+        "mean_abs_drift": float(drift.mean()),
+        "max_abs_drift": float(drift.max()),
+        "p95_abs_drift": float(np.percentile(drift, 95)),
+        "decision_flips": int(flips.sum()),
+        "decision_flip_rate": float(flips.mean()),
+    }
+
+
+def build(model_path, output_dir, calibration_dir=None, eval_dir=None,
+          num_calibration=200, threshold=CONFIDENCE_THRESHOLD, eval_fraction=0.2):
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.splitext(os.path.basename(model_path))[0]
+    # Model dibungkus Rescaling(1/255) agar file TFLite juga menerima crop uint8 langsung
+    model = with_rescaling(tf.keras.models.load_model(model_path))
+
+    face_stage = create_face_stage()
+    eval_paths = list_images(eval_dir) if eval_dir else None
+    calibration = None
+    if calibration_dir:
+        calibration_paths, eval_paths = split_images(list_images(calibration_dir), eval_paths,
+                                                     eval_fraction, num_calibration)
+        calibration = load_image_set(calibration_paths, face_stage, "kalibrasi")
+        print(f"📦 {len(calibration)} crop wajah kalibrasi dari {calibration_dir}")
+    else:
+        print("⚠️ Tanpa --calibration-dir, hanya model dynamic-range yang dibuat")
+
+    variants = {"dynamic": convert_dynamic_range(model)}
+    if calibration is not None:
+        variants["int8"] = convert_full_integer(model, calibration)
+
+    if eval_paths:
+        eval_images = load_image_set(eval_paths, face_stage, "evaluasi")
+        eval_source = eval_dir or f"{calibration_dir} (disisihkan {eval_fraction:.0%}, tidak dipakai kalibrasi)"
+        print(f"📦 {len(eval_images)} crop wajah evaluasi dari {eval_source}")
+    else:
+        # Tanpa data nyata, drift tetap diukur pada input acak (flip tidak bermakna)
+        eval_source = None
+        eval_images = random_batch(np.random.default_rng(0), 64)
+
+    def reference_fn(batch):
+        return model(batch, training=False).numpy()
+
+    reference = _predict_all(reference_fn, eval_images)
+    report = {
+        "source_model": model_path,
+        "source_size_bytes": os.path.getsize(model_path),
+        "threshold": threshold,
+        "eval_images": len(eval_images),
+        "eval_source": eval_source or "random",
+        "reference_latency_ms": _latency_ms(reference_fn),
+        "variants": {},
+    }
+
+    for name, flatbuffer in variants.items():
+        path = os.path.join(output_dir, f"{base}_{name}.tflite")
+        with open(path, "wb") as f:
+            f.write(flatbuffer)
+        runner = TFLiteBackend(path, num_threads=config.TFLITE_NUM_THREADS).load()
+        scores = _predict_all(runner, eval_images)
+        entry = {
+            "path": path,
+            "size_bytes": len(flatbuffer),
+            "latency_ms": _latency_ms(runner),
+            **compare_scores(reference, scores, threshold),
+        }
+        entry["speedup"] = report["reference_latency_ms"] / max(entry["latency_ms"], 1e-9)
+        report["variants"][name] = entry
+        print(
+            f"✅ {name}: {entry['size_bytes'] / 1e6:.1f} MB, {entry['latency_ms']:.2f} ms/gambar "
+            f"({entry['speedup']:.1f}x), drift rata-rata {entry['mean_abs_drift']:.4f}, "
+            f"flip keputusan {entry['decision_flips']}/{len(eval_images)}"
+        )
+
+    report_path = os.path.join(output_dir, f"{base}_quantization_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Laporan disimpan di: {report_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kuantisasi model .h5 ke TFLite dan buat laporan parity")
+    parser.add_argument("--model", default=config.KERAS_MODEL_PATH)
+    parser.add_argument("--output-dir", default=config.MODEL_DIR)
+    parser.add_argument("--calibration-dir", help="Folder gambar wajah untuk kalibrasi int8")
+    parser.add_argument("--eval-dir", help="Folder gambar untuk laporan (default: sebagian folder kalibrasi "
+                                               "yang disisihkan dan tidak dipakai kalibrasi)")
+    parser.add_argument("--eval-fraction", type=float, default=0.2,
+                        help="Porsi gambar kalibrasi yang disisihkan untuk laporan jika --eval-dir tidak diisi")
+    parser.add_argument("--num-calibration", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    args = parser.parse_args()
+    build(args.model, args.output_dir, args.calibration_dir, args.eval_dir,
+          args.num_calibration, args.threshold, args.eval_fraction)
+
+
+if __name__ == "__main__":
+    main()
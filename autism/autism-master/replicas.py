@@ -0,0 +1,369 @@
+import argparse
+import atexit
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import config
+from inference import BACKENDS, INPUT_DTYPE, INPUT_SHAPE, InferenceBackend, create_backend, random_batch
+from scheduler import BatchScheduler, closed_loop_load
+
+
+# Proses replika: di-fork sebelum induk menjalankan thread apa pun, lalu menunggu perintah muat
+# (path model + layout mmap) dari induk. Isi file model yang dibaca induk sebelum fork diwarisi
+# copy-on-write dan dipakai jika file tidak berubah sejak dibaca. Tensor input dibaca langsung dari
+# ring buffer shared memory, hanya skor yang dikirim lewat pipe
+def _replica_main(backend_name, threads, shm, slots, max_batch_size, input_shape, warmup_sizes,
+                  conn, inherited, content=None):
+    # Ujung pipe milik induk yang ikut ter-fork ditutup, agar replika menerima EOF saat induk mati
+    for other in inherited:
+        other.close()
+    ring = np.ndarray((slots, max_batch_size) + input_shape, dtype=INPUT_DTYPE, buffer=shm.buf)
+    try:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        _, path, mmap_dir, use_content = message
+        try:
+            backend = create_backend(backend_name, path, threads=threads, mmap_dir=mmap_dir)
+            backend.content = content if use_content else None
+            backend.load()
+            warmup = backend.warmup(warmup_sizes)
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            return
+        conn.send(("ready", {"pid": os.getpid(), "load_seconds": backend.load_seconds, "warmup_seconds": warmup}))
+
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+            slot, n = message
+            try:
+                conn.send((slot, np.asarray(backend.run_batch(ring[slot, :n])), None))
+            except Exception as e:
+                conn.send((slot, None, f"{type(e).__name__}: {e}"))
+    finally:
+        # View ke buffer harus dilepas sebelum shared memory ditutup
+        del ring
+        shm.close()
+
+
+class _Replica:
+    def __init__(self, index, process, conn, shm, slots, max_batch_size, input_shape):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.shm = shm
+        self.ring = np.ndarray((slots, max_batch_size) + input_shape, dtype=INPUT_DTYPE, buffer=shm.buf)
+        self.free_slots = queue.Queue()
+        for slot in range(slots):
+            self.free_slots.put(slot)
+        self.pending = {}
+        self.send_lock = threading.Lock()
+        self.alive = True
+        self.inflight = 0
+        self.batches = 0
+        self.items = 0
+        self.info = {}
+
+    def stats(self):
+        return {
+            "index": self.index,
+            "pid": self.info.get("pid"),
+            "alive": self.alive,
+            "inflight": self.inflight,
+            "batches": self.batches,
+            "items": self.items,
+            "load_seconds": self.info.get("load_seconds"),
+        }
+
+
+# Mode pre-fork: N proses replika model, dispatcher memilih replika dengan beban paling kecil.
+# fork() dipanggil dari thread utama sebelum thread lain berjalan (fork dari proses multi-thread bisa
+# mewarisi lock yang sedang dipegang thread lain); load() kemudian boleh dipanggil dari thread mana pun.
+class ReplicaBackend(InferenceBackend):
+    def __init__(self, backend_name, path=None, replicas=2, threads=None, slots=2,
+                 max_batch_size=8, input_shape=INPUT_SHAPE, start_timeout=300.0, mmap_dir=None,
+                 batch_timeout=60.0):
+        inner = create_backend(backend_name, path)
+        super().__init__(inner.path, input_shape)
+        # Nama backend asli dipakai untuk model_version: hasilnya identik dengan mode satu proses
+        self.name = inner.name
+        self.backend_name = backend_name
+        self.n_replicas = replicas
+        self.threads = threads or max(1, (os.cpu_count() or 1) // replicas)
+        self.slots = slots
+        self.max_batch_size = max_batch_size
+        self.start_timeout = start_timeout
+        # Batas waktu satu batch di replika; replika yang macet tidak menahan request selamanya
+        self.batch_timeout = batch_timeout
+        # Layout mmap (boleh diisi setelah fork, sebelum load): dikirim ke replika bersama perintah muat
+        self.mmap_dir = mmap_dir
+        self.max_inflight = replicas
+        self.replicas = []
+        # (ukuran, mtime) file model saat isinya dibaca sebelum fork; None = replika membaca file sendiri
+        self._content_stat = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def fork(self, preload=True):
+        """Fork semua proses replika; panggil dari thread utama sebelum thread lain.
+
+        preload=True: isi file model (jika sudah ada) dibaca sekali sebelum fork dan dibagi copy-on-write
+        ke semua replika. Model baru di-parse di replika saat load() mengirim perintah muat.
+        """
+        if self.replicas:
+            return self
+        if threading.active_count() > 1:
+            print(f"⚠️ Replika di-fork saat {threading.active_count()} thread berjalan; panggil fork() lebih awal")
+        content = None
+        if preload and self.mmap_dir is None:
+            stat = self._file_stat()
+            if stat is not None:
+                with open(self.path, "rb") as f:
+                    content = f.read()
+                self._content_stat = stat
+        ctx = mp.get_context("fork")
+        warmup_sizes = sorted({1, self.max_batch_size})
+        slot_bytes = self.max_batch_size * int(np.prod(self.input_shape)) * np.dtype(INPUT_DTYPE).itemsize
+        try:
+            for index in range(self.n_replicas):
+                shm = shared_memory.SharedMemory(create=True, size=self.slots * slot_bytes)
+                parent_conn, child_conn = ctx.Pipe()
+                process = ctx.Process(
+                    target=_replica_main,
+                    args=(self.backend_name, self.threads, shm, self.slots, self.max_batch_size,
+                          self.input_shape, warmup_sizes, child_conn,
+                          [r.conn for r in self.replicas] + [parent_conn], content),
+                    name=f"replica-{index}",
+                    daemon=True,
+                )
+                process.start()
+                child_conn.close()
+                self.replicas.append(
+                    _Replica(index, process, parent_conn, shm, self.slots, self.max_batch_size, self.input_shape)
+                )
+            atexit.register(self.close)
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def _load(self):
+        self.fork()
+        # Isi yang dibaca sebelum fork hanya dipakai jika file tidak diganti sesudahnya (mis. diunduh ulang
+        # karena SHA-256 tidak cocok); selain itu tiap replika membaca file sendiri (page cache bersama)
+        use_content = (self._content_stat is not None and self.mmap_dir is None
+                       and self._content_stat == self._file_stat())
+        try:
+            for replica in self.replicas:
+                replica.conn.send(("load", self.path, self.mmap_dir, use_content))
+            for replica in self.replicas:
+                if not replica.conn.poll(self.start_timeout):
+                    raise TimeoutError(f"Replika {replica.index} tidak siap dalam {self.start_timeout:.0f}s")
+                status, info = replica.conn.recv()
+                if status != "ready":
+                    raise RuntimeError(f"Replika {replica.index} gagal memuat model: {info}")
+                replica.info = info
+                self.warmup_seconds = info["warmup_seconds"]
+        except BaseException:
+            self.close()
+            raise
+
+        for replica in self.replicas:
+            threading.Thread(
+                target=self._receive, args=(replica,), name=f"replica-recv-{replica.index}", daemon=True
+            ).start()
+        print(
+            f"🧬 {self.n_replicas} replika {self.name} siap "
+            f"({self.threads} thread/replika, pid {', '.join(str(r.info['pid']) for r in self.replicas)}, "
+            f"model {'dibaca sekali sebelum fork' if use_content else 'dibaca tiap replika'})"
+        )
+
+    def _receive(self, replica):
+        while True:
+            try:
+                slot, output, error = replica.conn.recv()
+            except (EOFError, OSError):
+                break
+            future = replica.pending.pop(slot, None)
+            if future is None:
+                # Balasan terlambat untuk batch yang sudah timeout: slot baru aman dipakai lagi sekarang
+                replica.free_slots.put(slot)
+                continue
+            if error:
+                future.set_exception(RuntimeError(f"Replika {replica.index}: {error}"))
+            else:
+                future.set_result(output)
+
+        replica.alive = False
+        if not self._closed:
+            print(f"❌ Replika {replica.index} berhenti (exit code {replica.process.exitcode})")
+        for future in list(replica.pending.values()):
+            future.set_exception(RuntimeError(f"Replika {replica.index} berhenti"))
+        replica.pending.clear()
+
+    def _acquire(self):
+        # Replika dengan batch berjalan paling sedikit; seri → yang paling sedikit memproses gambar
+        with self._lock:
+            alive = [r for r in self.replicas if r.alive]
+            if not alive:
+                raise RuntimeError("Tidak ada replika model yang hidup")
+            replica = min(alive, key=lambda r: (r.inflight, r.items))
+            replica.inflight += 1
+            return replica
+
+    def run_batch(self, batch):
+        batch = np.asarray(batch, dtype=self.input_dtype)
+        if len(batch) > self.max_batch_size:
+            return np.concatenate([
+                self.run_batch(batch[i:i + self.max_batch_size])
+                for i in range(0, len(batch), self.max_batch_size)
+            ])
+
+        replica = self._acquire()
+        try:
+            slot = replica.free_slots.get()
+            try:
+                replica.ring[slot, :len(batch)] = batch
+                future = Future()
+                replica.pending[slot] = future
+                with replica.send_lock:
+                    replica.conn.send((slot, len(batch)))
+                try:
+                    output = future.result(self.batch_timeout)
+                except FutureTimeout:
+                    if replica.pending.pop(slot, None) is not future:
+                        # Balasan tiba bersamaan dengan timeout
+                        output = future.result()
+                    else:
+                        # Slot masih bisa ditulis replika; dikembalikan oleh _receive saat balasannya tiba
+                        slot = None
+                        raise TimeoutError(
+                            f"Replika {replica.index} tidak membalas dalam {self.batch_timeout:.0f}s"
+                        ) from None
+            finally:
+                if slot is not None:
+                    replica.free_slots.put(slot)
+        finally:
+            with self._lock:
+                replica.inflight -= 1
+                replica.batches += 1
+                replica.items += len(batch)
+        return output
+
+    def warmup(self, batch_sizes=(1,)):
+        # Warmup sudah dijalankan di tiap replika sebelum melapor siap
+        return dict(self.warmup_seconds)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for replica in self.replicas:
+            try:
+                with replica.send_lock:
+                    replica.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for replica in self.replicas:
+            replica.process.join(5)
+            if replica.process.is_alive():
+                replica.process.terminate()
+            replica.conn.close()
+            replica.ring = None
+            replica.shm.close()
+            replica.shm.unlink()
+
+    def describe(self):
+        info = super().describe()
+        info["replicas"] = [r.stats() for r in self.replicas]
+        info["threads_per_replica"] = self.threads
+        info["slots_per_replica"] = self.slots
+        if self.backend_name.startswith("keras"):
+            info["weights"] = "mmap" if self.mmap_dir else "h5"
+        return info
+
+
+def measure_throughput(backend_name, replicas, seconds=10.0, clients=None, threads=None,
+                       max_batch_size=8, max_wait_ms=10.0, path=None):
+    """Gambar/detik dan latensi dengan `replicas` proses, diberi beban dari banyak thread client."""
+    backend = ReplicaBackend(backend_name, path, replicas=replicas, threads=threads,
+                             max_batch_size=max_batch_size).load()
+    scheduler = BatchScheduler(
+        backend.run_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+        max_inflight=backend.max_inflight, name=f"replicas-{replicas}",
+    ).start()
+    clients = clients or replicas * max_batch_size * 2
+    tensor = random_batch(np.random.default_rng(0), 1, backend.input_shape)[0]
+    try:
+        load = closed_loop_load(scheduler, tensor, clients, seconds)
+        stats = scheduler.stats()
+    finally:
+        scheduler.stop(timeout=5)
+        backend.close()
+
+    return {
+        "replicas": replicas,
+        "threads_per_replica": backend.threads,
+        **load,
+        "mean_batch_size": stats["mean_batch_size"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Kurva throughput inferensi terhadap jumlah proses replika model"
+    )
+    parser.add_argument("--backend", default=config.BACKEND, choices=BACKENDS)
+    parser.add_argument("--model", default=None, help="Default: path model untuk backend di config")
+    parser.add_argument("--replicas", default="1,2,4", help="Jumlah replika dipisah koma")
+    parser.add_argument("--threads", type=int, default=0, help="Thread per replika (0 = core / replika)")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Durasi beban per titik kurva")
+    parser.add_argument("--clients", type=int, default=0, help="Thread client (0 = replika x batch x 2)")
+    parser.add_argument("--batch-size", type=int, default=config.MAX_BATCH_SIZE)
+    parser.add_argument("--output", help="Simpan hasil sebagai JSON")
+    args = parser.parse_args()
+
+    curve = []
+    for replicas in [int(r) for r in args.replicas.split(",") if r]:
+        result = measure_throughput(
+            args.backend, replicas, seconds=args.seconds, clients=args.clients or None,
+            threads=args.threads or None, max_batch_size=args.batch_size, path=args.model,
+        )
+        curve.append(result)
+        print(
+            f"📈 {replicas} replika x {result['threads_per_replica']} thread: "
+            f"{result['images_per_second']:.1f} gambar/s, p50 {result['latency_ms']['p50']:.1f} ms, "
+            f"p95 {result['latency_ms']['p95']:.1f} ms, rata-rata batch {result['mean_batch_size']:.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"backend": args.backend, "cpu_count": os.cpu_count(), "curve": curve}, f, indent=2)
+        print(f"💾 Kurva throughput disimpan di: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import argparse
+import atexit
+import csv
+import io
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+
+import config
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    created_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    confidence REAL,
+    image_positive INTEGER,
+    checklist_count INTEGER NOT NULL,
+    checklist_percent REAL NOT NULL,
+    checklist_positive INTEGER NOT NULL,
+    gejala TEXT NOT NULL,
+    model_version TEXT,
+    face_count INTEGER,
+    face_confidences TEXT,
+    primary_face INTEGER,
+    timings_ms TEXT,
+    trace_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_created_at ON results (created_at);
+CREATE INDEX IF NOT EXISTS idx_results_outcome_created_at ON results (outcome, created_at);
+"""
+COLUMNS = (
+    "created_at", "source", "status", "outcome", "confidence", "image_positive", "checklist_count",
+    "checklist_percent", "checklist_positive", "gejala", "model_version", "face_count", "face_confidences",
+    "primary_face", "timings_ms", "trace_id",
+)
+# Kolom JSON di-decode saat export
+JSON_COLUMNS = ("gejala", "face_confidences", "timings_ms")
+OUTCOMES = ("high", "medium", "low", "no_face")
+
+
+def _connect(path, read_only=False):
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return sqlite3.connect(path)
+
+
+def parse_time(value):
+    """Unix timestamp, tanggal (2026-10-01) atau datetime ISO; None jika kosong."""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Waktu tidak valid: {value} (pakai unix timestamp atau ISO, mis. 2026-10-01T08:00)")
+
+
+def _serialize(row):
+    row = list(row)
+    for name in JSON_COLUMNS:
+        index = COLUMNS.index(name)
+        if row[index] is not None:
+            row[index] = json.dumps(row[index], separators=(",", ":"))
+    return row
+
+
+# Penyimpanan hasil screening di SQLite (WAL). Request hanya memasukkan baris ke antrian (tidak pernah
+# menunggu disk); satu thread penulis menggabungkan baris menjadi satu transaksi per batch.
+class ResultStore:
+    def __init__(self, path, batch_size=64, flush_ms=1000.0, max_queue=10000, journal_mode="wal", window=512):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(0.0, flush_ms) / 1000.0
+        self.journal_mode = journal_mode
+        self._queue = queue.Queue(maxsize=max(1, max_queue))
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_times = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.batches = 0
+
+    def start(self):
+        # Skema dibuat di thread pemanggil agar path yang tidak bisa ditulis langsung ketahuan saat start
+        conn = self._open()
+        conn.close()
+        self._thread = threading.Thread(target=self._writer, name="results-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def _open(self):
+        conn = _connect(self.path)
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        # WAL + synchronous=NORMAL: commit tidak menunggu fsync, database tetap konsisten setelah crash
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        with conn:
+            conn.executescript(SCHEMA)
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        return conn
+
+    def record(self, row):
+        """Masukkan baris (urutan COLUMNS, lihat screening.result_row) ke antrian; jika antrian penuh baris dibuang, tidak menunggu."""
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _writer(self):
+        conn = self._open()
+        sql = f"INSERT INTO results ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            batch = [item]
+            # Kumpulkan baris lain sampai batch penuh atau flush_ms sejak baris pertama
+            deadline = time.perf_counter() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+
+            started = time.perf_counter()
+            try:
+                with conn:
+                    conn.executemany(sql, [_serialize(row) for row in batch])
+                ok = True
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                ok = False
+                print(f"⚠️ Gagal menyimpan {len(batch)} hasil screening: {e}")
+            with self._lock:
+                self._flush_times.append(time.perf_counter() - started)
+                self._batch_sizes.append(len(batch))
+                self.batches += 1
+                if ok:
+                    self.written += len(batch)
+                else:
+                    self.errors += len(batch)
+            for _ in batch:
+                self._queue.task_done()
+        conn.close()
+
+    def flush(self, timeout=None):
+        """Tunggu sampai semua baris di antrian selesai ditulis; False jika timeout."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        if self._thread is None or not self._thread.is_alive():
+            return
+        # Sisa antrian tetap ditulis sebelum thread berhenti
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            flush_ms = np.array(self._flush_times) * 1000.0
+            sizes = list(self._batch_sizes)
+            return {
+                "path": self.path,
+                "journal_mode": self.journal_mode,
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_size": float(np.mean(sizes)) if sizes else 0.0,
+                "flush_ms": {
+                    "mean": float(flush_ms.mean()) if len(flush_ms) else 0.0,
+                    "p95": float(np.percentile(flush_ms, 95)) if len(flush_ms) else 0.0,
+                },
+            }
+
+
+def create_result_store():
+    """ResultStore dari config yang sudah berjalan; None jika nonaktif atau database tidak bisa dibuka."""
+    if config.RESULTS_DB == "off":
+        return None
+    try:
+        return ResultStore(
+            config.RESULTS_DB,
+            batch_size=config.RESULTS_BATCH_SIZE,
+            flush_ms=config.RESULTS_FLUSH_MS,
+            max_queue=config.RESULTS_MAX_QUEUE,
+            journal_mode=config.RESULTS_JOURNAL_MODE,
+        ).start()
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Penyimpanan hasil screening dinonaktifkan ({config.RESULTS_DB}): {e}")
+        return None
+
+
+def iter_results(path, since=None, until=None, outcome=None, source=None, chunk_size=1000):
+    """Baris hasil (dict) berurutan waktu, dibaca per chunk lewat koneksi read-only terpisah.
+
+    Filter waktu/outcome memakai indeks, dan hanya chunk_size baris yang ada di memori sekaligus;
+    penulisan tetap berjalan selama export (WAL).
+    """
+    clauses, params = [], []
+    for clause, value in (("created_at >= ?", since), ("created_at < ?", until),
+                          ("outcome = ?", outcome), ("source = ?", source)):
+        if value is not None:
+            clauses.append(clause)
+            params.append(value)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = _connect(path, read_only=True)
+    try:
+        cursor = conn.execute(f"SELECT id, {', '.join(COLUMNS)} FROM results{where} ORDER BY created_at, id", params)
+        names = [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            for row in rows:
+                record = dict(zip(names, row))
+                for name in JSON_COLUMNS:
+                    if record[name] is not None:
+                        record[name] = json.loads(record[name])
+                for name in ("image_positive", "checklist_positive"):
+                    if record[name] is not None:
+                        record[name] = bool(record[name])
+                yield record
+    finally:
+        conn.close()
+
+
+def export_lines(rows, fmt="jsonl"):
+    """Baris export sebagai teks (JSONL atau CSV dengan header), dihasilkan satu per satu."""
+    if fmt == "jsonl":
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+        return
+    if fmt != "csv":
+        raise ValueError(f"Format export tidak dikenal: {fmt} (pilih jsonl, csv)")
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(values)
+        return buffer.getvalue()
+
+    yield line(("id",) + COLUMNS)
+    for row in rows:
+        yield line([
+            json.dumps(row[name], separators=(",", ":")) if name in JSON_COLUMNS and row[name] is not None
+            else row[name]
+            for name in ("id",) + COLUMNS
+        ])
+
+
+def summarize(path, since=None, until=None):
+    """Jumlah hasil per sumber dan outcome pada rentang waktu."""
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("created_at < ?")
+        params.append(until)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    conn = _connect(path, read_only=True)
+    try:
+        rows = conn.execute(
+            f"SELECT source, outcome, COUNT(*), AVG(confidence) FROM results{where} GROUP BY source, outcome", params
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"source": s, "outcome": o, "count": n, "mean_confidence": c} for s, o, n, c in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hasil screening tersimpan: export dan ringkasan")
+    parser.add_argument("--db", default=config.RESULTS_DB)
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export hasil ke JSONL/CSV secara streaming")
+    export.add_argument("output", help="File .jsonl/.csv, atau - untuk stdout")
+    export.add_argument("--format", choices=("jsonl", "csv"), default=None, help="Default: dari ekstensi output")
+    for p in (export, sub.add_parser("summary", help="Jumlah hasil per sumber dan outcome")):
+        p.add_argument("--since", default=None, help="Unix timestamp atau ISO (2026-10-01T08:00)")
+        p.add_argument("--until", default=None)
+    export.add_argument("--outcome", choices=OUTCOMES, default=None)
+    export.add_argument("--source", default=None, help="ui, ui_video, ui_webcam, api, api_video")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"❌ Database hasil tidak ditemukan: {args.db}")
+    try:
+        since, until = parse_time(args.since), parse_time(args.until)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+
+    if args.command == "summary":
+        for row in summarize(args.db, since, until):
+            mean = "-" if row["mean_confidence"] is None else f"{row['mean_confidence']:.3f}"
+            print(f"{row['source']:<10} {row['outcome']:<8} {row['count']:>8}  rata-rata confidence {mean}")
+        return
+
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+    lines = export_lines(iter_results(args.db, since, until, args.outcome, args.source), fmt)
+    if args.output == "-":
+        sys.stdout.writelines(lines)
+        return
+    count = 0
+    with open(args.output, "w", newline="", encoding="utf-8") as out:
+        for line in lines:
+            out.write(line)
+            count += 1
+    print(f"💾 {count - (fmt == 'csv')} hasil diexport ke {args.output}")
+
+
+if __name__ == "__main__":
+    main()
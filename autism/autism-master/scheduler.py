@@ -0,0 +1,293 @@
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from executors import Overloaded
+
+
+class _Pending:
+    __slots__ = ("tensor", "future", "enqueued_at")
+
+    def __init__(self, tensor, future, enqueued_at):
+        self.tensor = tensor
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+
+# Scheduler inferensi: kumpulkan tensor dari banyak sesi, jalankan satu forward pass
+class BatchScheduler:
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10.0,
+                 stats_every=0, window=2048, name="cnn", max_queue=0, max_inflight=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size minimal 1")
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.stats_every = stats_every
+        self.name = name
+        # Batas antrian (0 = tanpa batas); antrian penuh → submit ditolak dengan Overloaded
+        self.max_queue = max(0, max_queue)
+        # Jumlah batch yang boleh berjalan bersamaan (mis. satu per replika model); 1 = berurutan
+        self.max_inflight = max(1, max_inflight)
+        self._inflight = threading.BoundedSemaphore(self.max_inflight)
+        self._executor = None
+
+        # Buffer batch yang dipakai ulang (paling banyak satu per batch yang berjalan bersamaan),
+        # dibuat saat batch pertama sesuai shape/dtype tensor; np.stack tidak dialokasikan tiap batch
+        self._buffers = []
+        self._buffer_spec = None
+
+        self._queue = queue.Queue()
+        self._enqueue_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+        # Statistik untuk tuning batch size dan waktu tunggu
+        self._batch_sizes = Counter()
+        self._waits = deque(maxlen=window)
+        self._run_times = deque(maxlen=window)
+        self._n_batches = 0
+        self._n_items = 0
+        self._n_errors = 0
+        self._n_rejected = 0
+        self._peak_depth = 0
+
+    def start(self):
+        if self.max_inflight > 1 and self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_inflight, thread_name_prefix=f"batch-run-{self.name}"
+            )
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._loop, name=f"batch-scheduler-{self.name}", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stopped.set()
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def submit(self, tensor):
+        """Masukkan satu tensor (tanpa dimensi batch) ke antrian, hasilnya Future."""
+        return self.submit_many([tensor])[0]
+
+    def submit_many(self, tensors):
+        """Masukkan beberapa tensor sekaligus (mis. semua wajah satu gambar), hasilnya list Future.
+
+        Tensor diantrikan berurutan tanpa diselingi request lain, sehingga masuk ke batch yang sama
+        selama muat dalam max_batch_size; antrian yang tidak cukup untuk semuanya menolak seluruhnya.
+        """
+        if self._stopped.is_set():
+            raise RuntimeError("Scheduler sudah dihentikan")
+        if self._thread is None:
+            self.start()
+        with self._enqueue_lock:
+            depth = self._queue.qsize()
+            if self.max_queue and depth + len(tensors) > self.max_queue:
+                with self._lock:
+                    self._n_rejected += 1
+                raise Overloaded(f"Antrian inferensi penuh ({self.max_queue}), coba lagi sebentar")
+            with self._lock:
+                self._peak_depth = max(self._peak_depth, depth + len(tensors))
+            enqueued_at = time.perf_counter()
+            futures = []
+            for tensor in tensors:
+                future = Future()
+                self._queue.put(_Pending(tensor, future, enqueued_at))
+                futures.append(future)
+        return futures
+
+    def predict(self, tensor, timeout=None):
+        return self.submit(tensor).result(timeout)
+
+    def qsize(self):
+        return self._queue.qsize()
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            # Mode paralel: tunggu slot kosong sebelum mengumpulkan batch berikutnya,
+            # agar batch tetap terbentuk di antrian selama semua slot sibuk
+            if self._executor is not None:
+                self._inflight.acquire()
+            batch = self._collect()
+            # Future yang sudah dibatalkan pemanggil tidak perlu dihitung
+            batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+            if not batch:
+                if self._executor is not None:
+                    self._inflight.release()
+                continue
+
+            if self._executor is None:
+                self._run(batch)
+            else:
+                self._executor.submit(self._run_released, batch)
+
+    def _run_released(self, batch):
+        try:
+            self._run(batch)
+        finally:
+            self._inflight.release()
+
+    def _run(self, batch):
+        started = time.perf_counter()
+        buffer = None
+        try:
+            buffer = self._take_buffer(batch[0].tensor)
+            for i, p in enumerate(batch):
+                buffer[i] = p.tensor
+            outputs = self.run_batch(buffer[:len(batch)])
+            if len(outputs) != len(batch):
+                raise RuntimeError(
+                    f"run_batch mengembalikan {len(outputs)} hasil untuk {len(batch)} input"
+                )
+        except Exception as e:
+            with self._lock:
+                self._n_errors += 1
+            for p in batch:
+                p.future.set_exception(e)
+            return
+        finally:
+            if buffer is not None:
+                self._give_buffer(buffer)
+        finished = time.perf_counter()
+
+        for p, out in zip(batch, outputs):
+            p.future.set_result(out)
+        self._record(batch, started, finished)
+
+    def _take_buffer(self, tensor):
+        tensor = np.asarray(tensor)
+        spec = (tensor.shape, tensor.dtype)
+        with self._lock:
+            if spec != self._buffer_spec:
+                self._buffer_spec = spec
+                self._buffers.clear()
+            if self._buffers:
+                return self._buffers.pop()
+        return np.empty((self.max_batch_size,) + tensor.shape, dtype=tensor.dtype)
+
+    def _give_buffer(self, buffer):
+        with self._lock:
+            if (buffer.shape[1:], buffer.dtype) == self._buffer_spec:
+                self._buffers.append(buffer)
+
+    def _record(self, batch, started, finished):
+        with self._lock:
+            self._n_batches += 1
+            self._n_items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._run_times.append(finished - started)
+            self._waits.extend(started - p.enqueued_at for p in batch)
+            log_now = self.stats_every and self._n_batches % self.stats_every == 0
+        if log_now:
+            print(f"📊 {self.format_stats()}")
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits, dtype=np.float64) * 1000.0
+            run_times = np.array(self._run_times, dtype=np.float64) * 1000.0
+            sizes = dict(sorted(self._batch_sizes.items()))
+            n_batches, n_items, n_errors = self._n_batches, self._n_items, self._n_errors
+            n_rejected, peak_depth = self._n_rejected, self._peak_depth
+
+        def _pct(values, q):
+            return float(np.percentile(values, q)) if len(values) else 0.0
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": n_batches,
+            "items": n_items,
+            "errors": n_errors,
+            "rejected": n_rejected,
+            "max_queue": self.max_queue,
+            "max_inflight": self.max_inflight,
+            "queue_depth": self.qsize(),
+            "peak_queue_depth": peak_depth,
+            "mean_batch_size": (n_items / n_batches) if n_batches else 0.0,
+            "batch_size_histogram": sizes,
+            "queue_wait_ms": {
+                "mean": float(waits.mean()) if len(waits) else 0.0,
+                "p50": _pct(waits, 50),
+                "p95": _pct(waits, 95),
+                "p99": _pct(waits, 99),
+                "max": float(waits.max()) if len(waits) else 0.0,
+            },
+            "run_ms": {
+                "mean": float(run_times.mean()) if len(run_times) else 0.0,
+                "p95": _pct(run_times, 95),
+            },
+        }
+
+    def format_stats(self):
+        s = self.stats()
+        wait = s["queue_wait_ms"]
+        return (
+            f"Scheduler {self.name}: {s['batches']} batch, {s['items']} gambar, "
+            f"rata-rata batch {s['mean_batch_size']:.2f}/{s['max_batch_size']}, "
+            f"tunggu antrian p50 {wait['p50']:.1f} ms / p95 {wait['p95']:.1f} ms, "
+            f"forward pass rata-rata {s['run_ms']['mean']:.1f} ms"
+        )
+
+
+def closed_loop_load(scheduler, tensor, clients, seconds):
+    """Beban closed-loop: `clients` thread masing-masing mengirim request berikutnya begitu yang sebelumnya
+    selesai, selama `seconds` detik. Mengembalikan throughput (gambar/detik) dan persentil latensi (ms)."""
+    latencies = [[] for _ in range(clients)]
+    deadline = time.perf_counter() + seconds
+
+    def client(samples):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            scheduler.predict(tensor)
+            samples.append((time.perf_counter() - started) * 1000.0)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(latencies[i],)) for i in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    samples = np.array([x for per_client in latencies for x in per_client])
+    return {
+        "clients": clients,
+        "images": int(len(samples)),
+        "images_per_second": len(samples) / elapsed,
+        "latency_ms": {
+            "p50": float(np.percentile(samples, 50)) if len(samples) else 0.0,
+            "p95": float(np.percentile(samples, 95)) if len(samples) else 0.0,
+            "p99": float(np.percentile(samples, 99)) if len(samples) else 0.0,
+        },
+    }
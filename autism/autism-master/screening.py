@@ -0,0 +1,426 @@
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from cache import image_key
+import metrics
+from executors import Overloaded
+from ingest import IngestError, load_image, signature as ingest_signature, to_array
+from model_service import ModelNotReady
+from prefetch import JobCancelled, SingleFlight
+
+# Ambang keputusan: skor CNN di bawah 0.65 = terdeteksi autisme dari gambar,
+# checklist minimal 60% = terdeteksi autisme dari kuisioner
+CONFIDENCE_THRESHOLD = 0.65
+CHECKLIST_THRESHOLD = 60
+
+# Daftar pertanyaan gejala autisme
+pertanyaan = [
+    "👀 Menghindari kontak mata",
+    "🗣️ Terlambat bicara atau tidak berbicara",
+    "🔁 Sering mengulang kata atau gerakan (stimming)",
+    "🧏 Tidak merespons saat dipanggil namanya",
+    "🤝 Kesulitan berinteraksi atau bermain dengan anak lain"
+]
+
+NO_FACE_MESSAGE = (
+    "❌ Tidak terdeteksi wajah pada gambar.\n"
+    "Pastikan:\n"
+    "• Gambar menunjukkan wajah dengan jelas\n"
+    "• Wajah menghadap ke depan\n"
+    "• Pencahayaan cukup baik\n"
+    "• Format gambar JPG/PNG"
+)
+
+
+# Pesan error untuk user (tetap string biasa) plus jenisnya untuk metrik:
+# invalid_image, not_ready atau error
+class ScreeningError(str):
+    def __new__(cls, message, kind="error"):
+        error = super().__new__(cls, message)
+        error.kind = kind
+        return error
+
+
+class ImageAnalysis:
+    __slots__ = ("faces", "primary", "face_confidences", "timings", "crop_box", "face_uncertainties")
+
+    def __init__(self, faces, primary=None, face_confidences=None, timings=None, crop_box=None,
+                 face_uncertainties=None):
+        self.faces = faces
+        self.primary = primary  # indeks wajah utama di faces (dasar keputusan), None jika tidak ada wajah
+        # Skor CNN per wajah sejajar dengan faces; None untuk wajah yang tidak diskor (melebihi batas)
+        self.face_confidences = face_confidences or [None] * len(faces)
+        self.timings = timings or {}  # durasi per tahap (ms) saat analisis dihitung
+        # Kotak crop wajah utama (x, y, w, h) di gambar asli; dipakai Grad-CAM tanpa deteksi ulang
+        self.crop_box = crop_box
+        # Std skor antar varian TTA per wajah (sejajar dengan faces); None jika TTA nonaktif
+        self.face_uncertainties = face_uncertainties
+
+    @property
+    def confidence(self):
+        """Skor CNN wajah utama, None jika tidak ada wajah."""
+        return None if self.primary is None else self.face_confidences[self.primary]
+
+    @property
+    def uncertainty(self):
+        """Std skor TTA wajah utama, None jika tidak ada wajah atau TTA nonaktif."""
+        if self.primary is None or self.face_uncertainties is None:
+            return None
+        return self.face_uncertainties[self.primary]
+
+
+BUSY_MESSAGE = "⏳ Server sedang sibuk melayani banyak analisis. Silakan coba lagi dalam beberapa detik."
+
+
+def image_error_message(error, kind="error"):
+    return ScreeningError(
+        f"❌ Error memproses gambar: {str(error)}\n"
+        "Pastikan gambar dalam format yang valid (JPG/PNG).",
+        kind,
+    )
+
+
+# Jenis hasil analisis untuk counter metrik
+def outcome_of(analysis, error):
+    if error:
+        return getattr(error, "kind", "error")
+    return "no_face" if analysis.confidence is None else "ok"
+
+
+# Validasi gambar upload; mengembalikan (array RGB, pesan_error)
+def validate_image(image):
+    if image is None:
+        return None, ScreeningError("❗ Silakan upload gambar terlebih dahulu.", "invalid_image")
+
+    try:
+        # Validasi gambar
+        if not isinstance(image, Image.Image):
+            return None, ScreeningError("❗ Format gambar tidak valid.", "invalid_image")
+
+        # Pastikan gambar memiliki 3 channel (RGB)
+        if image.mode != "RGB":
+            return None, ScreeningError("❗ Gambar harus dalam format RGB.", "invalid_image")
+
+        # Piksel disalin ke buffer per thread (tanpa salinan penuh baru tiap request)
+        img_array = to_array(image)
+    except Exception as e:
+        return None, image_error_message(e, "invalid_image")
+
+    return img_array, None
+
+
+# Upload berupa path file atau bytes: decode diperkecil + batas ukuran; mengembalikan (PIL RGB, pesan_error)
+def ingest_image(source):
+    try:
+        return load_image(source), None
+    except IngestError as e:
+        return None, ScreeningError(f"❗ {e}", "invalid_image")
+
+
+# Deteksi wajah + crop semua wajah; mengembalikan (FaceResult, list tensor uint8 untuk CNN atau None)
+def prepare_face(face_stage, img_array):
+    face = face_stage.run(img_array)
+    if not face.faces:
+        return face, None
+    # Crop uint8 langsung jadi input CNN: skala /255 ada di graph model,
+    # dimensi batch ditambahkan scheduler saat menyalin ke buffer batch
+    return face, face.crops
+
+
+# Skor per wajah (sejajar dengan face.faces) dari skor crop yang urutannya mengikuti face.scored
+def face_confidences(face, scores):
+    confidences = [None] * len(face.faces)
+    for index, score in zip(face.scored, scores):
+        confidences[index] = float(np.asarray(score).reshape(-1)[0])
+    return confidences
+
+
+# Ringkasan semua wajah untuk UI jika gambar berisi lebih dari satu wajah
+def format_faces(analysis):
+    if len(analysis.faces) < 2:
+        return ""
+    parts = []
+    for i, confidence in enumerate(analysis.face_confidences):
+        label = f"wajah {i + 1}" + (" (utama)" if i == analysis.primary else "")
+        if confidence is None:
+            parts.append(f"{label}: tidak diskor")
+        elif analysis.face_uncertainties is not None and analysis.face_uncertainties[i] is not None:
+            parts.append(f"{label}: {confidence:.2f} ± {analysis.face_uncertainties[i]:.2f}")
+        else:
+            parts.append(f"{label}: {confidence:.2f}")
+    return f"\n👥 {len(analysis.faces)} wajah terdeteksi — " + ", ".join(parts)
+
+
+# Skor dari kuisioner; gejala berisi teks pertanyaan yang dicentang
+def score_checklist(gejala):
+    skor_gejala = len(gejala)
+    persen_gejala = (skor_gejala / len(pertanyaan)) * 100
+    return skor_gejala, persen_gejala
+
+
+# Jawaban checklist dari manifest/API: list atau string "1;3" (nomor pertanyaan 1-5) / teks pertanyaan
+def parse_gejala(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = [v.strip() for v in value.replace(",", ";").split(";") if v.strip()]
+    gejala = []
+    for item in value:
+        if isinstance(item, int) or (isinstance(item, str) and item.isdigit()):
+            index = int(item)
+            if not 1 <= index <= len(pertanyaan):
+                raise ValueError(f"Nomor gejala di luar rentang 1-{len(pertanyaan)}: {item}")
+            gejala.append(pertanyaan[index - 1])
+        elif item in pertanyaan:
+            gejala.append(item)
+        else:
+            raise ValueError(f"Gejala tidak dikenal: {item}")
+    return gejala
+
+
+# Keputusan akhir dari skor CNN dan checklist, dipakai UI, CLI batch dan API.
+# uncertainty: std skor TTA (hanya dilaporkan, ambang tetap memakai confidence)
+def decide(confidence, gejala, uncertainty=None):
+    pred_autism_from_image = confidence < CONFIDENCE_THRESHOLD
+    skor_gejala, persen_gejala = score_checklist(gejala)
+    pred_autism_from_form = persen_gejala >= CHECKLIST_THRESHOLD
+
+    # Interpretasi hasil
+    if pred_autism_from_image and pred_autism_from_form:
+        outcome = "high"
+        hasil = "🔴 Tinggi Kemungkinan Autisme"
+        penjelasan = (
+            "Model mendeteksi kemungkinan autisme dari gambar wajah dan "
+            "gejala checklist juga mendukung. Segera konsultasi ke profesional."
+        )
+    elif pred_autism_from_image or pred_autism_from_form:
+        outcome = "medium"
+        hasil = "🟠 Sedang / Perlu Observasi"
+        penjelasan = (
+            "Model atau checklist menunjukkan potensi gejala autisme. "
+            "Perlu pengamatan lebih lanjut atau konsultasi lanjutan."
+        )
+    else:
+        outcome = "low"
+        hasil = "🟢 Tidak Terindikasi Autisme"
+        penjelasan = (
+            "Model dan kuisioner tidak menunjukkan indikasi autisme. "
+            "Namun tetap pantau perkembangan anak secara berkala."
+        )
+
+    return {
+        "outcome": outcome,
+        "label": hasil,
+        "explanation": penjelasan,
+        "confidence": confidence,
+        "uncertainty": uncertainty,
+        "image_positive": pred_autism_from_image,
+        "checklist_count": skor_gejala,
+        "checklist_total": len(pertanyaan),
+        "checklist_percent": persen_gejala,
+        "checklist_positive": pred_autism_from_form,
+    }
+
+
+# Satu hasil screening untuk ResultStore (urutan results_store.COLUMNS); decision None = tidak ada wajah.
+# Nilai dibiarkan mentah (list/dict), serialisasi JSON dilakukan thread penulis.
+def result_row(source, decision, gejala, model_version=None, faces=None, face_confidences=None,
+               primary_face=None, timings=None, trace_id=None):
+    skor_gejala, persen_gejala = score_checklist(gejala)
+    if decision is None:
+        decision = {"outcome": "no_face", "confidence": None, "image_positive": None,
+                    "checklist_positive": persen_gejala >= CHECKLIST_THRESHOLD}
+    return (
+        time.time(), source, "no_face" if decision["outcome"] == "no_face" else "ok", decision["outcome"],
+        decision["confidence"], decision["image_positive"], skor_gejala, persen_gejala,
+        decision["checklist_positive"],
+        # Jawaban checklist disimpan sebagai nomor pertanyaan (1-5), bukan teks
+        [pertanyaan.index(g) + 1 for g in gejala if g in pertanyaan],
+        model_version, None if faces is None else len(faces), face_confidences, primary_face, timings, trace_id,
+    )
+
+
+# Teks hasil untuk UI: (hasil lengkap, confidence, checklist)
+def format_result(decision):
+    uncertainty = decision["uncertainty"]
+    confidence_str = (
+        f"Confidence (Normal): {decision['confidence']:.2f}"
+        + (f" ± {uncertainty:.2f} (TTA)" if uncertainty is not None else "")
+        + f" ({'Terdeteksi Autisme' if decision['image_positive'] else 'Normal'})"
+    )
+    checklist_str = (
+        f"Checklist Terpilih: {decision['checklist_count']}/{decision['checklist_total']} → "
+        f"{decision['checklist_percent']:.0f}% kemungkinan Autisme"
+    )
+
+    hasil_akhir = (
+        f"{decision['label']}\n\n"
+        f"📷 Prediksi Gambar Wajah\n{confidence_str}\n\n"
+        f"📝 Hasil Kuisioner\n{checklist_str}\n\n"
+        f"📌 Kesimpulan\n{decision['explanation']}\n\n"
+        f"🔗 Konsultasi dan Penanganan Lebih Lanjut:\n"
+        f"- 👉 [Konsultasi Psikolog Anak - Halodoc](https://www.halodoc.com/cari-dokter/psikolog-anak)\n"
+        f"- 📖 [Penanganan Autisme - Halodoc](https://www.halodoc.com/kesehatan/autisme)"
+    )
+
+    return hasil_akhir, confidence_str, checklist_str
+
+
+# Pipeline screening: validasi, deteksi wajah, skor CNN (dengan cache + single-flight)
+class Screener:
+    def __init__(self, model_service, face_stage, cache, face_pool=None, results=None, tta=None):
+        self.model_service = model_service
+        self.face_stage = face_stage
+        self.cache = cache
+        # TestTimeAugmentation; None = satu crop per wajah
+        self.tta = tta
+        # ResultStore untuk audit/analitik; None = hasil tidak disimpan
+        self.results = results
+        # Pool khusus deteksi wajah (StagePool); None = jalan di thread pemanggil
+        self.face_pool = face_pool
+        # Analisis yang sedang berjalan per kunci gambar, agar klik analisis menunggu hasil upload
+        self.flights = SingleFlight()
+
+    # Analisis gambar (validasi, deteksi wajah, skor CNN) tanpa bagian kuisioner.
+    # Mengembalikan (analysis, pesan_error); dipakai predict() dan analisis spekulatif saat upload.
+    # Overloaded diteruskan ke pemanggil jika antrian deteksi wajah atau inferensi penuh.
+    def analyze_image(self, image, cancelled=None):
+        img_array, cache_key, error = self.prepare(image)
+        if error:
+            return None, error
+        return self.analyze_prepared(img_array, cache_key, cancelled)
+
+    # Decode + validasi + kunci cache; mengembalikan (array RGB, kunci cache, pesan_error)
+    def prepare(self, image):
+        if isinstance(image, (str, bytes, os.PathLike)):
+            with metrics.span("ingest"):
+                image, error = ingest_image(image)
+            if error:
+                return None, None, error
+
+        with metrics.span("validate"):
+            img_array, error = validate_image(image)
+        if error:
+            return None, None, error
+
+        if not self.model_service.ready:
+            return None, None, ScreeningError(self.model_service.status_message(), "not_ready")
+
+        try:
+            # Gambar yang sama (mis. user kembali dan mengubah checklist saja) tidak dianalisis ulang
+            with metrics.span("hash"):
+                cache_key = image_key(
+                    img_array, ingest_signature(), self.face_stage.signature(), self.model_service.model_version,
+                    self.tta.signature() if self.tta is not None else "tta-off",
+                )
+        except Exception as e:
+            return None, None, image_error_message(e)
+        return img_array, cache_key, None
+
+    # Analisis gambar yang sudah lewat prepare(): dari cache, atau dihitung sekali per kunci
+    def analyze_prepared(self, img_array, cache_key, cancelled=None):
+        analysis = self.cache.get(cache_key)
+        if analysis is not None:
+            return analysis, None
+
+        # Jika gambar yang sama sedang dianalisis (mis. spekulatif saat upload), tunggu hasilnya
+        while True:
+            try:
+                return self.flights.do(cache_key, lambda: self._analyze_uncached(img_array, cache_key, cancelled))
+            except JobCancelled:
+                if cancelled is not None and cancelled.is_set():
+                    raise
+
+    def _analyze_uncached(self, img_array, cache_key, cancelled):
+        # Cek ulang tanpa dihitung sebagai miss kedua: pemanggil sebelumnya mungkin baru saja mengisi cache
+        analysis = self.cache.peek(cache_key)
+        if analysis is not None:
+            return analysis, None
+
+        try:
+            # Deteksi wajah pada salinan kecil gambar asli, lalu crop wajah ke 224x224
+            if self.face_pool is not None:
+                face, tensors = self.face_pool.run(prepare_face, self.face_stage, img_array)
+            else:
+                face, tensors = prepare_face(self.face_stage, img_array)
+            # Durasi diukur di thread deteksi wajah, dicatat di thread request agar masuk trace-nya
+            for stage, ms in face.timings.items():
+                metrics.record(stage, ms)
+            if tensors is None:
+                analysis = ImageAnalysis(face.faces, timings=face.timings)
+                self.cache.put(cache_key, analysis)
+                return analysis, None
+        except Overloaded:
+            raise
+        except Exception as e:
+            return None, image_error_message(e)
+
+        # Gambar sudah diganti user: jangan pakai slot CNN untuk hasil yang tidak akan dibaca
+        if cancelled is not None and cancelled.is_set():
+            raise JobCancelled()
+
+        # Prediksi CNN dengan error handling; semua wajah (dan varian TTA wajah utama) masuk ke forward pass yang sama
+        try:
+            timings = dict(face.timings)
+            if self.tta is not None:
+                started = time.perf_counter()
+                tensors = self.tta.expand(tensors)
+                timings["tta"] = (time.perf_counter() - started) * 1000.0
+                metrics.record("tta", timings["tta"])
+            started = time.perf_counter()
+            scores = self.model_service.predict_many(tensors)
+            timings["inference"] = (time.perf_counter() - started) * 1000.0
+            metrics.record("inference", timings["inference"])
+            uncertainties = None
+            if self.tta is not None:
+                scores, primary_std = self.tta.aggregate_crops(scores)
+                # Ketidakpastian hanya untuk wajah utama (satu-satunya crop dengan varian TTA)
+                uncertainties = [None] * len(face.faces)
+                uncertainties[face.primary] = primary_std
+            analysis = ImageAnalysis(face.faces, face.primary, face_confidences(face, scores), timings, face.box,
+                                     uncertainties)
+            self.cache.put(cache_key, analysis)
+            return analysis, None
+        except ModelNotReady as e:
+            return None, ScreeningError(str(e), "not_ready")
+        except Overloaded:
+            raise
+        except Exception as e:
+            return None, ScreeningError(f"❌ Error saat prediksi model: {str(e)}")
+
+    # Fungsi prediksi utama: (hasil lengkap, confidence, checklist)
+    def predict(self, image, gejala):
+        try:
+            analysis, error = self.analyze_image(image)
+        except Overloaded:
+            metrics.SCREENINGS.inc(source="ui", outcome="busy")
+            return BUSY_MESSAGE, "", ""
+        metrics.SCREENINGS.inc(source="ui", outcome=outcome_of(analysis, error))
+        if error:
+            return error, "", ""
+
+        if not analysis.faces:
+            self.record_result("ui", None, gejala, analysis)
+            return NO_FACE_MESSAGE, "", ""
+
+        with metrics.span("format"):
+            decision = decide(analysis.confidence, gejala, analysis.uncertainty)
+            hasil, confidence_str, checklist_str = format_result(decision)
+        self.record_result("ui", decision, gejala, analysis)
+        return hasil, confidence_str + format_faces(analysis), checklist_str
+
+    # Simpan hasil ke ResultStore: hanya masuk antrian thread penulis, request tidak menunggu disk
+    def record_result(self, source, decision, gejala, analysis=None, timings=None):
+        if self.results is None:
+            return
+        faces = face_scores = primary = None
+        if analysis is not None:
+            faces, face_scores, primary = analysis.faces, analysis.face_confidences, analysis.primary
+            timings = timings or analysis.timings
+        self.results.record(result_row(
+            source, decision, gejala, self.model_service.model_version, faces, face_scores, primary,
+            timings, metrics.current_trace_id(),
+        ))
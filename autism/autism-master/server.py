@@ -0,0 +1,37 @@
+import gradio as gr
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+import metrics
+
+
+# Aplikasi ASGI: endpoint health check + UI Gradio di root
+def create_app(iface, model_service, stats_provider=None, routers=()):
+    # Uvicorn mengakhiri proses dengan sinyal setelah shutdown, jadi atexit tidak selalu jalan
+    app = FastAPI(title="Autisense", on_shutdown=[model_service.close])
+
+    # Router tambahan (mis. API JSON) didaftarkan sebelum UI Gradio di-mount di root
+    for router in routers:
+        app.include_router(router)
+
+    @app.get("/healthz")
+    def healthz():
+        body = model_service.liveness()
+        return JSONResponse(body, status_code=503 if body["status"] == "failed" else 200)
+
+    @app.get("/readyz")
+    def readyz():
+        body = model_service.readiness()
+        return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+    # Statistik scheduler, deteksi wajah dan cache untuk tuning
+    @app.get("/stats")
+    def stats():
+        return JSONResponse(stats_provider() if stats_provider else {})
+
+    # Metrik format Prometheus: histogram durasi per tahap, counter hasil, waktu load model, antrian
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    return gr.mount_gradio_app(app, iface, path="/")
@@ -0,0 +1,15 @@
+// Isi elemen [data-include] dengan potongan HTML statis halaman (file ber-versi, di-cache browser),
+// sehingga teks halaman tidak ikut dikirim di config Gradio setiap kali halaman dibuka
+(() => {
+    const pending = {};
+    const fill = (el) => {
+        const url = el.getAttribute("data-include");
+        el.setAttribute("data-included", "");
+        pending[url] = pending[url] || fetch(url).then((response) => response.text());
+        pending[url].then((html) => { el.innerHTML = html; });
+    };
+    const scan = () => document.querySelectorAll("[data-include]:not([data-included])").forEach(fill);
+    // Komponen Gradio dirender setelah skrip ini dimuat (dan bisa dirender ulang)
+    new MutationObserver(scan).observe(document.documentElement, { childList: true, subtree: true });
+    scan();
+})();
@@ -0,0 +1,43 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import config
+from benchmarks.memory import BUFFER_MIN_BYTES, current_steps, measure
+from benchmarks.synthetic import encode_jpeg, make_image
+from face_stage import FaceStage
+from inference import INPUT_DTYPE, INPUT_SHAPE
+
+# Batas alokasi satu request (ingest → validate → face stage → buffer batch) setelah buffer per thread
+# terisi. Jalur lama menyalin gambar penuh di validate: ~7 MB pada 1080p, ~53 MB pada 12 MP.
+MAX_REQUEST_BYTES = 1024 * 1024
+MAX_VALIDATE_BYTES = 512 * 1024
+# Buffer >= 4 KB per request: potongan salinan piksel, hasil decode kecil dan crop 224x224 untuk antrian
+MAX_BUFFERS = 3
+
+
+@pytest.fixture(scope="module")
+def steps():
+    face_stage = FaceStage(
+        max_side=config.FACE_DETECT_MAX_SIDE, crop=config.FACE_CROP, margin=config.FACE_CROP_MARGIN
+    )
+    return current_steps(face_stage, np.empty((8,) + INPUT_SHAPE, dtype=INPUT_DTYPE))
+
+
+@pytest.mark.parametrize("size", [1080, 3024])
+def test_request_allocations_bounded(steps, size):
+    jpegs = [encode_jpeg(make_image("face", size, seed)) for seed in range(5)]
+    tracemalloc.start()
+    try:
+        # Warmup: buffer per thread dan detector dibuat sebelum diukur
+        for jpeg in jpegs[:2]:
+            measure(steps, jpeg)
+        samples = [measure(steps, jpeg)[0] for jpeg in jpegs[2:]]
+    finally:
+        tracemalloc.stop()
+
+    for stages in samples:
+        assert stages["validate"] <= MAX_VALIDATE_BYTES, stages
+        assert sum(stages.values()) <= MAX_REQUEST_BYTES, stages
+        assert sum(1 for v in stages.values() if v >= BUFFER_MIN_BYTES) <= MAX_BUFFERS, stages
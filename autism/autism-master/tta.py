@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+import config
+
+# Naikkan jika cara membuat varian/agregasi berubah agar skor lama di cache tidak terpakai
+TTA_VERSION = "tta-v2"
+
+VARIANTS = ("identity", "flip", "zoom", "zoom_flip", "shift_tl", "shift_br", "bright", "dark")
+AGGREGATES = ("mean", "trimmed_mean")
+
+
+# Test-time augmentation: crop wajah utama diperluas jadi beberapa varian (flip, crop kecil, kecerahan)
+# yang diskor dalam forward pass yang sama, lalu skornya digabung menjadi confidence + ketidakpastian.
+# Wajah lain tetap diskor sekali: dengan varian untuk semua wajah, satu foto grup (8 wajah x 8 varian)
+# sudah memenuhi antrian inferensi dan ditolak setiap kali ada request lain yang mengantri.
+class TestTimeAugmentation:
+    def __init__(self, variants=VARIANTS, aggregate="trimmed_mean", trim=0.125, zoom=0.9, brightness=0.15):
+        unknown = [v for v in variants if v not in VARIANTS]
+        if unknown or not variants:
+            raise ValueError(f"Varian TTA tidak dikenal: {', '.join(unknown) or '(kosong)'} (pilih {', '.join(VARIANTS)})")
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Agregasi TTA tidak dikenal: {aggregate} (pilih {', '.join(AGGREGATES)})")
+        if not 0.0 <= trim < 0.5:
+            raise ValueError("Porsi trim TTA harus di antara 0 dan 0.5")
+        self.variants = tuple(variants)
+        self.aggregate_method = aggregate
+        self.trim = trim
+        self.zoom = zoom
+        self.brightness = brightness
+        # Tabel kecerahan 256 entri: satu cv2.LUT per varian, tanpa konversi ke float
+        levels = np.arange(256, dtype=np.float32)
+        self._luts = {
+            "bright": np.clip(levels * (1.0 + brightness), 0, 255).astype(np.uint8),
+            "dark": np.clip(levels * (1.0 - brightness), 0, 255).astype(np.uint8),
+        }
+
+    def signature(self):
+        """Parameter yang mempengaruhi skor, untuk kunci cache."""
+        return (
+            f"{TTA_VERSION}:{','.join(self.variants)}:{self.aggregate_method}:{self.trim}:"
+            f"{self.zoom}:{self.brightness}"
+        )
+
+    @property
+    def size(self):
+        return len(self.variants)
+
+    def _window(self, crop, anchor):
+        """Crop kecil (sisi = zoom x crop) di tengah/kiri atas/kanan bawah, di-resize kembali ke ukuran crop."""
+        height, width = crop.shape[:2]
+        h, w = int(round(height * self.zoom)), int(round(width * self.zoom))
+        if anchor == "center":
+            top, left = (height - h) // 2, (width - w) // 2
+        elif anchor == "tl":
+            top, left = 0, 0
+        else:
+            top, left = height - h, width - w
+        return cv2.resize(crop[top:top + h, left:left + w], (width, height), interpolation=cv2.INTER_LINEAR)
+
+    def _variant(self, crop, name):
+        if name == "identity":
+            return crop
+        if name == "flip":
+            return crop[:, ::-1]
+        if name == "zoom":
+            return self._window(crop, "center")
+        if name == "zoom_flip":
+            return self._window(crop, "center")[:, ::-1]
+        if name in ("shift_tl", "shift_br"):
+            return self._window(crop, name[-2:])
+        return cv2.LUT(crop, self._luts[name])
+
+    def expand(self, crops):
+        """Varian crop pertama (wajah utama) diikuti crop lain apa adanya: size + len(crops) - 1 tensor."""
+        return [self._variant(crops[0], name) for name in self.variants] + list(crops[1:])
+
+    def aggregate(self, scores):
+        """(confidence, std) dari skor varian satu crop; std = sebaran antar varian (ketidakpastian)."""
+        scores = np.sort(np.asarray(scores, dtype=np.float64).reshape(-1))
+        k = int(len(scores) * self.trim) if self.aggregate_method == "trimmed_mean" else 0
+        kept = scores[k:len(scores) - k] if len(scores) > 2 * k else scores
+        return float(kept.mean()), float(scores.std())
+
+    def aggregate_crops(self, scores):
+        """Skor hasil expand() → (list confidence per crop, std varian wajah utama)."""
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        confidence, std = self.aggregate(scores[:self.size])
+        return [confidence] + [float(s) for s in scores[self.size:]], std
+
+    def describe(self):
+        return {
+            "variants": list(self.variants),
+            "aggregate": self.aggregate_method,
+            "trim": self.trim,
+            "zoom": self.zoom,
+            "brightness": self.brightness,
+        }
+
+
+def create_tta():
+    """TTA sesuai config, None jika nonaktif (AUTISENSE_TTA=0)."""
+    if not config.TTA:
+        return None
+    return TestTimeAugmentation(
+        variants=[v.strip() for v in config.TTA_VARIANTS.split(",") if v.strip()],
+        aggregate=config.TTA_AGGREGATE,
+        trim=config.TTA_TRIM,
+        zoom=config.TTA_ZOOM,
+        brightness=config.TTA_BRIGHTNESS,
+    )
@@ -0,0 +1,263 @@
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import config
+from model_store import ensure_model, prepare_mmap
+from scheduler import BatchScheduler, closed_loop_load
+
+PROFILE_FORMAT = "autisense-tuning-v1"
+TUNABLE_BACKENDS = ("keras", "keras-predict")
+
+
+def _csv_ints(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def _default_intra_threads():
+    cpus = os.cpu_count() or 1
+    return sorted({1, max(1, cpus // 2), cpus})
+
+
+def measure(backend_name, model_path, mmap_dir, batch_sizes, concurrency, seconds, max_wait_ms):
+    """Throughput & latensi model untuk tiap kombinasi (ukuran batch, konkurensi) di proses ini.
+
+    Thread TensorFlow dan oneDNN diambil dari config/env proses, karena hanya bisa diatur sebelum
+    TensorFlow diinisialisasi; karena itu tiap kombinasi thread diukur di proses terpisah (lihat sweep).
+    """
+    from inference import create_backend, random_batch
+
+    backend = create_backend(backend_name, model_path, mmap_dir=mmap_dir).load()
+    backend.warmup(sorted(set(batch_sizes) | {1}))
+    tensor = random_batch(np.random.default_rng(0), 1, backend.input_shape)[0]
+    points = []
+    for batch_size, clients in itertools.product(batch_sizes, concurrency):
+        scheduler = BatchScheduler(
+            backend.run_batch, max_batch_size=batch_size, max_wait_ms=max_wait_ms, name=f"tune-{batch_size}",
+        ).start()
+        try:
+            load = closed_loop_load(scheduler, tensor, clients, seconds)
+            stats = scheduler.stats()
+        finally:
+            scheduler.stop(timeout=5)
+        points.append({"batch_size": batch_size, **load, "mean_batch_size": stats["mean_batch_size"]})
+
+    info = backend.describe()
+    return {
+        "intra_op_threads": info.get("intra_op_threads"),
+        "inter_op_threads": info.get("inter_op_threads"),
+        "onednn": os.environ.get("TF_ENABLE_ONEDNN_OPTS", ""),
+        "load_seconds": backend.load_seconds,
+        "points": points,
+    }
+
+
+def _run_worker(threads, args, model_path, mmap_dir, batch_sizes, concurrency):
+    """Ukur satu kombinasi (intra, inter, oneDNN) di proses Python baru; None jika proses gagal."""
+    intra, inter, onednn = threads
+    env = dict(os.environ)
+    env.pop("TF_ENABLE_ONEDNN_OPTS", None)
+    env.update({
+        "AUTISENSE_TF_INTRA_OP_THREADS": str(intra),
+        "AUTISENSE_TF_INTER_OP_THREADS": str(inter),
+        "AUTISENSE_TF_ONEDNN": onednn,
+        # Profil lama tidak boleh ikut memengaruhi pengukuran
+        "AUTISENSE_TUNING_PROFILE": "off",
+        "TF_CPP_MIN_LOG_LEVEL": env.get("TF_CPP_MIN_LOG_LEVEL", "2"),
+    })
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    try:
+        command = [
+            sys.executable, os.path.abspath(__file__), "measure",
+            "--backend", args.backend, "--model", model_path,
+            "--batch-sizes", ",".join(map(str, batch_sizes)),
+            "--concurrency", ",".join(map(str, concurrency)),
+            "--seconds", str(args.seconds), "--max-wait-ms", str(args.max_wait_ms),
+            "--output", output,
+        ]
+        if mmap_dir:
+            command += ["--mmap-dir", mmap_dir]
+        proc = subprocess.run(command, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            tail = "\n".join((proc.stdout + proc.stderr).strip().splitlines()[-5:])
+            print(f"❌ intra {intra}, inter {inter}, oneDNN {onednn or 'bawaan'} gagal:\n{tail}")
+            return None
+        with open(output) as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def _settings(threads, point):
+    intra, inter, onednn = threads
+    return {
+        "AUTISENSE_TF_INTRA_OP_THREADS": intra,
+        "AUTISENSE_TF_INTER_OP_THREADS": inter,
+        "AUTISENSE_TF_ONEDNN": onednn,
+        "AUTISENSE_MAX_BATCH_SIZE": point["batch_size"],
+        "AUTISENSE_ANALYZE_CONCURRENCY": point["clients"],
+    }
+
+
+def choose(candidates, max_p95_ms, tolerance=0.02):
+    """Kandidat terbaik: throughput tertinggi dengan p95 <= batas; di antara yang throughput-nya
+    berselisih <= tolerance dari yang tertinggi, dipilih p99 terendah. Jika tidak ada yang memenuhi
+    batas, dipilih p95 terendah."""
+    within = [c for c in candidates if c["latency_ms"]["p95"] <= max_p95_ms]
+    if not within:
+        return min(candidates, key=lambda c: c["latency_ms"]["p95"])
+    best = max(c["images_per_second"] for c in within)
+    near = [c for c in within if c["images_per_second"] >= best * (1.0 - tolerance)]
+    return min(near, key=lambda c: c["latency_ms"]["p99"])
+
+
+def _describe(candidate):
+    s = candidate["settings"]
+    latency = candidate["latency_ms"]
+    return (
+        f"intra {s['AUTISENSE_TF_INTRA_OP_THREADS']}, inter {s['AUTISENSE_TF_INTER_OP_THREADS']}, "
+        f"oneDNN {s['AUTISENSE_TF_ONEDNN'] or 'bawaan'} | batch {s['AUTISENSE_MAX_BATCH_SIZE']}, "
+        f"konkurensi {s['AUTISENSE_ANALYZE_CONCURRENCY']}: {candidate['images_per_second']:.1f} gambar/s, "
+        f"p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, p99 {latency['p99']:.1f} ms"
+    )
+
+
+def sweep(args):
+    model_path = args.model
+    artifact = None
+    if model_path is None:
+        artifact = ensure_model(config.KERAS_MODEL_PATH)
+        model_path = config.KERAS_MODEL_PATH
+    # Konversi mmap di proses terpisah: proses ini tetap bebas TensorFlow
+    mmap_dir = prepare_mmap(model_path, isolated=True) if config.MODEL_MMAP else None
+    batch_sizes, concurrency = _csv_ints(args.batch_sizes), _csv_ints(args.concurrency)
+    grid = list(itertools.product(
+        _csv_ints(args.intra) if args.intra else _default_intra_threads(),
+        _csv_ints(args.inter),
+        [v if v in ("0", "1") else "" for v in args.onednn.split(",")],
+    ))
+    print(
+        f"🎛️ Tuning {args.backend} di {os.cpu_count()} core: {len(grid)} kombinasi thread x "
+        f"{len(batch_sizes) * len(concurrency)} titik beban x {args.seconds:.0f}s"
+    )
+
+    started = time.perf_counter()
+    # Acuan: konfigurasi yang berlaku sekarang (env/profil), diukur dengan cara yang sama
+    current = (config.TF_INTRA_OP_THREADS, config.TF_INTER_OP_THREADS, os.environ.get("TF_ENABLE_ONEDNN_OPTS", ""))
+    baseline = None
+    result = _run_worker(current, args, model_path, mmap_dir, [config.MAX_BATCH_SIZE], [config.ANALYZE_CONCURRENCY])
+    if result:
+        baseline = {"settings": _settings(current, result["points"][0]), **result["points"][0]}
+        print(f"📏 Acuan saat ini — {_describe(baseline)}")
+
+    candidates = []
+    for threads in grid:
+        result = _run_worker(threads, args, model_path, mmap_dir, batch_sizes, concurrency)
+        if result is None:
+            continue
+        for point in result["points"]:
+            candidate = {"settings": _settings(threads, point), **point}
+            candidates.append(candidate)
+            print(f"   {_describe(candidate)}")
+    if not candidates:
+        raise SystemExit("❌ Tidak ada kombinasi yang berhasil diukur")
+
+    best = choose(candidates, args.max_p95_ms)
+    print(f"🏆 Terbaik (p95 <= {args.max_p95_ms:.0f} ms) — {_describe(best)}")
+    if baseline:
+        gain = best["images_per_second"] / max(baseline["images_per_second"], 1e-9)
+        print(f"📈 {gain:.2f}x throughput acuan, p99 {baseline['latency_ms']['p99']:.1f} → {best['latency_ms']['p99']:.1f} ms")
+
+    profile = {
+        "format": PROFILE_FORMAT,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "cpu_count": os.cpu_count(),
+        "backend": args.backend,
+        "model": {"path": os.path.abspath(model_path), "sha256": (artifact or {}).get("sha256")},
+        "criteria": {"max_p95_ms": args.max_p95_ms, "seconds_per_point": args.seconds},
+        "settings": best["settings"],
+        "result": best,
+        "baseline": baseline,
+        "candidates": sorted(candidates, key=lambda c: -c["images_per_second"]),
+        "sweep_seconds": time.perf_counter() - started,
+    }
+    if args.dry_run:
+        print(json.dumps(profile["settings"], indent=2))
+        return profile
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    tmp = f"{args.output}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp, args.output)
+    print(f"💾 Profil disimpan di: {args.output} (diterapkan saat aplikasi start; env AUTISENSE_* tetap diprioritaskan)")
+    return profile
+
+
+def show(path):
+    if not os.path.exists(path):
+        raise SystemExit(f"❌ Profil tuning belum ada: {path} (jalankan `python tune.py sweep`)")
+    with open(path) as f:
+        profile = json.load(f)
+    print(json.dumps({k: profile.get(k) for k in ("created_at", "cpu_count", "backend", "settings")}, indent=2))
+    if path == config.TUNING["path"]:
+        status = "diterapkan" if config.TUNING["applied"] else f"tidak diterapkan ({config.TUNING.get('reason')})"
+        print(f"{'✅' if config.TUNING['applied'] else '⚠️'} Profil {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tuning runtime CPU: thread TensorFlow, oneDNN, ukuran batch dan konkurensi"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("sweep", help="Ukur semua kombinasi lalu simpan profil terbaik")
+    run.add_argument("--backend", default=config.BACKEND if config.BACKEND in TUNABLE_BACKENDS else "keras",
+                     choices=TUNABLE_BACKENDS)
+    run.add_argument("--model", default=None, help="Default: model .h5 dari model store")
+    run.add_argument("--intra", default="", help="Thread intra-op dipisah koma (default: 1, core/2, core)")
+    run.add_argument("--inter", default="1,2", help="Thread inter-op dipisah koma")
+    run.add_argument("--onednn", default="1,0", help="oneDNN: 1, 0 atau 'default' (bawaan TF), dipisah koma")
+    run.add_argument("--batch-sizes", default="1,4,8,16")
+    run.add_argument("--concurrency", default="1,4,8,16", help="Request bersamaan (AUTISENSE_ANALYZE_CONCURRENCY)")
+    run.add_argument("--seconds", type=float, default=3.0, help="Durasi beban per titik")
+    run.add_argument("--max-wait-ms", type=float, default=config.MAX_WAIT_MS)
+    run.add_argument("--max-p95-ms", type=float, default=250.0, help="Batas latensi p95 kandidat")
+    run.add_argument("--output", default=config.TUNING_PROFILE if config.TUNING_PROFILE != "off"
+                     else os.path.join(config.MODEL_DIR, "tuning_profile.json"))
+    run.add_argument("--dry-run", action="store_true", help="Tampilkan hasil tanpa menyimpan profil")
+    view = sub.add_parser("show", help="Tampilkan profil dan apakah diterapkan di mesin ini")
+    view.add_argument("--profile", default=config.TUNING_PROFILE)
+    # Dipakai sweep: satu kombinasi thread per proses (TensorFlow hanya bisa diatur sebelum inisialisasi)
+    worker = sub.add_parser("measure", help="Ukur satu kombinasi thread dengan env proses ini")
+    worker.add_argument("--backend", default="keras", choices=TUNABLE_BACKENDS)
+    worker.add_argument("--model", default=config.KERAS_MODEL_PATH)
+    worker.add_argument("--mmap-dir", default=None)
+    worker.add_argument("--batch-sizes", default=str(config.MAX_BATCH_SIZE))
+    worker.add_argument("--concurrency", default=str(config.ANALYZE_CONCURRENCY))
+    worker.add_argument("--seconds", type=float, default=3.0)
+    worker.add_argument("--max-wait-ms", type=float, default=config.MAX_WAIT_MS)
+    worker.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    if args.command == "sweep":
+        sweep(args)
+    elif args.command == "show":
+        show(args.profile)
+    else:
+        result = measure(
+            args.backend, args.model, args.mmap_dir, _csv_ints(args.batch_sizes),
+            _csv_ints(args.concurrency), args.seconds, args.max_wait_ms,
+        )
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+import math
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import config
+import metrics
+from executors import Overloaded
+from face_stage import primary_face
+from screening import CONFIDENCE_THRESHOLD, decide, format_result
+
+# FPS dari container kadang kosong/tidak masuk akal (mis. stream WebM dari browser)
+DEFAULT_SOURCE_FPS = 25.0
+
+NO_FACE_VIDEO_MESSAGE = (
+    "❌ Tidak terdeteksi wajah pada video.\n"
+    "Pastikan:\n"
+    "• Wajah anak terlihat jelas di sebagian besar video\n"
+    "• Wajah menghadap ke kamera\n"
+    "• Pencahayaan cukup baik"
+)
+
+
+class VideoError(ValueError):
+    pass
+
+
+# Pelacak satu wajah di grayscale salinan kecil: template matching di sekitar posisi terakhir,
+# jauh lebih murah daripada detectMultiScale. Skor rendah = track hilang, frame berikutnya dideteksi ulang.
+class FaceTracker:
+    def __init__(self, min_score=0.6, search_margin=0.5):
+        self.min_score = min_score
+        self.search_margin = search_margin
+        self.box = None
+        self.template = None
+        self.score = None
+
+    def reset(self, gray, box):
+        x, y, w, h = box
+        self.box = box
+        # Salinan: grayscale ada di buffer per thread yang tertimpa frame berikutnya
+        self.template = gray[y:y + h, x:x + w].copy()
+
+    def clear(self):
+        self.box = self.template = None
+
+    def update(self, gray):
+        """Posisi baru wajah (x, y, w, h) di frame ini, atau None jika track hilang."""
+        if self.box is None:
+            return None
+        x, y, w, h = self.box
+        height, width = gray.shape[:2]
+        mx, my = int(w * self.search_margin), int(h * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+        if x1 - x0 < w or y1 - y0 < h:
+            self.clear()
+            return None
+        result = cv2.matchTemplate(gray[y0:y1, x0:x1], self.template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (dx, dy) = cv2.minMaxLoc(result)
+        self.score = float(score)
+        if score < self.min_score:
+            self.clear()
+            return None
+        # Template diperbarui tiap frame agar mengikuti perubahan ekspresi/pencahayaan;
+        # drift dan perubahan skala dikoreksi oleh deteksi ulang berkala
+        self.reset(gray, (x0 + dx, y0 + dy, w, h))
+        return self.box
+
+
+class FrameSampler:
+    """Jarak (stride) antar frame file video yang dianalisis.
+
+    Mulai dari fps sumber / sample_fps. Biaya frame yang dianalisis dan frame yang hanya di-grab
+    diukur (EWMA); stride diperbesar jika dengan stride sekarang video diproses lebih lambat dari
+    anggaran (realtime x kecepatan putar), dan turun lagi sampai stride dasar jika ada sisa waktu.
+    """
+
+    def __init__(self, source_fps, sample_fps, realtime=1.0, min_sample_fps=1.0):
+        self.source_fps = source_fps
+        self.base = max(1, int(round(source_fps / max(sample_fps, 1e-3))))
+        self.max_stride = max(self.base, int(round(source_fps / max(min_sample_fps, 1e-3))))
+        self.realtime = realtime
+        self.stride = self.base
+        self.sample_cost = None
+        self.skip_cost = 0.0
+
+    @staticmethod
+    def _ewma(old, value):
+        return value if old is None else 0.8 * old + 0.2 * value
+
+    def observe_skip(self, seconds):
+        self.skip_cost = self._ewma(self.skip_cost, seconds)
+
+    def observe_sample(self, seconds):
+        self.sample_cost = self._ewma(self.sample_cost, seconds)
+        # Satu jendela stride: 1 frame dianalisis + (stride-1) frame di-grab, harus selesai dalam
+        # stride / (fps x realtime) detik agar tetap real-time
+        per_frame = 1.0 / (self.source_fps * self.realtime)
+        if self.skip_cost >= per_frame:
+            self.stride = self.max_stride
+            return
+        needed = math.ceil((self.sample_cost - self.skip_cost) / (per_frame - self.skip_cost))
+        self.stride = min(self.max_stride, max(self.base, needed))
+
+
+class VideoAnalysis:
+    __slots__ = ("frames", "summary", "throughput")
+
+    def __init__(self, frames, summary, throughput):
+        self.frames = frames          # timeline per frame yang dianalisis
+        self.summary = summary        # skor agregat
+        self.throughput = throughput  # fps dan anggaran real-time
+
+    @property
+    def confidence(self):
+        return self.summary["confidence"]
+
+
+def summarize_frames(frames):
+    """Skor agregat dari timeline: rata-rata confidence frame berwajah dipakai untuk keputusan."""
+    scores = np.array([f["confidence"] for f in frames if f["confidence"] is not None], dtype=np.float64)
+    summary = {"frames_analyzed": len(frames), "frames_with_face": int(len(scores)), "confidence": None}
+    if len(scores):
+        summary.update({
+            "confidence": float(scores.mean()),
+            "median": float(np.median(scores)),
+            "std": float(scores.std()),
+            "min": float(scores.min()),
+            "max": float(scores.max()),
+            # Fraksi frame yang sendirian sudah di bawah ambang
+            "positive_fraction": float((scores < CONFIDENCE_THRESHOLD).mean()),
+        })
+    summary["face_fraction"] = summary["frames_with_face"] / len(frames) if frames else 0.0
+    return summary
+
+
+# Status analisis satu video/stream: pelacakan wajah antar frame + crop yang menunggu skor CNN.
+# Crop dikirim ke scheduler tanpa ditunggu, sehingga beberapa frame ter-batch dalam satu forward pass
+# sementara frame berikutnya sudah di-decode.
+class VideoSession:
+    def __init__(self, face_stage, model_service, redetect_every=None, track_min_score=None,
+                 max_pending=None, max_frames=None):
+        self.face_stage = face_stage
+        self.model_service = model_service
+        self.redetect_every = max(1, redetect_every or config.VIDEO_REDETECT_EVERY)
+        self.tracker = FaceTracker(min_score=track_min_score or config.VIDEO_TRACK_MIN_SCORE)
+        self.max_pending = max_pending or config.MAX_BATCH_SIZE
+        self.frames = deque(maxlen=max_frames)
+        self.pending = deque()
+        self.since_detect = 0
+        self.detections = 0
+        self.tracked = 0
+        self.stage_ms = {}
+
+    def process(self, rgb, index, timestamp):
+        timings = {}
+        small, scale, gray = self.face_stage.small_gray(rgb, timings)
+
+        box, source = None, None
+        if self.tracker.box is not None and self.since_detect < self.redetect_every:
+            started = time.perf_counter()
+            box = self.tracker.update(gray)
+            timings["track"] = (time.perf_counter() - started) * 1000.0
+            if box is not None:
+                source = "track"
+                self.tracked += 1
+        if box is None:
+            # Deteksi penuh: frame pertama, track hilang, atau jadwal deteksi ulang
+            faces = self.face_stage.detect_small(gray, timings)
+            self.detections += 1
+            self.since_detect = 0
+            if faces:
+                # Aturan wajah utama sama dengan mode gambar (FACE_PRIMARY_RULE), agar anak yang sama dipilih
+                box = faces[primary_face(faces, small.shape, self.face_stage.primary_rule)]
+                self.tracker.reset(gray, box)
+                source = "detect"
+            else:
+                self.tracker.clear()
+
+        frame = {"frame": index, "time": round(timestamp, 3), "face": None, "source": source, "confidence": None}
+        self.frames.append(frame)
+        if box is not None:
+            self.since_detect += 1
+            x, y, w, h = (int(round(v / scale)) for v in box)
+            frame["face"] = {"x": x, "y": y, "w": w, "h": h}
+            _, crop = self.face_stage.crop_face(rgb, small, scale, box, timings)
+            self._submit(frame, crop)
+
+        for stage, ms in timings.items():
+            self.stage_ms[stage] = self.stage_ms.get(stage, 0.0) + ms
+            metrics.record(stage, ms)
+        return frame
+
+    def _submit(self, frame, crop):
+        try:
+            future = self.model_service.submit(crop)
+        except Overloaded:
+            # Antrian inferensi penuh: tunggu skor frame sebelumnya, lalu coba sekali lagi
+            self.drain()
+            future = self.model_service.submit(crop)
+        self.pending.append((frame, future))
+        # Jumlah crop yang menunggu dibatasi satu batch agar satu video tidak memenuhi antrian CNN
+        while len(self.pending) > self.max_pending:
+            self._resolve(*self.pending.popleft())
+
+    @staticmethod
+    def _resolve(frame, future):
+        frame["confidence"] = float(future.result()[0])
+
+    def collect(self):
+        """Ambil skor yang sudah selesai tanpa menunggu (mode webcam)."""
+        while self.pending and self.pending[0][1].done():
+            self._resolve(*self.pending.popleft())
+
+    def drain(self):
+        while self.pending:
+            self._resolve(*self.pending.popleft())
+
+    def counts(self):
+        return {"detections": self.detections, "tracked": self.tracked}
+
+
+# Sesi webcam live: frame datang dari browser (streaming Gradio), disampling berdasarkan waktu.
+# Interval sampling naik jika biaya per frame melebihi 1 / sample_fps. Event streaming dan tombol
+# analisis bisa berjalan bersamaan: push() dan finish() saling mengunci, push() setelah finish() diabaikan.
+class LiveSession(VideoSession):
+    def __init__(self, face_stage, model_service, sample_fps=None, **kwargs):
+        sample_fps = sample_fps or config.VIDEO_SAMPLE_FPS
+        max_frames = int(config.VIDEO_MAX_SECONDS * sample_fps)
+        super().__init__(face_stage, model_service, max_frames=max_frames, **kwargs)
+        self.base_interval = 1.0 / sample_fps
+        self.interval = self.base_interval
+        self.started = time.perf_counter()
+        self.last_sample = None
+        self.received = 0
+        self.cost = None
+        self.finished = None
+        self._lock = threading.Lock()
+
+    def push(self, rgb):
+        """Analisis satu frame webcam jika sudah waktunya; frame lain hanya dihitung."""
+        with self._lock:
+            if self.finished is not None:
+                return False
+            return self._push(rgb)
+
+    def _push(self, rgb):
+        now = time.perf_counter()
+        self.received += 1
+        if self.last_sample is not None and now - self.last_sample < self.interval:
+            self.collect()
+            return False
+        self.last_sample = now
+        rgb = np.ascontiguousarray(rgb[..., :3])
+        self.process(rgb, self.received - 1, now - self.started)
+        self.collect()
+        cost = time.perf_counter() - now
+        self.cost = cost if self.cost is None else 0.8 * self.cost + 0.2 * cost
+        self.interval = max(self.base_interval, self.cost)
+        return True
+
+    def finish(self):
+        """Tutup sesi dan kembalikan VideoAnalysis; panggilan berikutnya mengembalikan hasil yang sama."""
+        with self._lock:
+            if self.finished is None:
+                self.finished = self._finish()
+            return self.finished
+
+    def _finish(self):
+        self.drain()
+        frames = list(self.frames)
+        elapsed = time.perf_counter() - self.started
+        throughput = {
+            "source": "webcam",
+            "frames_received": self.received,
+            "frames_analyzed": len(frames),
+            "wall_seconds": elapsed,
+            "received_fps": self.received / elapsed if elapsed else 0.0,
+            "analyzed_fps": len(frames) / elapsed if elapsed else 0.0,
+            "target_sample_fps": 1.0 / self.base_interval,
+            "sample_interval_ms": self.interval * 1000.0,
+            "frame_cost_ms": (self.cost or 0.0) * 1000.0,
+            # Real-time jika biaya analisis per frame masih muat dalam interval sampling target
+            "within_budget": (self.cost or 0.0) <= self.base_interval,
+            "stage_ms_total": self.stage_ms,
+            **self.counts(),
+        }
+        metrics.VIDEO_PROCESSING_FPS.observe(throughput["analyzed_fps"], source="webcam")
+        return VideoAnalysis(frames, summarize_frames(frames), throughput)
+
+
+# Analisis file video: hanya frame yang disampling yang di-decode penuh (grab vs read),
+# wajah dilacak antar sampel, skor CNN diambil per batch dari scheduler yang sama dengan gambar
+class VideoAnalyzer:
+    def __init__(self, face_stage, model_service, sample_fps=None, realtime=None, max_seconds=None,
+                 redetect_every=None, track_min_score=None):
+        self.face_stage = face_stage
+        self.model_service = model_service
+        self.sample_fps = sample_fps or config.VIDEO_SAMPLE_FPS
+        self.realtime = realtime or config.VIDEO_REALTIME
+        self.max_seconds = max_seconds or config.VIDEO_MAX_SECONDS
+        self.redetect_every = redetect_every or config.VIDEO_REDETECT_EVERY
+        self.track_min_score = track_min_score or config.VIDEO_TRACK_MIN_SCORE
+
+    def live_session(self):
+        return LiveSession(self.face_stage, self.model_service, sample_fps=self.sample_fps,
+                           redetect_every=self.redetect_every, track_min_score=self.track_min_score)
+
+    def analyze_file(self, path):
+        capture = cv2.VideoCapture(str(path))
+        if not capture.isOpened():
+            raise VideoError("Video tidak bisa dibuka (gunakan MP4/WebM/AVI)")
+        try:
+            return self._analyze(capture)
+        finally:
+            capture.release()
+
+    def _analyze(self, capture):
+        source_fps = capture.get(cv2.CAP_PROP_FPS)
+        if not source_fps or not 1.0 <= source_fps <= 240.0:
+            source_fps = DEFAULT_SOURCE_FPS
+        max_frames = int(self.max_seconds * source_fps)
+        sampler = FrameSampler(source_fps, self.sample_fps, self.realtime)
+        session = VideoSession(self.face_stage, self.model_service, redetect_every=self.redetect_every,
+                               track_min_score=self.track_min_score)
+
+        bgr = rgb = None
+        index = next_sample = grabbed = 0
+        decode_ms = []
+        started = time.perf_counter()
+        while index < max_frames:
+            frame_started = time.perf_counter()
+            if index < next_sample:
+                # Frame yang tidak disampling hanya di-grab: tanpa konversi warna dan salinan ke numpy
+                if not capture.grab():
+                    break
+                grabbed += 1
+                sampler.observe_skip(time.perf_counter() - frame_started)
+                index += 1
+                continue
+
+            ok, bgr = capture.read(bgr)
+            if not ok:
+                break
+            # Buffer BGR dan RGB dipakai ulang antar frame; crop CNN selalu array baru
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=rgb if rgb is not None and rgb.shape == bgr.shape else None)
+            decode_ms.append((time.perf_counter() - frame_started) * 1000.0)
+            metrics.record("frame_decode", decode_ms[-1])
+
+            session.process(rgb, index, index / source_fps)
+            sampler.observe_sample(time.perf_counter() - frame_started)
+            next_sample = index + sampler.stride
+            index += 1
+
+        if not session.frames:
+            raise VideoError("Video kosong atau codec tidak didukung")
+        session.drain()
+        elapsed = time.perf_counter() - started
+        frames = list(session.frames)
+        video_seconds = index / source_fps
+        processing_fps = index / elapsed if elapsed else 0.0
+        throughput = {
+            "source": "file",
+            "source_fps": source_fps,
+            "video_seconds": video_seconds,
+            "truncated": index >= max_frames,
+            "frames_read": index,
+            "frames_decoded": len(frames),
+            "frames_skipped": grabbed,
+            "wall_seconds": elapsed,
+            # Frame video (termasuk yang dilewati) per detik wall-clock; >= fps sumber x realtime = real-time
+            "processing_fps": processing_fps,
+            "analyzed_fps": len(frames) / elapsed if elapsed else 0.0,
+            "realtime_factor": processing_fps / source_fps,
+            "within_budget": processing_fps >= source_fps * self.realtime,
+            "base_stride": sampler.base,
+            "final_stride": sampler.stride,
+            "decode_ms_mean": float(np.mean(decode_ms)),
+            "stage_ms_total": session.stage_ms,
+            **session.counts(),
+        }
+        metrics.VIDEO_PROCESSING_FPS.observe(processing_fps, source="file")
+        return VideoAnalysis(frames, summarize_frames(frames), throughput)
+
+
+def format_video(analysis, gejala):
+    """Teks hasil untuk UI: (hasil lengkap, confidence + ringkasan video, checklist)."""
+    summary, throughput = analysis.summary, analysis.throughput
+    if summary["confidence"] is None:
+        return NO_FACE_VIDEO_MESSAGE, "", ""
+    hasil, confidence_str, checklist_str = format_result(decide(summary["confidence"], gejala))
+    budget = "✅ real-time" if throughput["within_budget"] else "⚠️ lebih lambat dari real-time"
+    video_str = (
+        f"🎞️ Rata-rata {summary['frames_with_face']} dari {summary['frames_analyzed']} frame berwajah "
+        f"(median {summary['median']:.2f}, simpangan {summary['std']:.2f}, "
+        f"{summary['positive_fraction']:.0%} frame di bawah ambang)\n"
+        f"⚡ {throughput['analyzed_fps']:.1f} frame dianalisis/detik, {budget}"
+    )
+    return hasil, f"{confidence_str}\n{video_str}", checklist_str
+
+
+def timeline_rows(analysis):
+    """Titik (waktu, confidence) frame berwajah untuk grafik timeline."""
+    return [(f["time"], f["confidence"]) for f in analysis.frames if f["confidence"] is not None]
+
+
+def live_status(session):
+    """Ringkasan singkat sesi webcam, ditampilkan selama streaming."""
+    frames = list(session.frames)
+    elapsed = max(time.perf_counter() - session.started, 1e-6)
+    with_face = sum(1 for f in frames if f["face"] is not None)
+    scores = [f["confidence"] for f in frames if f["confidence"] is not None]
+    status = (
+        f"🎥 {len(frames)} frame dianalisis ({len(frames) / elapsed:.1f}/detik), "
+        f"wajah terlihat di {with_face} frame"
+    )
+    if scores:
+        status += f", rata-rata confidence sementara {np.mean(scores):.2f}"
+    return status